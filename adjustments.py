@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from cache import LRUCache
+
+# Supported corporate actions: value is the split ratio (new shares per
+# old share, 4.0 for a 4-for-1) or the cash dividend per share
+ACTION_KINDS = ('split', 'dividend')
+
+# Price series a read can be adjusted to
+ADJUSTMENTS = ('raw', 'adjusted')
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+# Ratio changes between consecutive adj_close/close values smaller than
+# this are rounding in the source file, not a dividend
+ADJ_CLOSE_TOLERANCE = 1e-4
+
+
+class AdjustmentFactors:
+    """Cumulative adjustment factors for one ticker
+
+    Holds the action ex-dates in order and, for each position, the product
+    of every action's factor from that position on. A bar dated before the
+    k-th ex-date (and on or after the previous one) is adjusted by the k-th
+    product, so any slice of bars is adjusted with one searchsorted.
+    """
+
+    def __init__(self, ex_dates: np.ndarray, price: np.ndarray, volume: np.ndarray):
+        self.ex_dates = ex_dates
+        self.price = price
+        self.volume = volume
+
+    @property
+    def empty(self) -> bool:
+        return len(self.ex_dates) == 0
+
+    def at(self, dates: np.ndarray):
+        """Price and volume factors for bars on the given datetime64[D] dates"""
+        idx = np.searchsorted(self.ex_dates, dates.astype('datetime64[D]'), side='right')
+        return self.price[idx], self.volume[idx]
+
+
+def action_factors(kinds: np.ndarray, values: np.ndarray, prev_closes: np.ndarray):
+    """Per-action price and volume factors
+
+    A split of ratio r scales earlier prices by 1/r and volume by r. A
+    dividend d scales earlier prices by 1 - d / (close before the ex-date),
+    as Yahoo's adjusted close does; without that close it is left at 1.
+    """
+    is_split = kinds == 'split'
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dividend = 1 - values / prev_closes
+    dividend = np.where(np.isfinite(dividend) & (dividend > 0), dividend, 1.0)
+    price = np.where(is_split, 1 / values, dividend)
+    volume = np.where(is_split, values, 1.0)
+    return price, volume
+
+
+def cumulative_factors(actions: List[tuple]) -> AdjustmentFactors:
+    """Build factors from (ex_date, kind, value, close before ex_date) rows"""
+    if not actions:
+        return AdjustmentFactors(np.array([], dtype='datetime64[D]'), np.ones(1), np.ones(1))
+    actions = sorted(actions, key=lambda action: str(action[0]))
+    ex_dates = np.array([str(a[0]) for a in actions], dtype='datetime64[D]')
+    kinds = np.array([a[1] for a in actions])
+    values = np.array([a[2] for a in actions], dtype=np.float64)
+    prev_closes = np.array([np.nan if a[3] is None else a[3] for a in actions], dtype=np.float64)
+
+    price, volume = action_factors(kinds, values, prev_closes)
+    # Suffix products, with a trailing 1 for bars on or after the last ex-date
+    price = np.r_[np.cumprod(price[::-1])[::-1], 1.0]
+    volume = np.r_[np.cumprod(volume[::-1])[::-1], 1.0]
+    return AdjustmentFactors(ex_dates, price, volume)
+
+
+def adjust_columns(columns: Dict[str, np.ndarray], factors: AdjustmentFactors) -> Dict[str, np.ndarray]:
+    """Adjusted copy of OHLCV columns; columns must include 'date'"""
+    if factors.empty:
+        return columns
+    price, volume = factors.at(columns['date'])
+    adjusted = dict(columns)
+    for field in PRICE_FIELDS:
+        adjusted[field] = columns[field] * price
+    adjusted['volume'] = np.rint(columns['volume'] * volume).astype(np.int64)
+    return adjusted
+
+
+def adjust_rows(data: list, factors: AdjustmentFactors) -> list:
+    """Adjusted copy of API price rows (dicts with date and OHLCV)"""
+    if factors.empty or not data:
+        return data
+    price, volume = factors.at(np.array([str(row['date']) for row in data], dtype='datetime64[D]'))
+    return [
+        {
+            **row,
+            **{field: round(row[field] * p, 4) for field in PRICE_FIELDS},
+            'volume': int(round(row['volume'] * v))
+        }
+        for row, p, v in zip(data, price.tolist(), volume.tolist())
+    ]
+
+
+class Adjuster:
+    """Per-ticker cache of cumulative adjustment factors
+
+    Factors are small (one entry per action) and keyed by the ticker's
+    version, which includes its actions, so appending an action or
+    ingesting new bars rebuilds them on the next read.
+    """
+
+    def __init__(self, load_actions: Callable[[str], List[tuple]], maxsize: int = 1024):
+        """Initialize the adjuster
+
+        Args:
+            load_actions: Returns a ticker's (ex_date, kind, value, close before ex_date) rows
+            maxsize: Tickers kept
+        """
+        self.load_actions = load_actions
+        self._cache = LRUCache(maxsize)
+
+    def factors(self, ticker: str, version) -> AdjustmentFactors:
+        return self._cache.get_or_build(
+            (ticker, tuple(version) if version else None),
+            lambda: cumulative_factors(self.load_actions(ticker))
+        )
+
+
+def record_actions(conn: sqlite3.Connection, ticker: str, actions: List[tuple], source: str = 'manual') -> int:
+    """Append (ex_date, kind, value) actions; existing (ticker, ex_date, kind) rows are kept
+
+    Returns:
+        Number of new actions
+
+    Raises:
+        ValueError: For an unknown kind, a value that is not positive, or a
+            dividend at or above the close before its ex-date
+    """
+    for ex_date, kind, value in actions:
+        if kind not in ACTION_KINDS:
+            raise ValueError(f'Unknown action kind {kind!r}; expected one of {", ".join(ACTION_KINDS)}')
+        if not value > 0:
+            raise ValueError(f'{kind} value must be positive, got {value}')
+        if kind == 'dividend':
+            row = conn.execute(
+                'SELECT close FROM daily_prices WHERE ticker = ? AND date < ? ORDER BY date DESC LIMIT 1',
+                (ticker, str(ex_date))
+            ).fetchone()
+            if row and value >= row[0]:
+                raise ValueError(f'Dividend {value} on {ex_date} is not below the previous close {row[0]}')
+    before = conn.total_changes
+    conn.executemany(
+        '''INSERT OR IGNORE INTO corporate_actions (ticker, ex_date, kind, value, source)
+           VALUES (?, ?, ?, ?, ?)''',
+        [(ticker, str(ex_date), kind, float(value), source) for ex_date, kind, value in actions]
+    )
+    conn.commit()
+    return conn.total_changes - before
+
+
+def actions_from_adjusted_close(dates: np.ndarray, closes: np.ndarray, adj_closes: np.ndarray) -> List[tuple]:
+    """Recover dividends from a history's adjusted close
+
+    adj_close / close is constant between dividends and steps up at each
+    ex-date; the step is the dividend factor 1 - d / previous close.
+    Yahoo's close is already split-adjusted, so splits do not show up.
+
+    Args:
+        dates: datetime64[D] dates in any order
+        closes: Close prices
+        adj_closes: Adjusted closes
+
+    Returns:
+        (ex_date, 'dividend', amount) tuples
+    """
+    order = np.argsort(dates)
+    dates, closes, adj_closes = dates[order], closes[order], adj_closes[order]
+    ratio = adj_closes / closes
+    factor = ratio[:-1] / ratio[1:]
+    steps = np.flatnonzero(factor < 1 - ADJ_CLOSE_TOLERANCE)
+    amounts = (1 - factor[steps]) * closes[steps]
+    return [(str(dates[i + 1]), 'dividend', round(float(a), 4)) for i, a in zip(steps, amounts)]
+
+
+def import_history_files(conn: sqlite3.Connection, paths: List[str]) -> Dict[str, int]:
+    """Record the dividends implied by the adj_close field of scraped history JSON files"""
+    bars = {}
+    for path in paths:
+        with open(path, 'r') as f:
+            points = json.load(f)
+        default_ticker = os.path.basename(path).split('_')[0].upper()
+        for point in points:
+            if point.get('adj_close') is None:
+                continue
+            date = datetime.strptime(point['date'], '%b %d, %Y').date().isoformat()
+            bars.setdefault(point.get('ticker', default_ticker), {})[date] = (point['close'], point['adj_close'])
+
+    added = {}
+    for ticker, by_date in bars.items():
+        dates = np.array(list(by_date), dtype='datetime64[D]')
+        closes, adj_closes = (np.array(column, dtype=np.float64) for column in zip(*by_date.values()))
+        added[ticker] = record_actions(conn, ticker, actions_from_adjusted_close(dates, closes, adj_closes), 'adj_close')
+    return added
+
+
+def main():
+    from precompute import DB_PATH, connect
+
+    parser = argparse.ArgumentParser(description='Record splits and dividends used to adjust prices at read time')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add = subparsers.add_parser('add', help='Append one action')
+    add.add_argument('ticker')
+    add.add_argument('ex_date', help='YYYY-MM-DD')
+    add.add_argument('kind', choices=ACTION_KINDS)
+    add.add_argument('value', type=float, help='Split ratio (4 for 4-for-1) or dividend per share')
+
+    history = subparsers.add_parser('import-history', help='Derive dividends from adj_close in history JSON files')
+    history.add_argument('paths', nargs='+')
+
+    show = subparsers.add_parser('list', help='List recorded actions')
+    show.add_argument('ticker', nargs='?')
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+    try:
+        if args.command == 'add':
+            try:
+                datetime.strptime(args.ex_date, '%Y-%m-%d')
+                added = record_actions(conn, args.ticker.upper(), [(args.ex_date, args.kind, args.value)])
+            except ValueError as e:
+                parser.error(str(e))
+            print(f"Recorded {added} action{'s' if added != 1 else ''}")
+        elif args.command == 'import-history':
+            for ticker, added in import_history_files(conn, args.paths).items():
+                print(f"{ticker}: {added} new dividends")
+        else:
+            query = 'SELECT ticker, ex_date, kind, value, source FROM corporate_actions'
+            params = ()
+            if args.ticker:
+                query += ' WHERE ticker = ?'
+                params = (args.ticker.upper(),)
+            for row in conn.execute(query + ' ORDER BY ticker, ex_date', params):
+                print(*row, sep='\t')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,16 @@
 from http.server import BaseHTTPRequestHandler
 from sqlalchemy import create_engine, text
-import json
 import os
 from urllib.parse import parse_qs, urlparse
+from datetime import date
+from serialization import dumps, to_columnar, slice_since, price_columns, map_series
+from downsample import downsample, MIN_POINTS, MAX_POINTS
+from http_cache import data_versions, make_etag, etag_matches, compress, cache_headers
+from indicators import compute_indicators, parse_specs, max_lookback
+from indicator_cache import indicator_memo
+
+# Largest page a client can request with ?limit=
+MAX_PAGE_SIZE = 5000
 
 def get_db_connection():
     db_url = os.getenv('DATABASE_URL')
@@ -10,6 +18,30 @@ def get_db_connection():
         raise ValueError("DATABASE_URL environment variable is not set")
     return create_engine(db_url)
 
+def get_data_version(ticker):
+    """Get the last bar date and ingest version for the given ticker"""
+    engine = get_db_connection()
+    query = text("""
+        SELECT MAX(date) AS last_date, MAX(created_at) AS ingested_at, COUNT(*) AS bars
+        FROM daily_prices
+        WHERE ticker = :ticker
+    """)
+    with engine.connect() as conn:
+        row = conn.execute(query, {'ticker': ticker}).fetchone()
+    if not row or not row.bars:
+        return None
+    return (str(row.last_date), f"{row.ingested_at}:{row.bars}")
+
+def calculate_indicators(data, specs=None):
+    """Compute the default indicator set, or only the indicators selected with ?indicators="""
+    if specs is None:
+        return {
+            'moving_averages': calculate_moving_averages(data),
+            'rsi': calculate_rsi(data),
+            'volume_ma': calculate_volume_ma(data)
+        }
+    return compute_indicators(price_columns(data), specs)
+
 def calculate_moving_averages(data, periods=[20, 50]):
     """Calculate moving averages for the given periods"""
     result = {}
@@ -63,61 +95,163 @@ def calculate_volume_ma(data, period=20):
             vol_ma.append(sum(volumes[i-period+1:i+1]) / period)
     return vol_ma
 
+def price_row(row):
+    return {
+        'date': row.date.strftime('%Y-%m-%d'),
+        'open': float(row.open),
+        'high': float(row.high),
+        'low': float(row.low),
+        'close': float(row.close),
+        'volume': int(row.volume)
+    }
+
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         try:
             # Parse the path to get the ticker
-            path_parts = self.path.split('/')
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            path_parts = url.path.split('/')
             if len(path_parts) < 3:
                 self.send_error(400, "Invalid request")
                 return
                 
             ticker = path_parts[2].upper()
+            response_format = params.get('format', ['rows'])[0]
+            since = params.get('since', [None])[0]
+            client_version = params.get('version', [None])[0]
+            start = params.get('start', [None])[0]
+            end = params.get('end', [None])[0]
+            cursor = params.get('cursor', [None])[0]
+            try:
+                points = int(params['points'][0]) if params.get('points') else None
+                limit = int(params['limit'][0]) if params.get('limit') else None
+            except ValueError:
+                self.send_error(400, "points and limit must be integers")
+                return
+            if points is not None and not MIN_POINTS <= points <= MAX_POINTS:
+                self.send_error(400, f"points must be between {MIN_POINTS} and {MAX_POINTS}")
+                return
+            if limit is not None:
+                if limit < 1:
+                    self.send_error(400, "limit must be positive")
+                    return
+                limit = min(limit, MAX_PAGE_SIZE)
+            selected = params.get('indicators', [None])[0]
+            try:
+                specs = parse_specs(selected) if selected is not None else None
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
             
-            # Get stock data
-            engine = get_db_connection()
-            query = text("""
-                SELECT date, open, high, low, close, volume
-                FROM daily_prices
-                WHERE ticker = :ticker
-                AND date >= DATE_SUB(CURDATE(), INTERVAL 60 DAY)
-                ORDER BY date
-            """)
+            # Answer revalidations without running the price query
+            version = data_versions.get(ticker, get_data_version)
+            etag = make_etag(ticker, version, f"{response_format}|{since}|{client_version}|{points}|{start}|{end}|{cursor}|{limit}|{selected}|{date.today()}") if version else None
+            if etag and etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                for name, value in cache_headers(etag).items():
+                    self.send_header(name, value)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                return
+            
+            # A client that sends back the current version already holds every bar
+            # and gets an empty delta without a price query. Any other version
+            # re-sends the bar on `since` too, since ingestion may have rewritten it.
+            data, history, next_cursor = [], [], None
+            if not (since and version and client_version == ':'.join(version)):
+                # Get stock data for an explicit range, or the past 60 days.
+                # With a limit, pages are keyset-paginated on (ticker, date).
+                engine = get_db_connection()
+                conditions, query_params = [], {'ticker': ticker}
+                if start or end:
+                    if start:
+                        conditions.append('AND date >= :start')
+                        query_params['start'] = start
+                    if end:
+                        conditions.append('AND date <= :end')
+                        query_params['end'] = end
+                else:
+                    conditions.append('AND date >= DATE_SUB(CURDATE(), INTERVAL 60 DAY)')
+                if cursor:
+                    conditions.append('AND date > :cursor')
+                    query_params['cursor'] = cursor
+                limit_clause = ''
+                if limit:
+                    # One extra row tells us whether another page follows
+                    limit_clause = 'LIMIT :limit'
+                    query_params['limit'] = limit + 1
+                query = text(f"""
+                    SELECT date, open, high, low, close, volume
+                    FROM daily_prices
+                    WHERE ticker = :ticker
+                    {' '.join(conditions)}
+                    ORDER BY date
+                    {limit_clause}
+                """)
             
-            with engine.connect() as conn:
-                result = conn.execute(query, {'ticker': ticker})
-                data = []
-                for row in result:
-                    data.append({
-                        'date': row.date.strftime('%Y-%m-%d'),
-                        'open': float(row.open),
-                        'high': float(row.high),
-                        'low': float(row.low),
-                        'close': float(row.close),
-                        'volume': int(row.volume)
-                    })
+                with engine.connect() as conn:
+                    data = [price_row(row) for row in conn.execute(query, query_params)]
+                    if limit and len(data) > limit:
+                        data = data[:limit]
+                        next_cursor = data[-1]['date']
+                
+                    # A page is computed together with the bars before it, so its
+                    # indicators are warm instead of restarting with nulls
+                    lookback = max_lookback(specs)
+                    if limit and data and lookback:
+                        history_query = text("""
+                            SELECT date, open, high, low, close, volume
+                            FROM daily_prices
+                            WHERE ticker = :ticker
+                            AND date < :first_date
+                            ORDER BY date DESC
+                            LIMIT :lookback
+                        """)
+                        history = [price_row(row) for row in conn.execute(
+                            history_query, {'ticker': ticker, 'first_date': data[0]['date'], 'lookback': lookback}
+                        )][::-1]
             
-            # Calculate technical indicators
-            moving_averages = calculate_moving_averages(data)
-            rsi = calculate_rsi(data)
-            volume_ma = calculate_volume_ma(data)
+
+            def compute():
+                values = calculate_indicators(history + data, specs)
+                return map_series(values, lambda series: series[len(history):]) if history else values
             
-            # Add indicators to response
-            response_data = {
-                'prices': data,
-                'indicators': {
-                    'moving_averages': moving_averages,
-                    'rsi': rsi,
-                    'volume_ma': volume_ma
-                }
-            }
+            # Calculate the default indicators, or only the selected ones. Results are
+            # memoized per data version and window; set INDICATOR_CACHE_DIR to share
+            # them across function instances.
+            if version and data:
+                key = (ticker, tuple(version), (start, end, cursor, limit, str(date.today())),
+                       tuple(specs) if specs is not None else 'default')
+                indicators = indicator_memo.get_or_compute(key, compute)
+            else:
+                indicators = compute()
+            if since:
+                # Delta sync: only the bars from the client's cursor on
+                data, indicators = slice_since(data, indicators, since)
+            if points and not since and len(data) > points:
+                # Long ranges are reduced to about `points` bars
+                response_data = downsample(data, indicators, points)
+            elif response_format == 'columnar':
+                response_data = to_columnar(data, indicators)
+            else:
+                response_data = {'prices': data, 'indicators': indicators}
+            if since:
+                response_data['cursor'] = data[-1]['date'] if data else since
+                response_data['version'] = ':'.join(version) if version else None
+            if limit:
+                response_data['next_cursor'] = next_cursor
             
             # Send response
+            body, encoding = compress(dumps(response_data), self.headers.get('Accept-Encoding'))
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in cache_headers(etag, encoding).items():
+                self.send_header(name, value)
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(response_data).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error(500, str(e))
@@ -1,9 +1,11 @@
-from flask import Flask, render_template, jsonify, send_from_directory
+from flask import Flask, render_template, jsonify, send_from_directory, request, Response
 from datetime import datetime, timedelta
 import json
 import os
 from supabase import create_client
 from dotenv import load_dotenv
+from serialization import dumps
+from http_cache import data_versions, make_etag, etag_matches, compress, cache_headers
 
 # Load environment variables
 load_dotenv()
@@ -53,25 +55,30 @@ def test():
         }
     })
 
-def get_stock_data(ticker, days=30):
-    """Get stock data for the given ticker"""
+def get_stock_data(ticker, days=30, since=None):
+    """Get stock data for the given ticker
+    
+    When since is given only bars on or after that date are returned; the
+    bar on since is included because ingestion rewrites the current day's
+    bar in place. The views
+    compute their windows over the whole table, so the indicator values of
+    the new bars are the same as in a full response.
+    """
     from_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
     
     # Get price data
-    price_data = supabase.table('moving_averages')\
+    price_query = supabase.table('moving_averages')\
         .select('*')\
-        .eq('ticker', ticker)\
-        .gte('date', from_date)\
-        .order('date')\
-        .execute()
+        .eq('ticker', ticker)
+    price_query = price_query.gte('date', since) if since else price_query.gte('date', from_date)
+    price_data = price_query.order('date').execute()
     
     # Get volume data
-    volume_data = supabase.table('volume_analysis')\
+    volume_query = supabase.table('volume_analysis')\
         .select('*')\
-        .eq('ticker', ticker)\
-        .gte('date', from_date)\
-        .order('date')\
-        .execute()
+        .eq('ticker', ticker)
+    volume_query = volume_query.gte('date', since) if since else volume_query.gte('date', from_date)
+    volume_data = volume_query.order('date').execute()
     
     return {
         'price_data': price_data.data,
@@ -111,6 +118,34 @@ def get_stock_summary(ticker):
         }
     return None
 
+def get_data_version(ticker):
+    """Get the last bar date and ingest version for a ticker, or for the whole market when ticker is '*'
+    
+    Built like main.py's version from MAX(date), MAX(created_at) and the bar
+    count, so rewriting an older bar changes it too.
+    """
+    params = {'p_ticker': None if ticker == '*' else ticker}
+    response = supabase.rpc('daily_prices_version', params).execute()
+    
+    latest = response.data[0] if response.data else None
+    if not latest or not latest['bars']:
+        return None
+    return (latest['last_date'], f"{latest['ingested_at']}:{latest['bars']}")
+
+def conditional_json(ticker, build_payload, variant=''):
+    """Return a compressed JSON response validated by the ticker's data version
+    
+    build_payload is only called when the client's copy is stale, so a matching
+    If-None-Match is answered with a 304 without querying the price data.
+    """
+    version = data_versions.get(ticker, get_data_version)
+    etag = make_etag(ticker, version, f"{variant}|{datetime.now().date()}") if version else None
+    if etag and etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=cache_headers(etag))
+    
+    body, encoding = compress(dumps(build_payload()), request.headers.get('Accept-Encoding'))
+    return Response(body, mimetype='application/json', headers=cache_headers(etag, encoding))
+
 @app.errorhandler(500)
 def handle_500(error):
     app.logger.error(f'Server error: {error}')
@@ -142,12 +177,29 @@ def index():
 def get_data(ticker):
     """Get stock data and summary for the specified ticker"""
     try:
-        data = get_stock_data(ticker)
-        summary = get_stock_summary(ticker)
+        since = request.args.get('since')
+        client_version = request.args.get('version')
+        if since:
+            # Delta sync: bars from the cursor on, plus the cursor and version to send
+            # back next time. A client already holding the current version gets none.
+            def build_delta():
+                version = data_versions.get(ticker, get_data_version)
+                if version and client_version == ':'.join(version):
+                    data = {'price_data': [], 'volume_data': []}
+                else:
+                    data = get_stock_data(ticker, since=since)
+                dates = [row['date'] for row in data['price_data']]
+                return {
+                    'data': data,
+                    'summary': get_stock_summary(ticker) if dates else None,
+                    'cursor': max(dates) if dates else since,
+                    'version': ':'.join(version) if version else None
+                }
+            return conditional_json(ticker, build_delta, f'since={since}|version={client_version}')
         
-        return jsonify({
-            'data': data,
-            'summary': summary
+        return conditional_json(ticker, lambda: {
+            'data': get_stock_data(ticker),
+            'summary': get_stock_summary(ticker)
         })
     except Exception as e:
         app.logger.error(f'Error fetching data for {ticker}: {e}')
@@ -156,9 +208,38 @@ def get_data(ticker):
             'message': str(e)
         }), 500
 
+@app.route('/api/history/<ticker>')
+def get_history(ticker):
+    """Page through bars in any date range using keyset pagination on (ticker, date)
+    
+    Pass next_cursor back as ?cursor= to fetch the following page.
+    """
+    limit = max(1, min(int(request.args.get('limit', 500)), 5000))
+    query = supabase.table('daily_prices')\
+        .select('date, open, high, low, close, volume')\
+        .eq('ticker', ticker)
+    if request.args.get('start'):
+        query = query.gte('date', request.args['start'])
+    if request.args.get('end'):
+        query = query.lte('date', request.args['end'])
+    if request.args.get('cursor'):
+        query = query.gt('date', request.args['cursor'])
+    
+    # One extra row tells us whether another page follows
+    response = query.order('date').limit(limit + 1).execute()
+    rows = response.data[:limit]
+    next_cursor = rows[-1]['date'] if len(response.data) > limit else None
+    
+    body, encoding = compress(dumps({'prices': rows, 'next_cursor': next_cursor}), request.headers.get('Accept-Encoding'))
+    return Response(body, mimetype='application/json', headers=cache_headers(None, encoding))
+
 @app.route('/api/stocks/gainers')
 def get_top_gainers():
     """Get top gaining stocks"""
+    return conditional_json('*', load_top_gainers, 'gainers')
+
+def load_top_gainers():
+    """Load the top gainers for the latest trading day"""
     response = supabase.table('daily_returns')\
         .select('*')\
         .order('date', desc=True)\
@@ -175,12 +256,16 @@ def get_top_gainers():
             .limit(5)\
             .execute()
         
-        return jsonify(response.data)
-    return jsonify([])
+        return response.data
+    return []
 
 @app.route('/api/stocks/volume')
 def get_high_volume():
     """Get stocks with unusually high volume"""
+    return conditional_json('*', load_high_volume, 'volume')
+
+def load_high_volume():
+    """Load stocks with unusually high volume on the latest trading day"""
     response = supabase.table('volume_analysis')\
         .select('*')\
         .order('date', desc=True)\
@@ -208,8 +293,8 @@ def get_high_volume():
                 'volume_increase_percent': round(volume_increase, 2)
             })
         
-        return jsonify(results)
-    return jsonify([])
+        return results
+    return []
             AND volume > avg_20day_volume
         ORDER BY volume_increase_percent DESC
         LIMIT 5
@@ -0,0 +1,149 @@
+import argparse
+import logging
+import sqlite3
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from market_calendar import last_closed_session, trading_days
+from precompute import DB_PATH, connect
+
+logger = logging.getLogger(__name__)
+
+# Present sessions a fetch range may span to join two gaps into one
+# request; re-downloading a few stored bars is cheaper than another call
+DEFAULT_BRIDGE = 0
+
+
+class FetchRange(NamedTuple):
+    ticker: str
+    start: str
+    end: str
+    missing: int
+
+
+def find_gaps(stored: np.ndarray, sessions: np.ndarray) -> np.ndarray:
+    """Sessions with no stored bar; both inputs sorted and unique datetime64[D]"""
+    return np.setdiff1d(sessions, stored, assume_unique=True)
+
+
+def merge_ranges(missing: np.ndarray, sessions: np.ndarray, bridge: int = DEFAULT_BRIDGE) -> List[tuple]:
+    """Merge missing sessions into the fewest contiguous (start, end, count) ranges
+
+    Missing sessions are contiguous when they are adjacent in the trading
+    calendar, so a weekend or holiday never splits a range. With bridge > 0,
+    runs separated by at most that many stored sessions are merged too.
+    """
+    if not len(missing):
+        return []
+    positions = np.searchsorted(sessions, missing)
+    breaks = np.flatnonzero(np.diff(positions) > bridge + 1)
+    starts = np.r_[0, breaks + 1]
+    ends = np.r_[breaks, len(missing) - 1]
+    return [
+        (str(missing[s]), str(missing[e]), int(e - s + 1))
+        for s, e in zip(starts.tolist(), ends.tolist())
+    ]
+
+
+def load_stored_dates(conn: sqlite3.Connection, tickers: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """Each ticker's stored bar dates as a sorted datetime64[D] array, in one query"""
+    query = 'SELECT ticker, date FROM daily_prices'
+    params = ()
+    if tickers:
+        query += f' WHERE ticker IN ({",".join("?" * len(tickers))})'
+        params = tuple(tickers)
+    rows = conn.execute(query + ' ORDER BY ticker, date', params).fetchall()
+    stored = {ticker: np.array([], dtype='datetime64[D]') for ticker in tickers or ()}
+    if not rows:
+        return stored
+
+    symbols = np.array([row[0] for row in rows])
+    dates = np.array([str(row[1])[:10] for row in rows], dtype='datetime64[D]')
+    boundaries = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+    for chunk_symbols, chunk_dates in zip(np.split(symbols, boundaries), np.split(dates, boundaries)):
+        stored[str(chunk_symbols[0])] = np.unique(chunk_dates)
+    return stored
+
+
+def plan_backfill(stored: Dict[str, np.ndarray], start: Optional[str] = None, end: Optional[str] = None,
+                  bridge: int = DEFAULT_BRIDGE) -> List[FetchRange]:
+    """Plan the fetches that fill every ticker's missing sessions
+
+    Args:
+        stored: Ticker -> sorted stored dates (see load_stored_dates)
+        start: First session to check; defaults to each ticker's first stored
+            bar, so nothing before a listing is requested
+        end: Last session to check; defaults to the last closed session
+        bridge: See merge_ranges
+
+    Returns:
+        Fetch ranges ordered by ticker and date
+    """
+    end = np.datetime64(end, 'D') if end else last_closed_session()
+    default_start = np.datetime64(start, 'D') if start else None
+    firsts = [dates[0] for dates in stored.values() if len(dates)]
+    if default_start is None and not firsts:
+        return []
+    # One calendar for every ticker; each one checks its own slice of it
+    calendar = trading_days(min(firsts + [default_start]) if default_start is not None else min(firsts), end)
+
+    plan = []
+    for ticker, dates in sorted(stored.items()):
+        first = default_start if default_start is not None else (dates[0] if len(dates) else None)
+        if first is None:
+            continue
+        sessions = calendar[np.searchsorted(calendar, first):]
+        missing = find_gaps(dates, sessions)
+        plan.extend(FetchRange(ticker, *r) for r in merge_ranges(missing, sessions, bridge))
+    return plan
+
+
+def off_calendar_dates(stored: Dict[str, np.ndarray]) -> Dict[str, List[str]]:
+    """Stored bars dated on weekends or exchange holidays, which usually mean a bad source date"""
+    result = {}
+    for ticker, dates in stored.items():
+        if not len(dates):
+            continue
+        extra = np.setdiff1d(dates, trading_days(dates[0], dates[-1]), assume_unique=True)
+        if len(extra):
+            result[ticker] = [str(d) for d in extra]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find missing daily bars and fetch only those ranges')
+    parser.add_argument('tickers', nargs='*', help='Tickers to check (default: all stored)')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite database path')
+    parser.add_argument('--start', help='First date to check (default: each ticker\'s first bar)')
+    parser.add_argument('--end', help='Last date to check (default: last closed session)')
+    parser.add_argument('--bridge', type=int, default=DEFAULT_BRIDGE,
+                        help='Stored sessions a range may span to merge two gaps')
+    parser.add_argument('--apply', action='store_true', help='Fetch the planned ranges through the scraper')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    conn = connect(args.db)
+    try:
+        stored = load_stored_dates(conn, [t.upper() for t in args.tickers] or None)
+    finally:
+        conn.close()
+
+    for ticker, dates in off_calendar_dates(stored).items():
+        logger.warning(f"{ticker}: {len(dates)} bars on non-trading days, e.g. {', '.join(dates[:3])}")
+
+    plan = plan_backfill(stored, args.start, args.end, args.bridge)
+    for r in plan:
+        print(f"{r.ticker:<8} {r.start} .. {r.end}  {r.missing} missing")
+    print(f"{sum(r.missing for r in plan)} missing sessions in {len(plan)} ranges "
+          f"across {len({r.ticker for r in plan})} tickers")
+
+    if args.apply and plan:
+        from scrape_yahoo import AlpacaScraper
+        scraper = AlpacaScraper(db_path=args.db)
+        results = scraper.backfill(plan)
+        print(f"Filled {sum(results.values())} of {len(results)} ranges")
+
+
+if __name__ == '__main__':
+    main()
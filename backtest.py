@@ -0,0 +1,296 @@
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from correlation import align_closes
+from indicators import trailing_sum
+from screener import _wilder_rsi
+
+TRADING_DAYS = 252
+
+VOLUME_MA_PERIOD = 20
+
+# Every parameter set is completed from these, so a grid only lists what it varies
+DEFAULT_PARAMS = {
+    'fast': 20,          # fast moving average period
+    'slow': 50,          # slow moving average period
+    'rsi_period': 14,
+    'rsi_max': 70,       # enter only while RSI is below this
+    'rsi_exit': 80,      # exit once RSI rises above this
+    'volume_mult': 0.0,  # enter only when volume >= volume_mult * 20-day volume MA
+    'cost_bps': 5.0      # cost per unit of position traded, in basis points
+}
+
+# Parameter sets sent to a worker per task
+CHUNK_SIZE = 25
+
+
+def load_panel_from_db(db_path: str = 'stock_data.db', tickers=None) -> dict:
+    """Load close and volume from daily_prices into aligned dates x tickers arrays"""
+    conn = sqlite3.connect(db_path)
+    try:
+        query = 'SELECT ticker, date, close, volume FROM daily_prices'
+        params = ()
+        if tickers:
+            query += f' WHERE ticker IN ({",".join("?" * len(tickers))})'
+            params = tuple(tickers)
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+    return _build_panel(
+        np.array([row[0] for row in rows]),
+        np.array([row[1] for row in rows], dtype='datetime64[D]'),
+        np.array([row[2] for row in rows], dtype=np.float64),
+        np.array([row[3] for row in rows], dtype=np.float64)
+    )
+
+
+def load_panel_from_history(paths: list) -> dict:
+    """Load close and volume from scraped history JSON files
+
+    Files are either combined (each bar carries its ticker) or per ticker
+    and named <TICKER>_historical.json.
+    """
+    tickers, dates, closes, volumes = [], [], [], []
+    for path in paths:
+        with open(path, 'r') as f:
+            bars = json.load(f)
+        default_ticker = os.path.basename(path).split('_')[0].upper()
+        for bar in bars:
+            tickers.append(bar.get('ticker', default_ticker))
+            dates.append(datetime.strptime(bar['date'], '%b %d, %Y').date().isoformat())
+            closes.append(bar['close'])
+            volumes.append(bar['volume'])
+
+    return _build_panel(
+        np.array(tickers),
+        np.array(dates, dtype='datetime64[D]'),
+        np.array(closes, dtype=np.float64),
+        np.array(volumes, dtype=np.float64)
+    )
+
+
+def _build_panel(tickers, dates, closes, volumes) -> dict:
+    symbols, days, close = align_closes(tickers, dates, closes)
+    _, _, volume = align_closes(tickers, dates, volumes, symbols)
+    return {'tickers': symbols, 'dates': days, 'close': close, 'volume': volume}
+
+
+class IndicatorCache:
+    """Indicator arrays for one panel, computed once per distinct period and reused across parameter sets"""
+
+    def __init__(self, panel: dict):
+        self.panel = panel
+        self._values = {}
+
+    def get(self, name: str, period: int) -> np.ndarray:
+        key = (name, period)
+        if key not in self._values:
+            if name == 'ma':
+                self._values[key] = trailing_sum(self.panel['close'], period) / period
+            elif name == 'volume_ma':
+                self._values[key] = trailing_sum(self.panel['volume'], period) / period
+            elif name == 'rsi':
+                self._values[key] = _wilder_rsi(self.panel['close'], period, axis=0)
+            else:
+                raise ValueError(f'Unknown indicator: {name}')
+        return self._values[key]
+
+
+def positions(cache: IndicatorCache, params: dict) -> np.ndarray:
+    """Long/flat positions (dates x tickers) for a parameter set
+
+    Enter when the fast MA is above the slow MA, RSI is below rsi_max and
+    volume confirms; exit when the fast MA drops below the slow MA or RSI
+    exceeds rsi_exit. The state between events is carried forward with a
+    cumulative max over event indices, so there is no loop over bars.
+    """
+    fast = cache.get('ma', params['fast'])
+    slow = cache.get('ma', params['slow'])
+    strength = cache.get('rsi', params['rsi_period'])
+    volume = cache.panel['volume']
+
+    # NaN comparisons are False, so nothing is entered during indicator warm-up
+    entry = (fast > slow) & (strength < params['rsi_max'])
+    if params['volume_mult'] > 0:
+        entry &= volume >= params['volume_mult'] * cache.get('volume_ma', VOLUME_MA_PERIOD)
+    exit_ = (fast < slow) | (strength > params['rsi_exit']) | np.isnan(slow)
+
+    events = np.full(fast.shape, -1, dtype=np.int8)
+    events[entry] = 1
+    events[exit_] = 0
+    events[0][events[0] < 0] = 0
+
+    rows = np.arange(len(events))[:, None]
+    last_event = np.maximum.accumulate(np.where(events >= 0, rows, 0), axis=0)
+    return np.take_along_axis(events, last_event, axis=0).astype(np.float64)
+
+
+def evaluate(cache: IndicatorCache, params: dict) -> dict:
+    """Backtest one parameter set as an equal-weight portfolio across the panel
+
+    A position decided on a bar's close earns the next bar's return, so
+    signals never see the bar they trade on.
+    """
+    close = cache.panel['close']
+    pos = positions(cache, params)
+    n_tickers = close.shape[1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.nan_to_num(close[1:] / close[:-1] - 1)
+    trades = np.abs(np.diff(pos, axis=0, prepend=0))
+
+    daily = (pos[:-1] * returns).sum(axis=1) / n_tickers
+    daily -= trades[:-1].sum(axis=1) / n_tickers * params['cost_bps'] / 10000
+
+    equity = np.cumprod(1 + daily)
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+    years = max(len(daily) / TRADING_DAYS, 1 / TRADING_DAYS)
+    volatility = daily.std() * np.sqrt(TRADING_DAYS)
+
+    return {
+        'params': params,
+        'total_return': float(equity[-1] - 1) if len(equity) else 0.0,
+        'annual_return': float(equity[-1] ** (1 / years) - 1) if len(equity) else 0.0,
+        'volatility': float(volatility),
+        'sharpe': float(daily.mean() * TRADING_DAYS / volatility) if volatility else 0.0,
+        'max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0,
+        'turnover': float(trades.sum() / n_tickers / years),
+        'exposure': float(pos.mean())
+    }
+
+
+def parameter_grid(grid: dict) -> list:
+    """Expand {name: [values]} into complete parameter sets, skipping fast >= slow"""
+    names = list(grid)
+    sets = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = {**DEFAULT_PARAMS, **dict(zip(names, values))}
+        if params['fast'] < params['slow']:
+            sets.append(params)
+    return sets
+
+
+# Per worker process: read-only views onto the parent's shared memory, and their indicators
+_worker_cache = None
+_worker_segments = []
+
+
+def _attach(specs: dict):
+    """Pool initializer: map the shared panel arrays without copying them"""
+    global _worker_cache
+    panel = {}
+    for name, (segment_name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _worker_segments.append(segment)
+        array = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        array.flags.writeable = False
+        panel[name] = array
+    _worker_cache = IndicatorCache(panel)
+
+
+def _run_chunk(chunk: list) -> list:
+    return [evaluate(_worker_cache, params) for params in chunk]
+
+
+def sweep(panel: dict, grid: dict, workers: int = None) -> list:
+    """Backtest every parameter set in a grid
+
+    The close and volume arrays are placed in shared memory once and mapped
+    read-only by each worker, so workers never receive a copy of the bars.
+    Parameter sets are grouped so that each worker's indicator cache gets
+    reused across neighbouring sets.
+
+    Args:
+        panel: Arrays from load_panel_from_db or load_panel_from_history
+        grid: {parameter: [values]} to sweep; see DEFAULT_PARAMS
+        workers: Worker processes; 1 runs in this process
+
+    Returns:
+        One result dict per parameter set, in grid order
+    """
+    param_sets = parameter_grid(grid)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        cache = IndicatorCache(panel)
+        return [evaluate(cache, params) for params in param_sets]
+
+    segments = []
+    specs = {}
+    try:
+        for name in ('close', 'volume'):
+            array = np.ascontiguousarray(panel[name])
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            segments.append(segment)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[:] = array
+            specs[name] = (segment.name, array.shape, array.dtype.str)
+
+        chunks = [param_sets[i:i + CHUNK_SIZE] for i in range(0, len(param_sets), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(specs,)) as pool:
+            return [result for chunk in pool.map(_run_chunk, chunks) for result in chunk]
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+
+def _values(text: str, cast=float) -> list:
+    return [cast(v) for v in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep MA/RSI/volume strategy parameters over stored bars')
+    parser.add_argument('--db', default='stock_data.db', help='SQLite database with daily_prices')
+    parser.add_argument('--history', nargs='+', help='History JSON files to use instead of the database')
+    parser.add_argument('--tickers', help='Comma-separated tickers (database only)')
+    parser.add_argument('--fast', default='10,20', help='Fast MA periods')
+    parser.add_argument('--slow', default='50,100', help='Slow MA periods')
+    parser.add_argument('--rsi-period', default='14', help='RSI periods')
+    parser.add_argument('--rsi-max', default='70', help='Entry RSI ceilings')
+    parser.add_argument('--rsi-exit', default='80', help='Exit RSI levels')
+    parser.add_argument('--volume-mult', default='0', help='Entry volume multiples of the 20-day volume MA')
+    parser.add_argument('--cost-bps', default='5', help='Trading cost in basis points')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print, best Sharpe first')
+    args = parser.parse_args()
+
+    if args.history:
+        panel = load_panel_from_history(args.history)
+    else:
+        panel = load_panel_from_db(args.db, args.tickers.upper().split(',') if args.tickers else None)
+    print(f"Loaded {len(panel['dates'])} days x {len(panel['tickers'])} tickers")
+
+    grid = {
+        'fast': _values(args.fast, int),
+        'slow': _values(args.slow, int),
+        'rsi_period': _values(args.rsi_period, int),
+        'rsi_max': _values(args.rsi_max),
+        'rsi_exit': _values(args.rsi_exit),
+        'volume_mult': _values(args.volume_mult),
+        'cost_bps': _values(args.cost_bps)
+    }
+    start = time.perf_counter()
+    results = sweep(panel, grid, args.workers)
+    print(f"Evaluated {len(results)} parameter sets in {time.perf_counter() - start:.1f}s")
+
+    results.sort(key=lambda r: r['sharpe'], reverse=True)
+    print(f"{'fast':>5} {'slow':>5} {'rsi':>4} {'max':>5} {'exit':>5} {'vol':>5} "
+          f"{'return':>8} {'sharpe':>7} {'maxdd':>7} {'turnover':>9}")
+    for r in results[:args.top]:
+        p = r['params']
+        print(f"{p['fast']:>5} {p['slow']:>5} {p['rsi_period']:>4} {p['rsi_max']:>5g} {p['rsi_exit']:>5g} "
+              f"{p['volume_mult']:>5g} {r['total_return']:>8.2%} {r['sharpe']:>7.2f} "
+              f"{r['max_drawdown']:>7.2%} {r['turnover']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from yahoo_parser import BeautifulSoup, parse_history, parse_pages, parse_quote
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'yahoo')
+
+
+def load_fixtures(fixture_dir: str = FIXTURE_DIR) -> list:
+    """Saved pages as (kind, ticker, html); files are named <kind>_<TICKER>.html"""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, '*.html'))):
+        kind, ticker = os.path.splitext(os.path.basename(path))[0].split('_', 1)
+        with open(path, 'r', encoding='utf-8') as f:
+            fixtures.append((kind, ticker, f.read()))
+    return fixtures
+
+
+def parse(kind: str, ticker: str, html: str, mode: str):
+    return parse_quote(html, ticker, mode) if kind == 'quote' else parse_history(html, mode)
+
+
+def check(kind: str, ticker: str, html: str) -> str:
+    """Compare the fast parser against the BeautifulSoup reference on one page"""
+    fast = parse(kind, ticker, html, 'fast')
+    if fast is None:
+        return 'FAIL: no data'
+    if BeautifulSoup is None:
+        return f'ok ({len(fast)} values, reference skipped: bs4 not installed)'
+    soup = parse(kind, ticker, html, 'soup')
+    if kind == 'quote':
+        fast, soup = ({k: v for k, v in d.items() if k != 'timestamp'} for d in (fast, soup))
+        return 'ok' if fast == soup else f'FAIL: {fast} != {soup}'
+    try:
+        # The table shows two decimals; an embedded blob carries full precision
+        pd.testing.assert_frame_equal(fast, soup, check_freq=False, check_exact=False, rtol=0, atol=0.006)
+    except AssertionError as e:
+        return f'FAIL: {e}'
+    return f'ok ({len(fast)} rows)'
+
+
+def timed(fn, repeat: int) -> float:
+    """Best-of-three milliseconds per call"""
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time the Yahoo page parsers on saved pages')
+    parser.add_argument('--fixtures', default=FIXTURE_DIR, help='Directory of saved <kind>_<TICKER>.html pages')
+    parser.add_argument('--repeat', type=int, default=5, help='Parses per timing run')
+    parser.add_argument('--batch', type=int, default=64, help='Pages in the pooled batch run')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the batch (default: CPU count)')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f'No fixtures in {args.fixtures}')
+        return
+
+    print(f"{'page':<20} {'check':<40} {'fast ms':>9} {'soup ms':>9} {'speedup':>8}")
+    for kind, ticker, html in fixtures:
+        fast_ms = timed(lambda: parse(kind, ticker, html, 'fast'), args.repeat)
+        if BeautifulSoup is not None:
+            soup_ms = timed(lambda: parse(kind, ticker, html, 'soup'), args.repeat)
+            soup_col, speedup = f'{soup_ms:9.2f}', f'{soup_ms / fast_ms:7.1f}x'
+        else:
+            soup_col, speedup = f"{'-':>9}", f"{'-':>8}"
+        print(f'{kind + "_" + ticker:<20} {check(kind, ticker, html)[:40]:<40} {fast_ms:9.2f} {soup_col} {speedup}')
+
+    # Many queued history pages at once, serial vs pooled
+    pages = [(ticker, html) for kind, ticker, html in fixtures if kind == 'history']
+    if pages:
+        batch = (pages * (args.batch // len(pages) + 1))[:args.batch]
+        for label, workers in (('serial', 1), ('pooled', args.workers)):
+            start = time.perf_counter()
+            parse_pages(batch, 'history', 'fast', workers)
+            elapsed = time.perf_counter() - start
+            print(f'{label:<7} {len(batch)} history pages: {elapsed:.2f}s ({len(batch) / elapsed:.0f} pages/s)')
+
+
+if __name__ == '__main__':
+    main()
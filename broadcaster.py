@@ -0,0 +1,87 @@
+import asyncio
+import itertools
+from collections import defaultdict
+from typing import Iterable
+
+from serialization import dumps
+
+# Events buffered per subscriber before the oldest ones are dropped
+QUEUE_SIZE = 100
+
+KEEP_ALIVE = b': keep-alive\n\n'
+
+
+def format_event(event: str, data, event_id: int) -> bytes:
+    """Encode a Server-Sent Events frame"""
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (event_id, event.encode(), dumps(data))
+
+
+class Broadcaster:
+    """In-process fan-out of live updates to Server-Sent Events subscribers
+
+    Each published event is encoded once and the same frame is queued for
+    every subscriber of its topic, so the cost of an update does not depend
+    on how many tabs are listening. Topics are ticker symbols plus 'market'
+    for dashboard-wide summaries.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._retained = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({queue for queues in self._subscribers.values() for queue in queues})
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscribers.get(topic))
+
+    def subscribe(self, topics: Iterable[str]) -> asyncio.Queue:
+        """Register a subscriber and replay the retained event of each topic"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for topic in topics:
+            self._subscribers[topic].add(queue)
+            if topic in self._retained:
+                queue.put_nowait(self._retained[topic])
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, topics: Iterable[str]):
+        """Remove a subscriber from its topics"""
+        for topic in topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def publish(self, topic: str, event: str, data, retain: bool = False):
+        """Queue an event for every subscriber of a topic
+
+        Must be called from the event loop thread; use publish_threadsafe
+        from ingestion threads.
+
+        Args:
+            topic: Ticker symbol or 'market'
+            event: SSE event name, e.g. 'bar' or 'summary'
+            data: JSON-serializable payload
+            retain: Keep the frame and replay it to new subscribers
+        """
+        frame = format_event(event, data, next(self._ids))
+        if retain:
+            self._retained[topic] = frame
+
+        for queue in self._subscribers.get(topic, ()):
+            if queue.full():
+                # Slow client: drop its oldest event rather than block the publisher
+                queue.get_nowait()
+            queue.put_nowait(frame)
+
+    def publish_threadsafe(self, loop: asyncio.AbstractEventLoop, topic: str, event: str, data, retain: bool = False):
+        """Publish from a thread other than the event loop's"""
+        loop.call_soon_threadsafe(self.publish, topic, event, data, retain)
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,268 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+# Rolling windows (in trading days) that can be requested; each is cached separately
+WINDOWS = (20, 60, 120, 252)
+
+# Tickers per block when accumulating cross products. A 256-ticker block of a
+# 252-day window is about 0.5 MB, so each block product stays cache resident.
+BLOCK_SIZE = 256
+
+# Overlapping days required before a pair gets a correlation
+MIN_OVERLAP = 10
+
+# Incremental updates before the sums are rebuilt to shed floating point drift
+REBUILD_EVERY = 20
+
+# Memory the cached windows may hold together; least recently read windows
+# are dropped past it. One window at 3,000 tickers is about 250 MB.
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def align_closes(tickers: np.ndarray, dates: np.ndarray, closes: np.ndarray, symbols: Optional[np.ndarray] = None):
+    """Pivot (ticker, date, close) rows into a dates x tickers matrix
+
+    Args:
+        tickers: Ticker of each row
+        dates: Date of each row (datetime64[D])
+        closes: Close of each row
+        symbols: Sorted column order to use; defaults to the distinct tickers
+
+    Returns:
+        Tuple of (symbols, distinct dates, matrix) with NaN where a ticker has no bar
+    """
+    if symbols is None:
+        symbols = np.unique(tickers)
+    col = np.searchsorted(symbols, tickers)
+    days, row = np.unique(dates, return_inverse=True)
+    matrix = np.full((len(days), len(symbols)), np.nan)
+    matrix[row, col] = closes
+    return symbols, days, matrix
+
+
+def log_returns(closes: np.ndarray) -> np.ndarray:
+    """Daily log returns of a dates x tickers close matrix; NaN across missing bars"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.diff(np.log(closes), axis=0)
+
+
+class CorrelationWindow:
+    """Pairwise-complete moment sums over a rolling window of daily returns
+
+    Holds, for every ticker pair (i, j), the sums over the days both traded
+    of x_i * x_j, x_i, x_i ** 2 and the day count. Correlation and covariance
+    for any subset are derived from those sums on demand, and sliding the
+    window forward is a signed rank-k update of the sums rather than a
+    recomputation. Memory is about 28 * n ** 2 bytes for n tickers (three
+    float64 and one int32 matrix, roughly 250 MB at 3,000 tickers),
+    independent of the window length.
+    """
+
+    def __init__(self, window: int, tickers: np.ndarray, dates: np.ndarray, returns: np.ndarray):
+        """Build the sums from the latest returns
+
+        Args:
+            window: Window length in trading days
+            tickers: Sorted ticker symbols, one per returns column
+            dates: Date of each returns row
+            returns: (days x tickers) daily returns, NaN where missing; at most window rows
+        """
+        n = len(tickers)
+        self.window = window
+        self.tickers = tickers
+        self.dates = dates
+        self.returns = returns
+        self.updates = 0
+        self.xy = np.zeros((n, n))
+        self.xv = np.zeros((n, n))
+        self.x2v = np.zeros((n, n))
+        self.count = np.zeros((n, n), dtype=np.int32)
+        self._accumulate(returns, np.ones(len(returns)))
+
+    @property
+    def as_of(self) -> Optional[str]:
+        return str(self.dates[-1]) if len(self.dates) else None
+
+    @property
+    def nbytes(self) -> int:
+        return self.xy.nbytes + self.xv.nbytes + self.x2v.nbytes + self.count.nbytes + self.returns.nbytes
+
+    def _accumulate(self, returns: np.ndarray, weights: np.ndarray):
+        """Add weighted rows into the sums, one cache-sized ticker block pair at a time
+
+        A weight of -1 removes a row, so a window slide adds the new days and
+        drops the old ones in the same pass.
+        """
+        valid = ~np.isnan(returns)
+        x = np.where(valid, returns, 0.0)
+        v = valid.astype(np.float64)
+        wx = x * weights[:, None]
+        wv = v * weights[:, None]
+        wx2 = wx * x
+
+        n = x.shape[1]
+        for i in range(0, n, BLOCK_SIZE):
+            bi = slice(i, i + BLOCK_SIZE)
+            for j in range(i, n, BLOCK_SIZE):
+                bj = slice(j, j + BLOCK_SIZE)
+                # xy and count are symmetric, so the lower blocks are mirrored
+                block = wx[:, bi].T @ x[:, bj]
+                self.xy[bi, bj] += block
+                counts = np.rint(wv[:, bi].T @ v[:, bj]).astype(np.int32)
+                self.count[bi, bj] += counts
+                self.xv[bi, bj] += wx[:, bi].T @ v[:, bj]
+                self.x2v[bi, bj] += wx2[:, bi].T @ v[:, bj]
+                if j != i:
+                    self.xy[bj, bi] += block.T
+                    self.count[bj, bi] += counts.T
+                    self.xv[bj, bi] += wx[:, bj].T @ v[:, bi]
+                    self.x2v[bj, bi] += wx2[:, bj].T @ v[:, bi]
+
+    def advance(self, dates: np.ndarray, returns: np.ndarray):
+        """Slide the window forward by the given new return rows
+
+        Args:
+            dates: Dates of the new rows, all after the window's last date
+            returns: (new days x tickers) returns in this window's column order
+        """
+        drop = max(0, len(self.returns) + len(returns) - self.window)
+        self._accumulate(
+            np.vstack([self.returns[:drop], returns]),
+            np.r_[-np.ones(drop), np.ones(len(returns))]
+        )
+        self.returns = np.vstack([self.returns[drop:], returns])
+        self.dates = np.concatenate([self.dates[drop:], dates])
+        self.updates += 1
+
+    def _indices(self, tickers: Optional[List[str]]) -> np.ndarray:
+        if tickers is None:
+            return np.arange(len(self.tickers))
+        idx = np.searchsorted(self.tickers, tickers)
+        idx = np.minimum(idx, len(self.tickers) - 1)
+        missing = [t for t, i in zip(tickers, idx) if self.tickers[i] != t]
+        if missing:
+            raise KeyError(f'No price history for {", ".join(missing)}')
+        return idx
+
+    def _moments(self, rows: np.ndarray, cols: np.ndarray):
+        """Pairwise-complete covariance and the two variances for rows x cols"""
+        n = self.count[np.ix_(rows, cols)].astype(np.float64)
+        sx = self.xv[np.ix_(rows, cols)]
+        sy = self.xv[np.ix_(cols, rows)].T
+        sxx = self.x2v[np.ix_(rows, cols)]
+        syy = self.x2v[np.ix_(cols, rows)].T
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self.xy[np.ix_(rows, cols)] - sx * sy / n) / (n - 1)
+            var_x = (sxx - sx * sx / n) / (n - 1)
+            var_y = (syy - sy * sy / n) / (n - 1)
+        cov[n < MIN_OVERLAP] = np.nan
+        return cov, var_x, var_y
+
+    def covariance(self, tickers: Optional[List[str]] = None) -> np.ndarray:
+        """Daily return covariance matrix for the given tickers, or all of them"""
+        idx = self._indices(tickers)
+        return self._moments(idx, idx)[0]
+
+    def correlation(self, tickers: Optional[List[str]] = None) -> np.ndarray:
+        """Daily return correlation matrix for the given tickers, or all of them"""
+        idx = self._indices(tickers)
+        return self._correlation(idx, idx)
+
+    def _correlation(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        cov, var_x, var_y = self._moments(rows, cols)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.sqrt(var_x * var_y)
+        return np.clip(corr, -1.0, 1.0)
+
+    def top_correlated(self, ticker: str, limit: int = 10) -> tuple:
+        """Tickers most correlated with one ticker
+
+        Returns:
+            Tuple of (tickers, correlations), highest first, excluding the ticker itself
+        """
+        row = self._indices([ticker])
+        corr = self._correlation(row, np.arange(len(self.tickers)))[0]
+        corr[row[0]] = np.nan
+        order = np.argsort(-np.nan_to_num(corr, nan=-np.inf), kind='stable')
+        order = order[~np.isnan(corr[order])][:limit]
+        return self.tickers[order], corr[order]
+
+
+class CorrelationService:
+    """Correlation windows cached per window length and kept current as bars arrive
+
+    When the market data version moves to a later date, each cached window
+    is advanced with just the new days' returns. A version change without a
+    later date (a restatement of existing bars), new tickers and every
+    REBUILD_EVERY-th update fall back to a full rebuild. Cached windows are
+    held to max_bytes together, so a large universe keeps only the windows
+    read most recently (always at least the one just read).
+    """
+
+    def __init__(self, load_closes: Callable[..., tuple], max_bytes: int = MAX_CACHE_BYTES):
+        """Initialize the service
+
+        Args:
+            load_closes: Called as load_closes(sessions=n) for the last n trading
+                days or load_closes(from_date=d) for every bar on or after d, and
+                returns (tickers, dates, closes) row arrays
+            max_bytes: Memory budget for the cached windows
+        """
+        self.load_closes = load_closes
+        self.max_bytes = max_bytes
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, window: int, version, reader: Callable[[CorrelationWindow], object]):
+        """Run reader against the window for a length at the given market data version
+
+        Windows are advanced in place, so reads and updates are serialized
+        under one lock; both are fast next to a rebuild, which is rare.
+        """
+        if window not in WINDOWS:
+            raise ValueError(f'Unsupported window {window}; expected one of {", ".join(map(str, WINDOWS))}')
+
+        with self._lock:
+            entry = self._windows.get(window)
+            if not entry or entry['version'] != version:
+                result = None
+                if entry and version and entry['window'].as_of and str(version[0]) > entry['window'].as_of \
+                        and entry['window'].updates < REBUILD_EVERY:
+                    result = self._advance(entry['window'], window)
+                if result is None:
+                    result = self._build(window)
+                entry = self._windows[window] = {'version': version, 'window': result}
+            self._windows.move_to_end(window)
+            self._evict()
+            return reader(entry['window'])
+
+    def _evict(self):
+        """Drop least recently read windows until the cache fits max_bytes"""
+        total = sum(entry['window'].nbytes for entry in self._windows.values())
+        while total > self.max_bytes and len(self._windows) > 1:
+            _, entry = self._windows.popitem(last=False)
+            total -= entry['window'].nbytes
+
+    def _build(self, window: int) -> CorrelationWindow:
+        tickers, dates, closes = self.load_closes(sessions=window + 1)
+        symbols, days, matrix = align_closes(tickers, dates, closes)
+        return CorrelationWindow(window, symbols, days[1:], log_returns(matrix))
+
+    def _advance(self, current: CorrelationWindow, window: int) -> Optional[CorrelationWindow]:
+        """Advance a window in place with the days after its last date, or None to rebuild"""
+        tickers, dates, closes = self.load_closes(from_date=current.as_of)
+        if not np.isin(tickers, current.tickers).all():
+            return None
+        _, days, matrix = align_closes(tickers, dates, closes, current.tickers)
+        if len(days) < 2 or str(days[0]) != current.as_of or len(days) - 1 >= window:
+            return None
+        current.advance(days[1:], log_returns(matrix))
+        return current
+
+    def invalidate(self):
+        with self._lock:
+            self._windows.clear()
@@ -0,0 +1,128 @@
+import numpy as np
+
+from cache import LRUCache
+from serialization import INDICATOR_DECIMALS, map_series, price_columns
+
+# Downsampled payloads kept per (ticker, data version, range, points)
+CACHE_SIZE = 256
+
+# Accepted ?points= range: LTTB keeps the first and last points plus at
+# least one bucket, and no chart needs more bars than a screen has pixels
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Select the indices of a line series with Largest-Triangle-Three-Buckets
+
+    Bars are evenly spaced in trading days, so the bar index is used as x.
+    Each bucket's triangle areas are computed in one vectorized step; only
+    the walk from bucket to bucket is sequential, because every choice
+    depends on the previously selected point.
+
+    Args:
+        y: Series values without gaps
+        threshold: Number of points to keep, including the first and last
+
+    Returns:
+        Sorted array of selected indices
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    # threshold - 2 buckets over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def ohlc_buckets(columns: dict, points: int) -> tuple:
+    """Aggregate OHLCV columns into at most points equal-count buckets
+
+    Each bucket keeps the first open, highest high, lowest low, last close
+    and total volume, so candle extremes survive the reduction.
+
+    Returns:
+        Tuple of (bucket start indices, aggregated columns)
+    """
+    n = len(columns['close'])
+    starts = np.unique(np.linspace(0, n, points + 1).astype(np.int64)[:-1])
+    ends = np.append(starts[1:], n) - 1
+
+    return starts, {
+        'open': columns['open'][starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': columns['close'][ends],
+        'volume': np.add.reduceat(columns['volume'], starts)
+    }
+
+
+def _downsample_series(values, dates: np.ndarray, points: int) -> dict:
+    """LTTB-reduce an indicator list, skipping its leading warm-up nulls"""
+    arr = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(arr))
+    if not valid.size:
+        return {'offset': 0, 'dates': [], 'values': np.empty(0)}
+
+    offset = int(valid[0])
+    # Interior gaps are not expected in rolling indicators; carry the last value over any that occur
+    series = arr[offset:]
+    mask = np.isnan(series)
+    if mask.any():
+        series = series.copy()
+        idx = np.where(~mask, np.arange(len(series)), 0)
+        np.maximum.accumulate(idx, out=idx)
+        series = series[idx]
+
+    picked = lttb_indices(series, points)
+    return {
+        'offset': 0,
+        'dates': dates[offset + picked].tolist(),
+        'values': np.round(series[picked], INDICATOR_DECIMALS)
+    }
+
+
+def downsample(prices: list, indicators: dict, points: int) -> dict:
+    """Build a columnar payload reduced to about points bars
+
+    Candles are bucketed with OHLC-preserving aggregation; indicator lines are
+    reduced with LTTB and carry their own dates, since the points LTTB picks
+    do not line up with the candle buckets.
+    """
+    if not MIN_POINTS <= points <= MAX_POINTS:
+        raise ValueError(f'points must be between {MIN_POINTS} and {MAX_POINTS}')
+    n = len(prices)
+    dates = np.array([str(p['date']) for p in prices])
+    starts, buckets = ohlc_buckets(price_columns(prices), points)
+    return {
+        'format': 'columnar',
+        'downsampled': True,
+        'source_bars': n,
+        'dates': dates[starts].tolist(),
+        'prices': buckets,
+        'indicators': map_series(indicators, lambda values: _downsample_series(values, dates, points))
+    }
+
+
+downsample_cache = LRUCache(CACHE_SIZE)
@@ -0,0 +1,259 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a source's breaker
+FAILURE_THRESHOLD = 5
+
+# Seconds an open breaker waits before letting a probe through; doubles while probes keep failing
+RESET_TIMEOUT = 30.0
+MAX_RESET_TIMEOUT = 900.0
+
+# Concurrent requests per source: start, floor and ceiling for the AIMD limit
+INITIAL_LIMIT = 2.0
+MIN_LIMIT = 1.0
+MAX_LIMIT = 16.0
+
+# Multiplicative decrease on a 429, applied at most once per cooldown so a
+# burst of throttled responses from one window counts as a single signal
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 2.0
+
+# Retries within one source before falling through to the next
+ATTEMPTS = 2
+RETRY_BASE = 0.5
+RETRY_CAP = 5.0
+
+
+class Throttled(Exception):
+    """The source answered 429 (or equivalent)"""
+
+    def __init__(self, message: str = 'throttled', retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one upstream source
+
+    Closed lets every call through and counts consecutive failures. Once
+    they reach the threshold the breaker opens and rejects calls outright.
+    After reset_timeout it turns half-open and admits a single probe: a
+    success closes it, a failure reopens it with a doubled timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT,
+                 max_reset_timeout: float = MAX_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; a half-open breaker admits one probe at a time"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._open()
+            elif self._state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker admits a probe"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one upstream source
+
+    Every success raises the limit by 1/limit, so a full window of
+    successes adds one slot; a throttled response halves it. Callers over
+    the limit wait for a slot instead of sleeping a fixed time.
+    """
+
+    def __init__(self, initial: float = INITIAL_LIMIT, min_limit: float = MIN_LIMIT, max_limit: float = MAX_LIMIT,
+                 decrease_factor: float = DECREASE_FACTOR, decrease_cooldown: float = DECREASE_COOLDOWN):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the source's concurrent slots for the duration of a request"""
+        with self._cond:
+            while True:
+                wait = self._blocked_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def record_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = now
+            if retry_after:
+                # Honour Retry-After for everyone waiting on this source, not just the caller
+                self._blocked_until = max(self._blocked_until, now + min(retry_after, RETRY_CAP))
+
+
+class Source:
+    """An upstream data source guarded by a breaker and an adaptive limiter"""
+
+    def __init__(self, name: str, breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[AdaptiveLimiter] = None):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or AdaptiveLimiter()
+
+    def call(self, fetch: Callable, *args, **kwargs):
+        """Run fetch under the source's guards
+
+        Returns whatever fetch returns; None means the source answered but
+        had no data, which is not held against it.
+
+        Raises:
+            Throttled, or whatever fetch raised; both count as failures
+        """
+        with self.limiter.slot():
+            try:
+                result = fetch(*args, **kwargs)
+            except Throttled as e:
+                self.limiter.record_throttle(e.retry_after)
+                self.breaker.record_failure()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+        self.limiter.record_success()
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            'state': self.breaker.state,
+            'failures': self.breaker.failures,
+            'retry_in': round(self.breaker.retry_in(), 1),
+            'limit': round(self.limiter.limit, 2),
+            'in_flight': self.limiter.in_flight
+        }
+
+
+# Shared by every scraper in the process, so one caller's failures protect the others
+SOURCES: Dict[str, Source] = {}
+_sources_lock = threading.Lock()
+
+
+def get_source(name: str) -> Source:
+    with _sources_lock:
+        if name not in SOURCES:
+            SOURCES[name] = Source(name)
+        return SOURCES[name]
+
+
+def fetch_with_fallback(chain: List[tuple], *args, label: str = '', attempts: int = ATTEMPTS, **kwargs):
+    """Try each (source name, fetch) in order and return the first non-None result
+
+    Sources whose breaker is open are skipped without a request. A failing
+    source is retried after a short jittered delay only while its breaker
+    still allows it; otherwise the chain moves straight on.
+
+    Returns:
+        The first result, or None when every source failed or was skipped
+    """
+    for name, fetch in chain:
+        source = get_source(name)
+        for attempt in range(attempts):
+            if not source.breaker.allow():
+                logger.info(f'Skipping {name} for {label}: circuit open for another {source.breaker.retry_in():.0f}s')
+                break
+            try:
+                result = source.call(fetch, *args, **kwargs)
+            except Throttled as e:
+                logger.warning(f'{name} throttled {label} (attempt {attempt + 1}), concurrency limit now {source.limiter.limit:.2f}')
+                # The limiter already holds every caller back for Retry-After
+                delay = 0.0 if e.retry_after else None
+            except Exception as e:
+                logger.warning(f'{name} failed for {label} (attempt {attempt + 1}): {e}')
+                delay = None
+            else:
+                if result is not None:
+                    logger.info(f'Fetched {label} from {name}')
+                    return result
+                # An empty answer will not change on retry
+                break
+            # Once the breaker has tripped, waiting here cannot help; move on
+            if attempt + 1 < attempts and source.breaker.state == CircuitBreaker.CLOSED:
+                time.sleep(random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** attempt)) if delay is None else delay)
+    logger.warning(f'All sources failed for {label}')
+    return None
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+MIN_COMPRESS_SIZE = 1024
+
+# How long a ticker's data version is trusted before it is re-read from the database
+VERSION_TTL = int(os.getenv('DATA_VERSION_TTL', 30))
+
+CACHE_CONTROL = 'no-cache'
+
+
+class DataVersionCache:
+    """In-process cache of each ticker's (last bar date, ingest version)
+
+    Conditional requests are answered from this cache, so a matching
+    If-None-Match never reaches the database while the entry is fresh.
+    Ingestion can push new versions with set() or drop them with invalidate().
+    """
+
+    def __init__(self, ttl: int = VERSION_TTL):
+        self.ttl = ttl
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, ticker: str, loader: Callable[[str], Optional[Tuple[str, str]]]) -> Optional[Tuple[str, str]]:
+        """Return the cached version for a ticker, loading it when stale
+
+        Args:
+            ticker: Stock symbol
+            loader: Called with the ticker on a miss; returns
+                (last_date, ingest_version) or None when there is no data
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._versions.get(ticker)
+        if entry and now - entry[1] <= self.ttl:
+            return entry[0]
+
+        version = loader(ticker)
+        if version is not None:
+            with self._lock:
+                self._versions[ticker] = (version, now)
+        return version
+
+    def set(self, ticker: str, last_date: str, ingest_version: str):
+        """Record a version pushed by ingestion"""
+        with self._lock:
+            self._versions[ticker] = ((str(last_date), str(ingest_version)), time.monotonic())
+
+    def invalidate(self, ticker: Optional[str] = None):
+        """Forget one ticker's version, or all of them"""
+        with self._lock:
+            if ticker is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(ticker, None)
+
+
+data_versions = DataVersionCache()
+
+
+def make_etag(ticker: str, version: Tuple[str, str], variant: str = '') -> str:
+    """Build a strong ETag from a ticker's data version and the response variant
+
+    The variant covers anything else that changes the body, such as the
+    payload format or the query window.
+    """
+    last_date, ingest_version = version
+    digest = hashlib.sha1(f'{ticker}|{last_date}|{ingest_version}|{variant}'.encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress a response body with the best encoding the client accepts
+
+    Returns:
+        Tuple of (body, content_encoding); content_encoding is None when the
+        body is sent uncompressed
+    """
+    if len(body) < MIN_COMPRESS_SIZE or not accept_encoding:
+        return body, None
+
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in accept_encoding.split(',')
+        if not part.strip().endswith('q=0')
+    }
+    if brotli is not None and 'br' in accepted:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in accepted:
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+
+def cache_headers(etag: Optional[str], encoding: Optional[str] = None) -> dict:
+    """Headers shared by full and 304 responses"""
+    headers = {'Vary': 'Accept-Encoding'}
+    if etag:
+        headers['ETag'] = etag
+        headers['Cache-Control'] = CACHE_CONTROL
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return headers
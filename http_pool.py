@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # httpx speaks HTTP/2 only with the h2 extra installed
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 15.0
+# Longest wait for a free pooled connection before giving up
+POOL_TIMEOUT = 10.0
+
+# Keep-alive connections per (proxy, host)
+CONNECTIONS_PER_HOST = 10
+KEEPALIVE_EXPIRY = 30.0
+
+# Requests in flight across all proxies
+MAX_IN_FLIGHT = 32
+
+# Consecutive failures that bench a proxy, and for how long
+PROXY_FAILURE_THRESHOLD = 3
+PROXY_COOLDOWN = 60.0
+
+# Weight of the newest sample in a proxy's latency average
+LATENCY_ALPHA = 0.2
+
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache'
+}
+
+
+def proxy_configs(proxies) -> List[Optional[Dict[str, str]]]:
+    """Normalize the scraper's proxies setting into one config per rotation slot
+
+    Same semantics as the old session pool: a list rotates through its
+    entries (a string proxies both schemes, a dict maps scheme to proxy),
+    a single config applies to every request, and None goes direct.
+    """
+    if not proxies:
+        return [None]
+    if not isinstance(proxies, list):
+        proxies = [proxies]
+    return [{'http': p, 'https': p} if isinstance(p, str) else p for p in proxies]
+
+
+class ProxyHealth:
+    """Success, failure and latency tracking for one proxy slot"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency = None
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def score(self) -> float:
+        """Lower is better: expected wait given what is already queued on this proxy"""
+        return (self.in_flight + 1) * (self.latency or 1.0)
+
+    def record(self, ok: bool, elapsed: float):
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.latency = elapsed if self.latency is None else (
+                LATENCY_ALPHA * elapsed + (1 - LATENCY_ALPHA) * self.latency
+            )
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= PROXY_FAILURE_THRESHOLD:
+                benched = self.cooldown_until > time.monotonic()
+                self.cooldown_until = time.monotonic() + PROXY_COOLDOWN
+                if not benched:
+                    logger.warning(f'Benching proxy {self.label} for {PROXY_COOLDOWN:.0f}s after '
+                                   f'{self.consecutive_failures} consecutive failures')
+
+    def stats(self) -> dict:
+        return {
+            'proxy': self.label,
+            'successes': self.successes,
+            'failures': self.failures,
+            'latency_ms': round(self.latency * 1000) if self.latency is not None else None,
+            'in_flight': self.in_flight,
+            'benched_for': round(max(0.0, self.cooldown_until - time.monotonic()), 1)
+        }
+
+
+class AsyncHTTPPool:
+    """Keep-alive HTTP client pool with proxy rotation and health tracking
+
+    Each (proxy, host) pair gets its own connection pool, speaking HTTP/2
+    when h2 is installed. Requests go to the available proxy with the
+    lowest latency-weighted load, so a slow proxy gets fewer of them; one
+    that keeps failing is benched for a cooldown, and a request that could
+    not connect through it is retried once through another.
+
+    Async callers await get(); threaded code such as the scrapers calls
+    fetch(), which runs the request on the pool's own event loop thread.
+    """
+
+    def __init__(self, proxies=None, user_agents: Optional[List[str]] = None,
+                 connections_per_host: int = CONNECTIONS_PER_HOST, http2: bool = True,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_in_flight: int = MAX_IN_FLIGHT):
+        self.proxies = proxy_configs(proxies)
+        self.user_agents = user_agents
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=connections_per_host,
+            max_keepalive_connections=connections_per_host,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=POOL_TIMEOUT)
+        self.health = [
+            ProxyHealth(str(proxy.get('https') or proxy.get('http')) if proxy else 'direct')
+            for proxy in self.proxies
+        ]
+        self._clients = {}
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _client(self, slot: int, host: str) -> httpx.AsyncClient:
+        key = (slot, host)
+        if key not in self._clients:
+            proxy = self.proxies[slot] or {}
+            self._clients[key] = httpx.AsyncClient(
+                mounts={
+                    f'{scheme}://': httpx.AsyncHTTPTransport(
+                        proxy=proxy.get(scheme), http2=self.http2, limits=self.limits
+                    )
+                    for scheme in ('http', 'https')
+                },
+                timeout=self.timeout,
+                headers=DEFAULT_HEADERS,
+                follow_redirects=True
+            )
+        return self._clients[key]
+
+    def _pick(self, exclude: int = None) -> int:
+        now = time.monotonic()
+        available = [i for i, health in enumerate(self.health) if health.available(now) and i != exclude]
+        if not available:
+            # Everything is benched: probe whichever comes back first
+            return min(range(len(self.health)), key=lambda i: self.health[i].cooldown_until)
+        best = min(self.health[i].score() for i in available)
+        return random.choice([i for i in available if self.health[i].score() == best])
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET url through the healthiest proxy
+
+        Raises:
+            httpx.HTTPError on connect, read or proxy failures
+        """
+        headers = kwargs.pop('headers', {})
+        if self.user_agents:
+            headers.setdefault('User-Agent', random.choice(self.user_agents))
+        async with self._slots:
+            slot = self._pick()
+            try:
+                return await self._get_via(slot, url, headers, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ProxyError):
+                # Nothing reached the server, so another proxy can safely take it
+                if len(self.proxies) == 1:
+                    raise
+                return await self._get_via(self._pick(exclude=slot), url, headers, **kwargs)
+
+    async def _get_via(self, slot: int, url: str, headers: dict, **kwargs) -> httpx.Response:
+        health = self.health[slot]
+        health.in_flight += 1
+        start = time.monotonic()
+        try:
+            response = await self._client(slot, urlsplit(url).netloc).get(url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            health.record(False, time.monotonic() - start)
+            raise
+        finally:
+            health.in_flight -= 1
+        # Throttling and proxy errors reflect on the exit IP; a 404 does not
+        health.record(response.status_code < 400 or response.status_code == 404, time.monotonic() - start)
+        return response
+
+    async def get_many(self, urls: List[str], **kwargs) -> list:
+        """GET many urls concurrently; failures come back as exceptions in place"""
+        return await asyncio.gather(*(self.get(url, **kwargs) for url in urls), return_exceptions=True)
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+    def _run(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='http-pool', daemon=True)
+                self._thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def fetch(self, url: str, **kwargs) -> httpx.Response:
+        """Blocking get() for threaded callers; requests from all threads share the pools"""
+        return self._run(self.get(url, **kwargs))
+
+    def fetch_many(self, urls: List[str], **kwargs) -> list:
+        """Blocking get_many()"""
+        return self._run(self.get_many(urls, **kwargs))
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+    def stats(self) -> list:
+        return [health.stats() for health in self.health]
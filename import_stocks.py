@@ -1,28 +1,77 @@
 from db import get_db_connection, init_stock_data
-import time
-import random
+import argparse
+import asyncio
+import logging
 import sys
+from datetime import datetime
+from job_queue import JobQueue, Scheduler, MAX_ATTEMPTS
+from precompute import run_precompute, DB_PATH
+
+COMMANDS = ('enqueue', 'run', 'status', 'retry-dead')
+
+def run_queue(queue, concurrency, report_every):
+    """Drain the queue, then refresh precomputed data for what was imported"""
+    scheduler = Scheduler(queue, init_stock_data, concurrency=concurrency, report_every=report_every)
+    imported = asyncio.run(scheduler.run())
+
+    # Refresh precomputed snapshots and leaderboards for the imported tickers
+    if imported:
+        updated = run_precompute(queue.db_path, sorted(set(imported)))
+        print(f"Precomputed {len(updated)} tickers")
+    if scheduler.dead:
+        print(f"Dead-lettered: {', '.join(scheduler.dead)} (see 'status', requeue with 'retry-dead')")
+
+def print_status(queue):
+    counts = queue.counts()
+    print(' | '.join(f"{status} {counts.get(status, 0)}" for status in ('queued', 'running', 'done', 'dead')))
+    for job in queue.dead_letters():
+        failed_at = datetime.fromtimestamp(job['updated_at']).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"  {job['ticker']:<8} {job['attempts']} attempts, last failed {failed_at}: {job['last_error']}")
 
 def main():
-    # Get ticker from command line or use default
-    if len(sys.argv) > 1:
-        stocks = [sys.argv[1].upper()]
-    else:
-        stocks = ['AAPL']
-    
-    for stock in stocks:
-        retries = 3
-        while retries > 0:
-            print(f"Fetching data for {stock}...")
-            if init_stock_data(stock):
-                print(f"Successfully imported data for {stock}")
-                break
-            retries -= 1
-            if retries > 0:
-                # Longer delay between retries
-                delay = random.uniform(10, 15)
-                print(f"Retrying {stock} in {delay:.1f} seconds...")
-                time.sleep(delay)
+    # A bare ticker list keeps the old usage working: python import_stocks.py AAPL
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        argv = ['run'] + argv
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default=DB_PATH, help='SQLite database holding the job queue')
+    parser = argparse.ArgumentParser(description='Queue and run stock data imports')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = subparsers.add_parser('enqueue', help='Queue tickers without running them', parents=[common])
+    enqueue.add_argument('tickers', nargs='+')
+    enqueue.add_argument('--priority', type=int, default=None, help='Override the default priority')
+    enqueue.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+
+    run = subparsers.add_parser('run', help='Queue any given tickers, then run the queue until it is empty', parents=[common])
+    run.add_argument('tickers', nargs='*')
+    run.add_argument('--priority', type=int, default=None, help='Override the default priority')
+    run.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+    run.add_argument('--concurrency', type=int, default=4, help='Imports running at the same time')
+    run.add_argument('--report-every', type=float, default=10.0, help='Seconds between progress lines')
+
+    subparsers.add_parser('status', help='Show queue counts and dead-lettered jobs', parents=[common])
+
+    retry = subparsers.add_parser('retry-dead', help='Requeue dead-lettered jobs', parents=[common])
+    retry.add_argument('tickers', nargs='*', help='Only these tickers (default: all)')
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    queue = JobQueue(args.db)
+
+    if args.command in ('enqueue', 'run'):
+        # Default to AAPL when nothing is queued and no tickers were given
+        tickers = args.tickers or ([] if queue.counts().get('queued') else ['AAPL'])
+        if tickers:
+            added = queue.enqueue(tickers, priority=args.priority, max_attempts=args.max_attempts)
+            print(f"Queued {added} new jobs ({len(tickers) - added} already queued)")
+        if args.command == 'run':
+            run_queue(queue, args.concurrency, args.report_every)
+    elif args.command == 'status':
+        print_status(queue)
+    elif args.command == 'retry-dead':
+        print(f"Requeued {queue.retry_dead(args.tickers)} jobs")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# In-process budget for memoized indicator results
+MEMORY_LIMIT = int(os.getenv('INDICATOR_CACHE_MB', 64)) * 1024 * 1024
+
+# Shared on-disk tier, enabled by pointing this at a directory every worker can reach
+DISK_DIR = os.getenv('INDICATOR_CACHE_DIR')
+
+# Disk entries older than this are ignored and overwritten
+DISK_EXPIRE_AFTER = int(os.getenv('INDICATOR_CACHE_TTL', 86400))
+
+
+def estimate_size(value) -> int:
+    """Approximate memory held by an indicator result, in bytes"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        # Each slot is a pointer to a boxed float (or the shared None)
+        return 32 * len(value)
+    return 64
+
+
+class IndicatorMemo:
+    """Two-tier memo for indicator results
+
+    Keys are (ticker, data version, bar window, indicator parameters), so a
+    new ingest changes the key and stale results are never served. The
+    memory tier is an LRU capped by estimated bytes; the optional disk tier
+    stores pickles, like scrape_yahoo.cache_result, so that other worker
+    processes and cold starts can share results.
+    """
+
+    def __init__(self, max_bytes: int = MEMORY_LIMIT, disk_dir: Optional[str] = DISK_DIR,
+                 disk_expire_after: int = DISK_EXPIRE_AFTER):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_expire_after = disk_expire_after
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], object]):
+        """Return the memoized result for key, computing and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return self._entries[key][0]
+
+        value = self._read_disk(key)
+        if value is not None:
+            with self._lock:
+                self._stats['disk_hits'] += 1
+            self._store(key, value)
+            return value
+
+        value = compute()
+        with self._lock:
+            self._stats['misses'] += 1
+        self._store(key, value)
+        self._write_disk(key, value)
+        return value
+
+    def _store(self, key: tuple, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats['evictions'] += 1
+
+    def _disk_path(self, key: tuple) -> Path:
+        # repr of the key is stable across processes, unlike hash()
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return self.disk_dir / f'{digest}.pkl'
+
+    def _read_disk(self, key: tuple):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                timestamp, stored_key, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f'Error reading indicator cache: {e}')
+            return None
+        if stored_key != key or time.time() - timestamp > self.disk_expire_after:
+            return None
+        return value
+
+    def _write_disk(self, key: tuple, value):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp, 'wb') as f:
+                pickle.dump((time.time(), key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f'Error writing indicator cache: {e}')
+
+    def stats(self) -> dict:
+        """Hit and miss counters, hit ratio and memory use"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else None
+        stats['max_bytes'] = self.max_bytes
+        stats['disk_dir'] = str(self.disk_dir) if self.disk_dir else None
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+indicator_memo = IndicatorMemo()
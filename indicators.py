@@ -0,0 +1,341 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+# Longest period any indicator parameter may ask for
+MAX_PERIOD = 500
+
+# History the default set (MA50 is its longest window) needs before a window
+DEFAULT_LOOKBACK = 50
+
+# Intermediate nodes of the indicator graph: name -> function(ctx, *params) -> array
+NODES = {}
+
+# Selectable indicators: name -> (default parameters, function(ctx, *params))
+INDICATORS = {}
+
+# Shorthand names accepted in ?indicators=
+ALIASES = {'ma': 'sma', 'bb': 'bollinger', 'stoch': 'stochastic'}
+
+SPEC_PATTERN = re.compile(r'^([a-z_]+?)(\d+)?((?::[0-9.]+)*)(?:@(raw|adj))?$')
+
+# Price series an indicator can be computed on: raw stored bars, or bars
+# adjusted for splits and dividends (see adjustments.py)
+BASES = ('raw', 'adj')
+
+
+def node(name: str):
+    """Register an intermediate node that indicators and other nodes can share"""
+    def register(fn):
+        NODES[name] = fn
+        return fn
+    return register
+
+
+def indicator(name: str, *defaults):
+    """Register a selectable indicator with its default parameters"""
+    def register(fn):
+        INDICATORS[name] = (defaults, fn)
+        return fn
+    return register
+
+
+class IndicatorContext:
+    """Evaluates nodes of the indicator graph for one set of bars
+
+    Nodes are requested by key, e.g. ctx.get('ema', ('close',), 12), and
+    computed at most once per context, so indicators that share an
+    intermediate (an EMA chain, a rolling sum, the true range) reuse it.
+    A source is itself a node key, which lets nodes be chained.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self._memo = {}
+
+    def get(self, name: str, *params) -> np.ndarray:
+        key = (name,) + params
+        if key not in self._memo:
+            if name in FIELDS:
+                self._memo[key] = np.asarray(self.columns[name], dtype=np.float64)
+            else:
+                self._memo[key] = NODES[name](self, *params)
+        return self._memo[key]
+
+    @property
+    def evaluated(self) -> int:
+        """Number of distinct nodes computed so far"""
+        return len(self._memo)
+
+
+def _smooth(values: np.ndarray, alpha: float, period: int) -> np.ndarray:
+    """Exponential smoothing seeded with the simple average of the first period valid values"""
+    result = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < period:
+        return result
+    first = valid[0]
+    seed = first + period - 1
+    avg = values[first:seed + 1].mean()
+    result[seed] = avg
+    for i in range(seed + 1, len(values)):
+        avg += alpha * (values[i] - avg)
+        result[i] = avg
+    return result
+
+
+def trailing_sum(values: np.ndarray, period: int) -> np.ndarray:
+    """Sum over a trailing window along the first axis; NaN until period valid values in a row"""
+    valid = ~np.isnan(values)
+    zero = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([zero, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.concatenate([zero, np.cumsum(valid, axis=0)])
+    result = np.full(values.shape, np.nan)
+    if period <= len(values):
+        window_count = counts[period:] - counts[:-period]
+        result[period - 1:] = np.where(window_count == period, sums[period:] - sums[:-period], np.nan)
+    return result
+
+
+@node('rolling_sum')
+def _rolling_sum(ctx, source: tuple, period: int) -> np.ndarray:
+    return trailing_sum(ctx.get(*source), period)
+
+
+@node('square')
+def _square(ctx, source: tuple) -> np.ndarray:
+    return ctx.get(*source) ** 2
+
+
+@node('sma')
+def _sma(ctx, source: tuple, period: int) -> np.ndarray:
+    return ctx.get('rolling_sum', source, period) / period
+
+
+@node('std')
+def _std(ctx, source: tuple, period: int) -> np.ndarray:
+    """Population standard deviation over a trailing window, from the shared rolling sums"""
+    mean = ctx.get('sma', source, period)
+    mean_sq = ctx.get('rolling_sum', ('square', source), period) / period
+    return np.sqrt(np.maximum(mean_sq - mean ** 2, 0.0))
+
+
+@node('ema')
+def _ema(ctx, source: tuple, period: int) -> np.ndarray:
+    return _smooth(ctx.get(*source), 2 / (period + 1), period)
+
+
+@node('wilder')
+def _wilder(ctx, source: tuple, period: int) -> np.ndarray:
+    return _smooth(ctx.get(*source), 1 / period, period)
+
+
+@node('delta')
+def _delta(ctx, source: tuple) -> np.ndarray:
+    return np.r_[np.nan, np.diff(ctx.get(*source))]
+
+
+@node('gain')
+def _gain(ctx, source: tuple) -> np.ndarray:
+    d = ctx.get('delta', source)
+    return np.where(np.isnan(d), np.nan, np.maximum(d, 0.0))
+
+
+@node('loss')
+def _loss(ctx, source: tuple) -> np.ndarray:
+    d = ctx.get('delta', source)
+    return np.where(np.isnan(d), np.nan, np.maximum(-d, 0.0))
+
+
+@node('true_range')
+def _true_range(ctx) -> np.ndarray:
+    high, low, close = ctx.get('high'), ctx.get('low'), ctx.get('close')
+    prev_close = np.r_[np.nan, close[:-1]]
+    with np.errstate(invalid='ignore'):
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return tr
+
+
+@node('rolling_max')
+def _rolling_max(ctx, source: tuple, period: int) -> np.ndarray:
+    values = ctx.get(*source)
+    result = np.full(len(values), np.nan)
+    if period <= len(values):
+        result[period - 1:] = sliding_window_view(values, period).max(axis=1)
+    return result
+
+
+@node('rolling_min')
+def _rolling_min(ctx, source: tuple, period: int) -> np.ndarray:
+    values = ctx.get(*source)
+    result = np.full(len(values), np.nan)
+    if period <= len(values):
+        result[period - 1:] = sliding_window_view(values, period).min(axis=1)
+    return result
+
+
+@node('typical_price')
+def _typical_price(ctx) -> np.ndarray:
+    return (ctx.get('high') + ctx.get('low') + ctx.get('close')) / 3
+
+
+@node('macd_line')
+def _macd_line(ctx, fast: int, slow: int) -> np.ndarray:
+    return ctx.get('ema', ('close',), fast) - ctx.get('ema', ('close',), slow)
+
+
+@node('stoch_k')
+def _stoch_k(ctx, period: int) -> np.ndarray:
+    highest = ctx.get('rolling_max', ('high',), period)
+    lowest = ctx.get('rolling_min', ('low',), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100 * (ctx.get('close') - lowest) / (highest - lowest)
+    # A flat window has no range; report the midpoint rather than a division error
+    return np.where(highest == lowest, 50.0, k)
+
+
+@indicator('sma', 20)
+def sma(ctx, period):
+    return ctx.get('sma', ('close',), period)
+
+
+@indicator('ema', 20)
+def ema(ctx, period):
+    return ctx.get('ema', ('close',), period)
+
+
+@indicator('volume_ma', 20)
+def volume_ma(ctx, period):
+    return ctx.get('sma', ('volume',), period)
+
+
+@indicator('rsi', 14)
+def rsi(ctx, period):
+    avg_gain = ctx.get('wilder', ('gain', ('close',)), period)
+    avg_loss = ctx.get('wilder', ('loss', ('close',)), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+
+
+@indicator('macd', 12, 26, 9)
+def macd(ctx, fast, slow, signal):
+    line = ctx.get('macd_line', fast, slow)
+    signal_line = ctx.get('ema', ('macd_line', fast, slow), signal)
+    return {'macd': line, 'signal': signal_line, 'histogram': line - signal_line}
+
+
+@indicator('bollinger', 20, 2.0)
+def bollinger(ctx, period, width):
+    middle = ctx.get('sma', ('close',), period)
+    band = width * ctx.get('std', ('close',), period)
+    return {'middle': middle, 'upper': middle + band, 'lower': middle - band}
+
+
+@indicator('atr', 14)
+def atr(ctx, period):
+    return ctx.get('wilder', ('true_range',), period)
+
+
+@indicator('obv')
+def obv(ctx):
+    direction = np.sign(np.nan_to_num(ctx.get('delta', ('close',))))
+    return np.cumsum(direction * ctx.get('volume'))
+
+
+@indicator('vwap')
+def vwap(ctx):
+    """Volume-weighted average price anchored at the first bar of the requested range"""
+    volume = ctx.get('volume')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.cumsum(ctx.get('typical_price') * volume) / np.cumsum(volume)
+
+
+@indicator('stochastic', 14, 3)
+def stochastic(ctx, period, smoothing):
+    return {'k': ctx.get('stoch_k', period), 'd': ctx.get('sma', ('stoch_k', period), smoothing)}
+
+
+def parse_specs(text: str, default_basis: str = 'raw') -> List[Tuple[str, str, tuple, str]]:
+    """Parse an ?indicators= value such as 'ema50,macd,bollinger:20:2.5,atr'
+
+    A spec is a registered name, optionally followed by its first parameter
+    (ema50) and/or colon-separated parameters; omitted parameters take the
+    indicator's defaults. A trailing @raw or @adj picks the price series
+    (sma200@adj), otherwise default_basis applies.
+
+    Returns:
+        List of (label, name, params, basis); the label is the spec as
+        written and keys the indicator in the response
+    """
+    specs = []
+    for raw in text.split(','):
+        label = raw.strip().lower()
+        if not label:
+            continue
+        match = SPEC_PATTERN.match(label)
+        if not match:
+            raise ValueError(f'Invalid indicator spec: {raw!r}')
+        name, first, rest, basis = match.groups()
+        name = ALIASES.get(name, name)
+        if name not in INDICATORS:
+            raise ValueError(f'Unknown indicator {name!r}; expected one of {", ".join(sorted(INDICATORS))}')
+
+        defaults, _ = INDICATORS[name]
+        given = ([first] if first else []) + [p for p in rest.split(':') if p]
+        if len(given) > len(defaults):
+            raise ValueError(f'{name} takes at most {len(defaults)} parameters')
+        params = []
+        for default, value in zip(defaults, given + [None] * (len(defaults) - len(given))):
+            if value is None:
+                params.append(default)
+                continue
+            value = type(default)(float(value))
+            if not 0 < value <= MAX_PERIOD:
+                raise ValueError(f'{name} parameters must be between 0 and {MAX_PERIOD}')
+            params.append(value)
+        specs.append((label, name, tuple(params), basis or default_basis))
+    return specs
+
+
+def max_lookback(specs: Optional[List[Tuple[str, str, tuple, str]]]) -> int:
+    """Bars of history a window needs before its first bar for warm indicator values
+
+    Rolling indicators need their period and chained ones (macd's signal
+    line on its slow EMA) the sum of their periods. Recursive smoothing
+    (EMA, Wilder) keeps converging after that, so its values right after
+    the lookback are close to, not exactly, the full-history ones.
+
+    Args:
+        specs: Output of parse_specs, or None for the default set
+    """
+    if specs is None:
+        return DEFAULT_LOOKBACK
+    return max((sum(p for p in params if isinstance(p, int)) for _, _, params, _ in specs), default=0)
+
+
+def needs_adjusted(specs: List[Tuple[str, str, tuple, str]]) -> bool:
+    """Whether any parsed spec asks for the adjusted series"""
+    return any(basis == 'adj' for _, _, _, basis in specs)
+
+
+def compute_indicators(columns: Dict[str, np.ndarray], specs: List[Tuple[str, str, tuple, str]],
+                       adjusted: Optional[Dict[str, np.ndarray]] = None) -> dict:
+    """Compute just the requested indicators, sharing intermediates between them
+
+    Args:
+        columns: Raw OHLCV numpy columns, oldest bar first
+        specs: Output of parse_specs
+        adjusted: The same bars adjusted for corporate actions; @adj specs
+            use the raw columns when it is omitted (no actions recorded)
+
+    Returns:
+        Dict of label -> array, or label -> dict of arrays for multi-line
+        indicators; warm-up values are NaN
+    """
+    contexts = {'raw': IndicatorContext(columns)}
+    contexts['adj'] = IndicatorContext(adjusted) if adjusted is not None else contexts['raw']
+    return {label: INDICATORS[name][1](contexts[basis], *params) for label, name, params, basis in specs}
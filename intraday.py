@@ -0,0 +1,195 @@
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+
+from resample import aggregate_ohlcv
+
+logger = logging.getLogger(__name__)
+
+# Finest to coarsest. 'minute' reads intraday_bars; the others read intraday_rollups.
+RESOLUTIONS = ('minute', 'hour', 'day')
+
+# Bars per regular US session at each resolution, used to size a request
+BARS_PER_SESSION = {'minute': 390, 'hour': 7, 'day': 1}
+
+# numpy datetime unit that defines each rollup's buckets
+ROLLUP_UNITS = {'hour': 'h', 'day': 'D'}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def to_utc_string(ts) -> str:
+    """Normalize a bar timestamp to a naive UTC 'YYYY-MM-DD HH:MM:SS' string"""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if getattr(ts, 'tzinfo', None) is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.strftime(TIMESTAMP_FORMAT)
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int) -> str:
+    """Pick the finest resolution whose bar count for the range fits in max_points
+
+    Long ranges fall through to coarser rollups, so a chart never reads
+    more rows than it can draw.
+    """
+    sessions = max(1, int(np.busday_count(start.date(), end.date())) + 1)
+    for resolution in RESOLUTIONS:
+        if sessions * BARS_PER_SESSION[resolution] <= max_points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+class IntradayStore:
+    """Minute bar storage with incrementally maintained hourly and daily rollups
+
+    Minute bars live in intraday_bars, clustered on (ticker, day, ts) so each
+    trading day's bars are stored together and whole days can be read or
+    pruned as a unit. Writing a batch of minute bars re-aggregates only the
+    hour and day buckets it touched.
+    """
+
+    def __init__(self, conn):
+        """Initialize the store
+
+        Args:
+            conn: sqlite3 connection with schema.sql applied
+        """
+        self.conn = conn
+
+    def save_minute_bars(self, ticker: str, bars: Iterable[dict]) -> int:
+        """Upsert minute bars and refresh the rollups they touch
+
+        Args:
+            ticker: Stock symbol
+            bars: Dicts with timestamp, open, high, low, close and volume
+
+        Returns:
+            Number of bars written
+        """
+        rows = []
+        for bar in bars:
+            ts = to_utc_string(bar['timestamp'])
+            rows.append((
+                ticker, ts[:10], ts,
+                float(bar['open']), float(bar['high']), float(bar['low']),
+                float(bar['close']), int(bar['volume'])
+            ))
+        if not rows:
+            return 0
+
+        self.conn.execute('INSERT OR IGNORE INTO stocks (ticker) VALUES (?)', (ticker,))
+        self.conn.executemany(
+            '''INSERT OR REPLACE INTO intraday_bars
+               (ticker, day, ts, open, high, low, close, volume)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            rows
+        )
+        days = sorted({row[1] for row in rows})
+        self._refresh_rollups(ticker, days[0], days[-1])
+        self.conn.commit()
+        logger.info(f'Saved {len(rows)} intraday bars for {ticker}')
+        return len(rows)
+
+    def _refresh_rollups(self, ticker: str, first_day: str, last_day: str):
+        """Rebuild the hour and day buckets of the given trading days from the minute bars
+
+        Rebuilding whole touched buckets keeps corrections to existing minute
+        bars exact, which adding the new bars onto the old totals would not.
+        """
+        cursor = self.conn.execute(
+            '''SELECT ts, open, high, low, close, volume
+               FROM intraday_bars
+               WHERE ticker = ? AND day BETWEEN ? AND ?
+               ORDER BY day, ts''',
+            (ticker, first_day, last_day)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        ts = np.array([row[0] for row in rows], dtype='datetime64[s]')
+        values = np.array([row[1:] for row in rows], dtype=np.float64)
+        for resolution, unit in ROLLUP_UNITS.items():
+            buckets = ts.astype(f'datetime64[{unit}]')
+            agg = aggregate_ohlcv(
+                buckets.astype(np.int64), values[:, 0], values[:, 1], values[:, 2], values[:, 3],
+                values[:, 4].astype(np.int64)
+            )
+            agg['ts'] = buckets[agg['start']].astype('datetime64[s]')
+            self.conn.executemany(
+                '''INSERT OR REPLACE INTO intraday_rollups
+                   (ticker, resolution, ts, open, high, low, close, volume, bar_count)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                [
+                    (ticker, resolution, str(agg['ts'][i]).replace('T', ' '),
+                     float(agg['open'][i]), float(agg['high'][i]), float(agg['low'][i]),
+                     float(agg['close'][i]), int(agg['volume'][i]), int(agg['bar_count'][i]))
+                    for i in range(len(agg['ts']))
+                ]
+            )
+
+    def prune(self, before_day: str) -> int:
+        """Drop minute bars older than a day; rollups are kept"""
+        cursor = self.conn.execute('DELETE FROM intraday_bars WHERE day < ?', (before_day,))
+        self.conn.commit()
+        return cursor.rowcount
+
+
+def read_intraday_bars(conn, ticker: str, start: datetime, end: datetime,
+                       resolution: Optional[str] = None, max_points: int = 2000) -> dict:
+    """Read intraday bars at the requested resolution, or the coarsest one that fits
+
+    SQLite only, like IntradayStore: the queries use named :params and the
+    day column of schema.sql, which the Postgres intraday_bars (partitioned
+    on ts by the Supabase migrations) does not have.
+
+    Args:
+        conn: sqlite3 connection, or engine.raw_connection() of a SQLite engine
+        ticker: Stock symbol
+        start: Range start (UTC)
+        end: Range end (UTC)
+        resolution: 'minute', 'hour', 'day' or None to choose automatically
+        max_points: Upper bound on bars when choosing automatically
+
+    Returns:
+        Dict with the resolution used and one list per field
+    """
+    resolution = resolution or choose_resolution(start, end, max_points)
+    params = {
+        'ticker': ticker,
+        'start': to_utc_string(start),
+        'end': to_utc_string(end)
+    }
+    if resolution == 'minute':
+        # The day bounds let SQLite seek straight to the first trading day in range
+        params.update(start_day=params['start'][:10], end_day=params['end'][:10])
+        query = '''SELECT ts, open, high, low, close, volume
+                   FROM intraday_bars
+                   WHERE ticker = :ticker
+                   AND day BETWEEN :start_day AND :end_day
+                   AND ts BETWEEN :start AND :end
+                   ORDER BY day, ts'''
+    else:
+        params['resolution'] = resolution
+        query = '''SELECT ts, open, high, low, close, volume
+                   FROM intraday_rollups
+                   WHERE ticker = :ticker
+                   AND resolution = :resolution
+                   AND ts BETWEEN :start AND :end
+                   ORDER BY ts'''
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    return {
+        'resolution': resolution,
+        'timestamps': [row[0] for row in rows],
+        'open': [float(row[1]) for row in rows],
+        'high': [float(row[2]) for row in rows],
+        'low': [float(row[3]) for row in rows],
+        'close': [float(row[4]) for row in rows],
+        'volume': [int(row[5]) for row in rows]
+    }
@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional
+
+from market_calendar import SESSION_CLOSE_UTC, is_trading_day
+from precompute import connect
+
+logger = logging.getLogger(__name__)
+
+# Priorities: higher runs first
+PRIORITY_NORMAL = 0
+PRIORITY_HOT = 10
+PRIORITY_MARKET_OPEN = 20
+
+# Tickers the dashboard shows by default; their jobs jump the queue
+HOT_TICKERS = set(os.getenv('HOT_TICKERS', 'AAPL,MSFT,GOOGL,AMZN,META').upper().split(','))
+
+MAX_ATTEMPTS = 5
+
+# Full-jitter exponential backoff: a retry waits uniform(0, min(cap, base * 2 ** attempt)) seconds
+BACKOFF_BASE = 10
+BACKOFF_CAP = 600
+
+# How often the scheduler looks for due jobs when every queued job is backing off
+POLL_INTERVAL = 1.0
+
+# Seconds a job may stay running without a heartbeat before recover() treats
+# its worker as dead
+LEASE_TIMEOUT = 2 * 60
+
+# How often a scheduler refreshes the lease on its running jobs and takes
+# back expired ones; several heartbeats fit in one lease
+HEARTBEAT_INTERVAL = 30
+
+# US regular session in UTC during standard time (9:30-16:00 EST); daylight
+# saving time moves it an hour earlier, which only nudges priorities
+MARKET_OPEN = (14, 30)
+MARKET_CLOSE = SESSION_CLOSE_UTC
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """Whether the US regular session is (roughly) open"""
+    now = now or datetime.now(timezone.utc)
+    if not is_trading_day(now.date()):
+        return False
+    return MARKET_OPEN <= (now.hour, now.minute) < MARKET_CLOSE
+
+
+def default_priority(ticker: str, market_open: Optional[bool] = None) -> int:
+    """Market-open jobs first, then hot tickers, then everything else"""
+    if market_open is None:
+        market_open = is_market_open()
+    priority = PRIORITY_HOT if ticker in HOT_TICKERS else PRIORITY_NORMAL
+    if market_open:
+        priority += PRIORITY_MARKET_OPEN
+    return priority
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retry number attempt (1-based)"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class JobQueue:
+    """Persistent ingestion job queue in SQLite
+
+    Jobs move queued -> running -> done, or back to queued with a later
+    run_after when they fail, until max_attempts sends them to the dead
+    letter status 'dead' for inspection and manual retry.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = connect(db_path)
+        # Autocommit; claim() opens its own write transaction
+        self.conn.isolation_level = None
+        self.conn.row_factory = sqlite3.Row
+
+    def enqueue(self, tickers: Iterable[str], priority: Optional[int] = None,
+                max_attempts: int = MAX_ATTEMPTS) -> int:
+        """Queue tickers; a ticker that already has a live job only has its priority raised
+
+        Returns:
+            Number of new jobs
+        """
+        now = time.time()
+        added = 0
+        for ticker in tickers:
+            ticker = ticker.upper()
+            job_priority = default_priority(ticker) if priority is None else priority
+            cursor = self.conn.execute(
+                '''INSERT OR IGNORE INTO ingest_jobs
+                   (ticker, priority, max_attempts, run_after, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (ticker, job_priority, max_attempts, now, now, now)
+            )
+            if cursor.rowcount:
+                added += 1
+            else:
+                self.conn.execute(
+                    '''UPDATE ingest_jobs SET priority = MAX(priority, ?), updated_at = ?
+                       WHERE ticker = ? AND status IN ('queued', 'running')''',
+                    (job_priority, now, ticker)
+                )
+        return added
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """Mark the highest-priority due job as running and return it"""
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            job = self.conn.execute(
+                '''SELECT * FROM ingest_jobs
+                   WHERE status = 'queued' AND run_after <= ?
+                   ORDER BY priority DESC, run_after, id
+                   LIMIT 1''',
+                (now,)
+            ).fetchone()
+            if job:
+                self.conn.execute(
+                    "UPDATE ingest_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (now, job['id'])
+                )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return job
+
+    def complete(self, job_id: int):
+        self.conn.execute(
+            "UPDATE ingest_jobs SET status = 'done', last_error = NULL, updated_at = ? WHERE id = ?",
+            (time.time(), job_id)
+        )
+
+    def fail(self, job_id: int, error: str) -> str:
+        """Schedule a retry with jittered backoff, or dead-letter the job
+
+        Returns:
+            The job's new status
+        """
+        job = self.conn.execute('SELECT attempts, max_attempts FROM ingest_jobs WHERE id = ?', (job_id,)).fetchone()
+        now = time.time()
+        if job['attempts'] >= job['max_attempts']:
+            status, run_after = 'dead', now
+        else:
+            status, run_after = 'queued', now + backoff_delay(job['attempts'])
+        self.conn.execute(
+            'UPDATE ingest_jobs SET status = ?, run_after = ?, last_error = ?, updated_at = ? WHERE id = ?',
+            (status, run_after, error[:500], now, job_id)
+        )
+        return status
+
+    def heartbeat(self, job_ids: Iterable[int]):
+        """Renew the lease on jobs this process is still running"""
+        job_ids = list(job_ids)
+        if job_ids:
+            self.conn.execute(
+                f"UPDATE ingest_jobs SET updated_at = ? WHERE status = 'running' AND id IN ({','.join('?' * len(job_ids))})",
+                [time.time()] + job_ids
+            )
+
+    def recover(self, lease_timeout: float = LEASE_TIMEOUT) -> int:
+        """Requeue jobs left running by a process that died
+
+        Only jobs not updated for lease_timeout seconds are taken back; a
+        live scheduler heartbeats its jobs, so those keep running.
+        """
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE ingest_jobs SET status = 'queued', updated_at = ? WHERE status = 'running' AND updated_at < ?",
+            (now, now - lease_timeout)
+        )
+        return cursor.rowcount
+
+    def retry_dead(self, tickers: Optional[List[str]] = None) -> int:
+        """Move dead-lettered jobs back to the queue with fresh attempts"""
+        now = time.time()
+        # A ticker can have several dead jobs (or a live one); revive only its newest
+        query = '''UPDATE ingest_jobs SET status = 'queued', attempts = 0, run_after = ?, updated_at = ?
+                   WHERE id IN (SELECT MAX(id) FROM ingest_jobs WHERE status = 'dead' GROUP BY ticker)
+                   AND ticker NOT IN (SELECT ticker FROM ingest_jobs WHERE status IN ('queued', 'running'))'''
+        params = [now, now]
+        if tickers:
+            query += f' AND ticker IN ({",".join("?" * len(tickers))})'
+            params += [t.upper() for t in tickers]
+        return self.conn.execute(query, params).rowcount
+
+    def counts(self) -> dict:
+        return {row['status']: row['n'] for row in self.conn.execute(
+            'SELECT status, COUNT(*) AS n FROM ingest_jobs GROUP BY status'
+        )}
+
+    def next_due(self, lease_timeout: float = LEASE_TIMEOUT) -> Optional[float]:
+        """When the next queued job is due or the next running job's lease expires
+
+        Returns:
+            Unix time, or None when nothing is queued or running
+        """
+        row = self.conn.execute(
+            """SELECT MIN(CASE status WHEN 'queued' THEN run_after ELSE updated_at + ? END)
+               FROM ingest_jobs WHERE status IN ('queued', 'running')""",
+            (lease_timeout,)
+        ).fetchone()
+        return row[0]
+
+    def dead_letters(self, limit: int = 20) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT ticker, attempts, last_error, updated_at FROM ingest_jobs WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+
+class Scheduler:
+    """Runs queued jobs with bounded concurrency
+
+    A failed job is rescheduled in the queue instead of sleeping in place,
+    so one bad symbol never holds up the others.
+    """
+
+    def __init__(self, queue: JobQueue, handler: Callable[[str], bool], concurrency: int = 4,
+                 report_every: float = 10.0):
+        """Initialize the scheduler
+
+        Args:
+            queue: Job queue to drain
+            handler: Blocking function called with a ticker; returns True on success
+            concurrency: Jobs run at the same time
+            report_every: Seconds between progress lines
+        """
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.report_every = report_every
+        self.succeeded = []
+        self.failures = 0
+        self.dead = []
+        self._running = set()
+
+    async def _run_job(self, job, slots: asyncio.Semaphore):
+        try:
+            try:
+                ok = await asyncio.to_thread(self.handler, job['ticker'])
+                error = None if ok else 'handler returned False'
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+
+            if error is None:
+                self.queue.complete(job['id'])
+                self.succeeded.append(job['ticker'])
+                logger.info(f"Imported {job['ticker']}")
+            else:
+                self.failures += 1
+                status = self.queue.fail(job['id'], error)
+                if status == 'dead':
+                    self.dead.append(job['ticker'])
+                    logger.error(f"{job['ticker']} moved to dead letters after {job['attempts'] + 1} attempts: {error}")
+                else:
+                    logger.warning(f"{job['ticker']} failed (attempt {job['attempts'] + 1}), will retry: {error}")
+        finally:
+            self._running.discard(job['id'])
+            slots.release()
+
+    async def _keep_leases(self):
+        """Heartbeat this scheduler's running jobs and take back expired ones from dead processes"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            self.queue.heartbeat(self._running)
+            recovered = self.queue.recover()
+            if recovered:
+                logger.info(f'Requeued {recovered} jobs whose lease expired')
+
+    async def run(self, until_empty: bool = True) -> List[str]:
+        """Drain the queue
+
+        Args:
+            until_empty: Stop once nothing is queued or running, waiting out the
+                lease of jobs a dead process left running; otherwise keep polling
+
+        Returns:
+            Tickers imported successfully
+        """
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info(f'Requeued {recovered} jobs whose lease expired')
+
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        started = time.monotonic()
+        last_report = started
+        keeper = asyncio.create_task(self._keep_leases())
+
+        try:
+            while True:
+                await slots.acquire()
+                job = self.queue.claim()
+                if job is not None:
+                    self._running.add(job['id'])
+                    task = asyncio.create_task(self._run_job(job, slots))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    slots.release()
+                    next_due = self.queue.next_due()
+                    if until_empty and next_due is None and not tasks:
+                        break
+                    # Sleep until the next retry or lease expiry is due, a slot frees up, or the poll interval passes
+                    wait = POLL_INTERVAL if next_due is None else min(POLL_INTERVAL, max(0.0, next_due - time.time()))
+                    if tasks:
+                        await asyncio.wait(tasks, timeout=max(wait, 0.05), return_when=asyncio.FIRST_COMPLETED)
+                    else:
+                        await asyncio.sleep(max(wait, 0.05))
+
+                now = time.monotonic()
+                if now - last_report >= self.report_every:
+                    self.report(now - started)
+                    last_report = now
+        finally:
+            keeper.cancel()
+        self.report(time.monotonic() - started)
+        return self.succeeded
+
+    def report(self, elapsed: float):
+        counts = self.queue.counts()
+        rate = len(self.succeeded) / elapsed * 60 if elapsed > 0 else 0.0
+        print(
+            f"[{timedelta(seconds=int(elapsed))}] done {len(self.succeeded)} | failed attempts {self.failures} | "
+            f"dead {len(self.dead)} | queued {counts.get('queued', 0)} | running {counts.get('running', 0)} | "
+            f"{rate:.1f} tickers/min"
+        )
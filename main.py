@@ -1,13 +1,35 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
+from sqlalchemy import text, bindparam, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+import asyncio
 import json
 import os
+import re
+import sqlite3
 from datetime import datetime, timedelta
 from db import get_db_connection, init_stock_data
+from serialization import dumps, to_columnar, slice_since, price_columns
+from http_cache import data_versions, DataVersionCache, make_etag, etag_matches, compress, cache_headers
+from broadcaster import broadcaster, KEEP_ALIVE
+from downsample import downsample, downsample_cache, MIN_POINTS, MAX_POINTS
+from cache import LRUCache
+from intraday import read_intraday_bars, RESOLUTIONS as INTRADAY_RESOLUTIONS
+from resample import Resampler, RESOLUTIONS as BAR_RESOLUTIONS
+from screener import Screener, IndicatorMatrix, build_indicator_matrix, FIELDS as SCREENER_FIELDS, LOOKBACK as SCREENER_LOOKBACK
+from correlation import CorrelationService, align_closes
+from portfolio import analyze, basket_key, normalize_weights
+from indicators import compute_indicators, parse_specs, needs_adjusted
+from indicator_cache import indicator_memo
+from adjustments import Adjuster, adjust_columns, adjust_rows, ADJUSTMENTS
+from storage import apply_profile
+from shared_cache import HotTickerCache
+import numpy as np
 
 app = FastAPI()
 
@@ -30,24 +52,62 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Templates
 templates = Jinja2Templates(directory="templates")
 
+# Seconds between checks for newly ingested bars, and between SSE keep-alives
+LIVE_POLL_INTERVAL = int(os.getenv("LIVE_POLL_INTERVAL", 15))
+KEEP_ALIVE_INTERVAL = 20
 
+# Keyset pagination page sizes, and rows fetched per round trip when streaming exports
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+EXPORT_BATCH_SIZE = 2000
 
-def get_stock_data(ticker, days=30):
-    """Get stock data for the given ticker"""
+
+@event.listens_for(Engine, "connect")
+def tune_sqlite_connection(dbapi_connection, connection_record):
+    """Apply the SQLite storage profile (SQLITE_PROFILE) to every new pooled connection"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_profile(dbapi_connection)
+
+def date_range_filter(days=30, start=None, end=None):
+    """Build the date conditions for a trailing window or an explicit start/end range"""
+    if start is None and end is None:
+        return "AND date >= date('now', '-' || :days || ' days')", {'days': days}
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append("AND date >= :start")
+        params['start'] = start
+    if end is not None:
+        conditions.append("AND date <= :end")
+        params['end'] = end
+    return " ".join(conditions), params
+
+def get_stock_data(ticker, days=30, start=None, end=None):
+    """Get stock data for the given ticker
+    
+    An explicit start/end range takes precedence over the trailing days window.
+    Hot tickers are read from shared memory when it holds their current data.
+    """
+    columns = get_hot_columns(ticker)
+    if columns is not None:
+        if start is None and end is None:
+            # Matches date('now', ...) in SQLite, which is UTC
+            start = str(datetime.utcnow().date() - timedelta(days=days))
+        return column_rows(columns, start, end)
     try:
         engine = get_db_connection()
         
         # Get stock data
-        query = text("""
+        date_filter, params = date_range_filter(days, start, end)
+        query = text(f"""
             SELECT date, open, high, low, close, volume
             FROM daily_prices
             WHERE ticker = :ticker
-            AND date >= date('now', '-' || :days || ' days')
+            {date_filter}
             ORDER BY date
         """)
         
         with engine.connect() as conn:
-            result = conn.execute(query, {'ticker': ticker, 'days': days})
+            result = conn.execute(query, {'ticker': ticker, **params})
             data = []
             for row in result:
                 data.append({
@@ -63,6 +123,604 @@ def get_stock_data(ticker, days=30):
         print(f"Error getting stock data: {str(e)}")
         return []
 
+def get_data_version(ticker):
+    """Get the last bar date and ingest version for the given ticker"""
+    try:
+        engine = get_db_connection()
+        
+        # created_at is reset whenever a bar is (re)written, so together with the
+        # row count it changes on every ingest that touches the ticker
+        query = text("""
+            SELECT MAX(date) AS last_date, MAX(created_at) AS ingested_at, COUNT(*) AS bars
+            FROM daily_prices
+            WHERE ticker = :ticker
+        """)
+        
+        with engine.connect() as conn:
+            row = conn.execute(query, {'ticker': ticker}).fetchone()
+            if not row or not row.bars:
+                return None
+            return (str(row.last_date), f"{row.ingested_at}:{row.bars}")
+    except Exception as e:
+        print(f"Error getting data version: {str(e)}")
+        return None
+
+def get_action_version(ticker):
+    """Get the count and last insert time of the ticker's corporate actions"""
+    engine = get_db_connection()
+    query = text("""
+        SELECT COUNT(*) AS actions, MAX(created_at) AS recorded_at
+        FROM corporate_actions
+        WHERE ticker = :ticker
+    """)
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(query, {'ticker': ticker}).fetchone()
+    except SQLAlchemyError:
+        # Databases created before corporate_actions existed have nothing to apply
+        return ("0", "")
+    return (str(row.actions), str(row.recorded_at or ""))
+
+def load_actions(ticker):
+    """Load a ticker's corporate actions with the last close before each ex-date"""
+    engine = get_db_connection()
+    query = text("""
+        SELECT a.ex_date, a.kind, a.value,
+               (SELECT p.close FROM daily_prices p
+                WHERE p.ticker = a.ticker AND p.date < a.ex_date
+                ORDER BY p.date DESC LIMIT 1) AS prev_close
+        FROM corporate_actions a
+        WHERE a.ticker = :ticker
+        ORDER BY a.ex_date
+    """)
+    try:
+        with engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(query, {'ticker': ticker})]
+    except SQLAlchemyError:
+        return []
+
+# Corporate-action versions, cached like data versions; appending an action
+# changes the version and so every adjusted cache key
+action_versions = DataVersionCache()
+
+# Daily bars and snapshots of the most requested tickers, published to
+# shared memory by the post-ingest precompute and mapped by every worker
+hot_cache = HotTickerCache()
+
+def get_hot_columns(ticker, from_date=None):
+    """Shared-memory daily columns for a ticker, if published at its current data version"""
+    version = data_versions.get(ticker, get_data_version)
+    return hot_cache.columns(ticker, version, from_date) if version else None
+
+def record_ticker_hits(hits):
+    """Add this worker's request counts to ticker_hits, which ranks the tickers kept hot"""
+    engine = get_db_connection()
+    query = text("""
+        INSERT INTO ticker_hits (ticker, hits, last_hit)
+        VALUES (:ticker, :hits, CURRENT_TIMESTAMP)
+        ON CONFLICT(ticker) DO UPDATE SET hits = hits + excluded.hits, last_hit = excluded.last_hit
+    """)
+    try:
+        with engine.begin() as conn:
+            conn.execute(query, [{'ticker': ticker, 'hits': count} for ticker, count in hits.items()])
+    except SQLAlchemyError as e:
+        print(f"Error recording ticker hits: {str(e)}")
+adjuster = Adjuster(load_actions)
+
+def get_adjusted_version(ticker, version=None):
+    """The data version extended with the ticker's corporate-action version"""
+    version = version or data_versions.get(ticker, get_data_version)
+    if not version:
+        return None
+    return tuple(version) + action_versions.get(ticker, get_action_version)
+
+def get_price_page(ticker, start=None, end=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """Get one page of bars ordered by date, using keyset pagination on (ticker, date)
+    
+    Returns:
+        Tuple of (bars, next_cursor); next_cursor is None on the last page
+    """
+    engine = get_db_connection()
+    date_filter, params = date_range_filter(start=start, end=end) if start or end else ("", {})
+    if cursor:
+        date_filter += " AND date > :cursor"
+        params['cursor'] = cursor
+    
+    # Fetch one extra row to learn whether another page follows
+    query = text(f"""
+        SELECT date, open, high, low, close, volume
+        FROM daily_prices
+        WHERE ticker = :ticker
+        {date_filter}
+        ORDER BY date
+        LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {'ticker': ticker, 'limit': limit + 1, **params}).fetchall()
+    
+    bars = [
+        {
+            'date': row.date,
+            'open': float(row.open),
+            'high': float(row.high),
+            'low': float(row.low),
+            'close': float(row.close),
+            'volume': int(row.volume)
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = str(bars[-1]['date']) if len(rows) > limit else None
+    return bars, next_cursor
+
+def stream_price_rows(ticker, start=None, end=None, format="csv"):
+    """Yield encoded bars for an export from a server-side cursor
+    
+    Rows are fetched EXPORT_BATCH_SIZE at a time and written out immediately,
+    so memory stays flat and the first bytes go out before the query finishes.
+    """
+    engine = get_db_connection()
+    date_filter, params = date_range_filter(start=start, end=end) if start or end else ("", {})
+    query = text(f"""
+        SELECT date, open, high, low, close, volume
+        FROM daily_prices
+        WHERE ticker = :ticker
+        {date_filter}
+        ORDER BY date
+    """)
+    
+    if format == "csv":
+        yield b"date,open,high,low,close,volume\n"
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)\
+            .execute(query, {'ticker': ticker, **params})
+        for rows in result.partitions():
+            if format == "csv":
+                yield "".join(
+                    f"{row.date},{row.open},{row.high},{row.low},{row.close},{row.volume}\n"
+                    for row in rows
+                ).encode()
+            else:
+                yield b"".join(
+                    dumps({
+                        'date': str(row.date),
+                        'open': float(row.open),
+                        'high': float(row.high),
+                        'low': float(row.low),
+                        'close': float(row.close),
+                        'volume': int(row.volume)
+                    }) + b"\n"
+                    for row in rows
+                )
+
+def get_market_version(_ticker="*"):
+    """Get the data version of the whole daily_prices table"""
+    engine = get_db_connection()
+    query = text("""
+        SELECT MAX(date) AS last_date, MAX(created_at) AS ingested_at, COUNT(*) AS bars
+        FROM daily_prices
+    """)
+    with engine.connect() as conn:
+        row = conn.execute(query).fetchone()
+    if not row or not row.bars:
+        return None
+    return (str(row.last_date), f"{row.ingested_at}:{row.bars}")
+
+def load_snapshot_matrix():
+    """Build the screener matrix from precomputed snapshots, or None unless every ticker's is current"""
+    engine = get_db_connection()
+    query = text(f"""
+        SELECT s.ticker, s.last_date, {', '.join('s.' + f for f in SCREENER_FIELDS)}
+        FROM ticker_snapshots s
+        JOIN (SELECT ticker, MAX(date) AS last_date FROM daily_prices GROUP BY ticker) p
+          ON p.ticker = s.ticker AND p.last_date = s.last_date
+        ORDER BY s.ticker
+    """)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+            tickers = conn.execute(text("SELECT COUNT(DISTINCT ticker) FROM daily_prices")).scalar()
+    except SQLAlchemyError:
+        return None
+    if not rows or len(rows) != tickers:
+        return None
+    values = np.array([[np.nan if v is None else v for v in row[2:]] for row in rows], dtype=np.float64)
+    return IndicatorMatrix(
+        np.array([row.ticker for row in rows]),
+        values,
+        np.array([str(row.last_date) for row in rows], dtype='datetime64[D]')
+    )
+
+def load_screener_matrix():
+    """Load the screener matrix from snapshots, or from the last SCREENER_LOOKBACK bars of every ticker"""
+    matrix = load_snapshot_matrix()
+    if matrix is not None:
+        return matrix
+    engine = get_db_connection()
+    query = text("""
+        SELECT ticker, position, date, open, high, low, close, volume
+        FROM (
+            SELECT ticker, date, open, high, low, close, volume,
+                   ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) AS position
+            FROM daily_prices
+        )
+        WHERE position <= :lookback
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {'lookback': SCREENER_LOOKBACK}).fetchall()
+    return build_indicator_matrix(
+        np.array([row.ticker for row in rows]),
+        np.array([row.position for row in rows], dtype=np.int64),
+        np.array([str(row.date) for row in rows], dtype='datetime64[D]'),
+        np.array([row[3:] for row in rows], dtype=np.float64).reshape(-1, 5),
+        SCREENER_LOOKBACK
+    )
+
+screener = Screener(load_screener_matrix)
+
+def load_closes(sessions=None, from_date=None):
+    """Load (ticker, date, close) rows for the last `sessions` trading days or from a date on"""
+    engine = get_db_connection()
+    if from_date is not None:
+        query = text("SELECT ticker, date, close FROM daily_prices WHERE date >= :from_date")
+        params = {'from_date': from_date}
+    else:
+        query = text("""
+            SELECT ticker, date, close FROM daily_prices
+            WHERE date >= (
+                SELECT MIN(date) FROM (
+                    SELECT DISTINCT date FROM daily_prices ORDER BY date DESC LIMIT :sessions
+                )
+            )
+        """)
+        params = {'sessions': sessions}
+    with engine.connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+    return (
+        np.array([row.ticker for row in rows]),
+        np.array([str(row.date) for row in rows], dtype='datetime64[D]'),
+        np.array([row.close for row in rows], dtype=np.float64)
+    )
+
+correlations = CorrelationService(load_closes)
+
+# Portfolio results keyed by basket hash and market data version
+portfolio_cache = LRUCache(maxsize=128)
+
+def load_basket_closes(tickers, days):
+    """Load closes for a set of tickers over the last `days` trading days they all share
+
+    Returns:
+        Tuple of (dates, dates x tickers close matrix in the order given)
+    """
+    engine = get_db_connection()
+    query = text("""
+        SELECT ticker, date, close FROM daily_prices
+        WHERE ticker IN :tickers
+        AND date >= (
+            SELECT MIN(date) FROM (
+                SELECT DISTINCT date FROM daily_prices
+                WHERE ticker IN :tickers
+                ORDER BY date DESC LIMIT :days
+            )
+        )
+    """).bindparams(bindparam('tickers', expanding=True))
+    with engine.connect() as conn:
+        rows = conn.execute(query, {'tickers': list(tickers), 'days': days + 1}).fetchall()
+
+    symbols, dates, matrix = align_closes(
+        np.array([row.ticker for row in rows]),
+        np.array([str(row.date) for row in rows], dtype='datetime64[D]'),
+        np.array([row.close for row in rows], dtype=np.float64)
+    )
+    missing = sorted(set(tickers) - set(symbols.tolist()))
+    if missing:
+        raise KeyError(f"No price history for {', '.join(missing)}")
+    # Keep only the dates on which every ticker traded
+    complete = ~np.isnan(matrix).any(axis=1)
+    return dates[complete], matrix[complete][:, np.searchsorted(symbols, tickers)]
+
+def get_portfolio_analytics(tickers, weights, benchmark, days):
+    """Analyze a basket in one pass over its aligned closes, the benchmark as the last column"""
+    columns = tickers + ([benchmark] if benchmark else [])
+    dates, matrix = load_basket_closes(list(dict.fromkeys(columns)), days)
+    position = {t: i for i, t in enumerate(dict.fromkeys(columns))}
+    closes = matrix[:, [position[t] for t in tickers]]
+    bench = matrix[:, position[benchmark]] if benchmark else None
+    if len(dates) < 2:
+        raise KeyError("Not enough overlapping history for this basket")
+
+    result = analyze(dates, closes, weights, bench)
+    result["tickers"] = tickers
+    result["benchmark"] = benchmark
+    return result
+
+def get_all_data_versions():
+    """Get the data version of every ticker in a single query"""
+    engine = get_db_connection()
+    query = text("""
+        SELECT ticker, MAX(date) AS last_date, MAX(created_at) AS ingested_at, COUNT(*) AS bars
+        FROM daily_prices
+        GROUP BY ticker
+    """)
+    with engine.connect() as conn:
+        return {
+            row.ticker: (str(row.last_date), f"{row.ingested_at}:{row.bars}")
+            for row in conn.execute(query)
+        }
+
+def get_new_bars(ticker, from_date):
+    """Get the bars stored for the given ticker on or after a date
+
+    The bar on from_date itself is included: ingestion rewrites the current
+    session's bar in place, which changes the version but not the last date.
+    """
+    engine = get_db_connection()
+    query = text("""
+        SELECT date, open, high, low, close, volume
+        FROM daily_prices
+        WHERE ticker = :ticker
+        AND date >= :from_date
+        ORDER BY date
+    """)
+    with engine.connect() as conn:
+        return [
+            {
+                'date': row.date,
+                'open': float(row.open),
+                'high': float(row.high),
+                'low': float(row.low),
+                'close': float(row.close),
+                'volume': int(row.volume)
+            }
+            for row in conn.execute(query, {'ticker': ticker, 'from_date': from_date})
+        ]
+
+def get_precomputed_summary():
+    """Read the market summary from the leaderboards written after ingestion, if they are current"""
+    engine = get_db_connection()
+    query = text("""
+        SELECT name, ticker, close, change_pct, volume, volume_ma20
+        FROM leaderboards
+        WHERE as_of = (SELECT MAX(date) FROM daily_prices)
+        AND name IN ('gainers', 'high_volume')
+        AND rank <= 5
+        ORDER BY name, rank
+    """)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+    except SQLAlchemyError:
+        return None
+    if not rows:
+        return None
+    return {
+        'gainers': [
+            {'ticker': r.ticker, 'close': r.close, 'daily_return_percent': round(r.change_pct, 2)}
+            for r in rows if r.name == 'gainers'
+        ],
+        'high_volume': [
+            {
+                'ticker': r.ticker,
+                'volume': r.volume,
+                'avg_20day_volume': round(r.volume_ma20, 0),
+                'volume_increase_percent': round(r.volume / r.volume_ma20 * 100 - 100, 2)
+            }
+            for r in rows if r.name == 'high_volume'
+        ]
+    }
+
+def get_market_summary():
+    """Get the top gainers and unusual-volume stocks for the latest trading day"""
+    summary = get_precomputed_summary()
+    if summary is not None:
+        return summary
+    engine = get_db_connection()
+    gainers_query = text("""
+        SELECT ticker, close, daily_return_percent
+        FROM daily_returns
+        WHERE date = (SELECT MAX(date) FROM daily_prices)
+        ORDER BY daily_return_percent DESC
+        LIMIT 5
+    """)
+    volume_query = text("""
+        SELECT ticker, volume, avg_20day_volume,
+               ROUND(CAST(volume AS FLOAT) / avg_20day_volume * 100 - 100, 2) AS volume_increase_percent
+        FROM volume_analysis
+        WHERE date = (SELECT MAX(date) FROM daily_prices)
+        AND volume > avg_20day_volume
+        ORDER BY volume_increase_percent DESC
+        LIMIT 5
+    """)
+    with engine.connect() as conn:
+        return {
+            'gainers': [dict(row._mapping) for row in conn.execute(gainers_query)],
+            'high_volume': [dict(row._mapping) for row in conn.execute(volume_query)]
+        }
+
+async def watch_ingestion():
+    """Publish new bars and market summaries as ingestion writes them
+    
+    One query per interval detects changed tickers no matter how many clients
+    are connected; the broadcaster fans each change out to the subscribers.
+    """
+    known = None
+    while True:
+        try:
+            versions = await run_in_threadpool(get_all_data_versions)
+            changed = [t for t, v in versions.items() if known is not None and known.get(t) != v]
+            
+            for ticker in changed:
+                last_date, ingest_version = versions[ticker]
+                data_versions.set(ticker, last_date, ingest_version)
+                if not broadcaster.has_subscribers(ticker):
+                    continue
+                previous = known.get(ticker)
+                bars = await run_in_threadpool(get_new_bars, ticker, previous[0] if previous else "")
+                broadcaster.publish(ticker, "bar", {"ticker": ticker, "version": versions[ticker], "bars": bars})
+            
+            if known is None or changed:
+                summary = await run_in_threadpool(get_market_summary)
+                broadcaster.publish("market", "summary", summary, retain=True)
+            known = versions
+            
+            hits = hot_cache.take_hits()
+            if hits:
+                await run_in_threadpool(record_ticker_hits, hits)
+        except Exception as e:
+            print(f"Error watching ingestion: {str(e)}")
+        await asyncio.sleep(LIVE_POLL_INTERVAL)
+
+@app.on_event("startup")
+async def start_live_updates():
+    app.state.ingestion_watcher = asyncio.create_task(watch_ingestion())
+
+def calculate_indicators(data, specs=None, ticker=None, version=None, window=None, adjusted=None, adjust="raw"):
+    """Compute the default indicator set, or only the indicators selected with ?indicators=
+
+    With a data version the result is memoized per (ticker, version, bar
+    window, selection), so repeat requests skip the computation. The
+    default set follows `adjust`; selected indicators pick their series
+    per spec, from `data` (raw) or `adjusted`.
+    """
+    if version is not None and data:
+        key = (ticker, tuple(version), window, adjust, tuple(specs) if specs is not None else "default")
+        return indicator_memo.get_or_compute(
+            key, lambda: calculate_indicators(data, specs, adjusted=adjusted, adjust=adjust)
+        )
+    if specs is None:
+        rows = adjusted if adjust == "adjusted" and adjusted is not None else data
+        return {
+            "moving_averages": calculate_moving_averages(rows),
+            "rsi": calculate_rsi(rows),
+            "volume_ma": calculate_volume_ma(rows)
+        }
+    return compute_indicators(price_columns(data), specs, price_columns(adjusted) if adjusted is not None else None)
+
+def wants_adjusted(adjust, specs):
+    """Whether a request reads the adjusted series for its bars or any indicator"""
+    return adjust == "adjusted" or (specs is not None and needs_adjusted(specs))
+
+def get_bars_with_indicators(ticker, days=60, start=None, end=None, specs=None, version=None, adjust="raw"):
+    """Get bars for the given ticker together with their technical indicators
+
+    Bars come back adjusted for splits and dividends when `adjust` is
+    "adjusted"; the version must then be the one from get_adjusted_version.
+    """
+    data = get_stock_data(ticker, days=days, start=start, end=end)
+    adjusted = None
+    if data and wants_adjusted(adjust, specs):
+        factors = adjuster.factors(ticker, version or get_adjusted_version(ticker))
+        adjusted = adjust_rows(data, factors) if not factors.empty else None
+    # The default window ends today, so the date is part of it
+    window = ("day", days, start, end, str(datetime.now().date()))
+    indicators = calculate_indicators(data, specs, ticker, version, window, adjusted, adjust)
+    return (adjusted if adjust == "adjusted" and adjusted is not None else data), indicators
+
+def load_daily_columns(ticker, from_date=None):
+    """Load a ticker's daily bars as numpy columns, from a date on or the whole history"""
+    columns = get_hot_columns(ticker, from_date)
+    if columns is not None:
+        return columns
+    engine = get_db_connection()
+    date_filter = "AND date >= :from_date" if from_date else ""
+    query = text(f"""
+        SELECT date, open, high, low, close, volume
+        FROM daily_prices
+        WHERE ticker = :ticker
+        {date_filter}
+        ORDER BY date
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {'ticker': ticker, 'from_date': from_date}).fetchall()
+    return {
+        'date': np.array([str(row.date) for row in rows], dtype='datetime64[D]'),
+        'open': np.array([row.open for row in rows], dtype=np.float64),
+        'high': np.array([row.high for row in rows], dtype=np.float64),
+        'low': np.array([row.low for row in rows], dtype=np.float64),
+        'close': np.array([row.close for row in rows], dtype=np.float64),
+        'volume': np.array([row.volume for row in rows], dtype=np.int64)
+    }
+
+def load_adjusted_daily_columns(ticker, from_date=None):
+    """Load a ticker's daily bars adjusted for its corporate actions"""
+    columns = load_daily_columns(ticker, from_date)
+    return adjust_columns(columns, adjuster.factors(ticker, get_adjusted_version(ticker)))
+
+resampler = Resampler(load_daily_columns)
+
+# Periods are aggregated from adjusted days, so a split inside a week is
+# handled exactly. A new action rescales the whole history, so the cached
+# bars are rebuilt rather than extended when the action version moves.
+adjusted_resampler = Resampler(load_adjusted_daily_columns)
+adjusted_resampler_actions = {}
+
+def get_adjusted_resampled(ticker, resolution, version):
+    """Resampled adjusted bars for a version from get_adjusted_version"""
+    action_version = version[2:]
+    if adjusted_resampler_actions.get(ticker) != action_version:
+        adjusted_resampler.invalidate(ticker)
+        adjusted_resampler_actions[ticker] = action_version
+    return adjusted_resampler.get(ticker, resolution, version[:2])
+
+def column_rows(bars, start=None, end=None):
+    """Bar columns as API rows, limited to a date range
+
+    The range is cut from the sorted date column with searchsorted, so only
+    the rows returned are converted.
+    """
+    dates = bars['date']
+    lo = int(np.searchsorted(dates, np.datetime64(str(start)[:10], 'D'))) if start else 0
+    hi = int(np.searchsorted(dates, np.datetime64(str(end)[:10], 'D'), side='right')) if end else len(dates)
+    return [
+        {
+            'date': date,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume
+        }
+        for date, open_, high, low, close, volume in zip(
+            dates[lo:hi].astype(str).tolist(),
+            bars['open'][lo:hi].tolist(),
+            bars['high'][lo:hi].tolist(),
+            bars['low'][lo:hi].tolist(),
+            bars['close'][lo:hi].tolist(),
+            bars['volume'][lo:hi].tolist()
+        )
+    ]
+
+def get_resampled_with_indicators(ticker, resolution, version, start=None, end=None, specs=None, adjust="raw"):
+    """Get weekly, monthly or quarterly bars with indicators computed on those bars"""
+    data = column_rows(resampler.get(ticker, resolution, version[:2]), start, end)
+    adjusted = None
+    if wants_adjusted(adjust, specs):
+        adjusted = column_rows(get_adjusted_resampled(ticker, resolution, version), start, end)
+    indicators = calculate_indicators(data, specs, ticker, version, (resolution, start, end), adjusted, adjust)
+    return (adjusted if adjust == "adjusted" else data), indicators
+
+def build_downsampled(ticker, days, points, start=None, end=None, specs=None, version=None, adjust="raw"):
+    """Build a downsampled columnar payload, or None when there is no data"""
+    data, indicators = get_bars_with_indicators(ticker, days=days, start=start, end=end, specs=specs,
+                                                version=version, adjust=adjust)
+    if not data:
+        return None
+    if len(data) <= points:
+        return to_columnar(data, indicators)
+    return downsample(data, indicators, points)
+
+def delta_payload(data, indicators, format, version, since):
+    """Build a delta-sync payload with the cursor and version the client sends back next time"""
+    payload = to_columnar(data, indicators) if format == "columnar" else {"prices": data, "indicators": indicators}
+    payload["cursor"] = str(data[-1]["date"]) if data else since
+    payload["version"] = ":".join(version) if version else None
+    return payload
+
+def encoded_response(body, request, etag=None):
+    """Build a JSON response compressed for the client, with validators when an ETag is given"""
+    body, encoding = compress(body, request.headers.get("accept-encoding"))
+    return Response(content=body, media_type="application/json", headers=cache_headers(etag, encoding))
+
 def calculate_moving_averages(data, periods=[20, 50]):
     """Calculate moving averages for the given periods"""
     result = {}
@@ -120,8 +778,245 @@ def calculate_volume_ma(data, period=20):
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/api/stream")
+async def stream_updates(request: Request, tickers: str = ""):
+    """Server-Sent Events stream of new bars for the given tickers plus market summaries"""
+    topics = ["market"] + [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    queue = broadcaster.subscribe(topics)
+    
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=KEEP_ALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield KEEP_ALIVE
+        finally:
+            broadcaster.unsubscribe(queue, topics)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/screener")
+async def screen_stocks(filter: list[str] = Query(default=[]), sort: str = None, order: str = "desc", limit: int = 100):
+    """Find tickers matching every filter, e.g. ?filter=rsi14<30&filter=close>ma50&filter=volume>2*volume_ma20"""
+    version = data_versions.get("*", get_market_version)
+    try:
+        result = await run_in_threadpool(screener.screen, version, filter, sort, order != "asc", limit)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return Response(content=dumps(result), media_type="application/json")
+
+@app.get("/api/correlation")
+async def get_correlation(tickers: str, window: int = 60):
+    """Get the daily return correlation and covariance matrices of a comma-separated list of tickers"""
+    symbols = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    version = data_versions.get("*", get_market_version)
+
+    def read(corr_window):
+        return {
+            "tickers": symbols,
+            "window": window,
+            "as_of": corr_window.as_of,
+            "correlation": np.round(corr_window.correlation(symbols), 4),
+            "covariance": corr_window.covariance(symbols)
+        }
+
+    try:
+        result = await run_in_threadpool(correlations.read, window, version, read)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"error": e.args[0]})
+    return Response(content=dumps(result), media_type="application/json")
+
+@app.get("/api/portfolio")
+async def get_portfolio(tickers: str, weights: str = None, benchmark: str = None, days: int = 252):
+    """Get the equity curve, risk figures and holding contributions of a weighted basket
+
+    e.g. /api/portfolio?tickers=AAPL,MSFT,GOOGL&weights=0.5,0.3,0.2&benchmark=SPY
+    """
+    symbols = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    benchmark = benchmark.strip().upper() if benchmark else None
+    try:
+        values = [float(w) for w in weights.split(",")] if weights else None
+        w = normalize_weights(symbols, values)
+        if len(set(symbols)) != len(symbols):
+            raise ValueError("Each ticker may appear only once")
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    days = max(2, min(days, 5000))
+    version = data_versions.get("*", get_market_version)
+    key = (basket_key(symbols, w, benchmark, days), version)
+    try:
+        body = await run_in_threadpool(
+            portfolio_cache.get_or_build, key,
+            lambda: dumps(get_portfolio_analytics(symbols, w, benchmark, days))
+        )
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"error": e.args[0]})
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/stock/{ticker}/correlated")
+async def get_correlated_stocks(ticker: str, window: int = 60, limit: int = 10):
+    """Get the tickers whose daily returns are most correlated with this one"""
+    ticker = ticker.upper()
+    version = data_versions.get("*", get_market_version)
+
+    def read(corr_window):
+        symbols, values = corr_window.top_correlated(ticker, limit)
+        return {
+            "ticker": ticker,
+            "window": window,
+            "as_of": corr_window.as_of,
+            "tickers": symbols.tolist(),
+            "correlations": np.round(values, 4)
+        }
+
+    try:
+        result = await run_in_threadpool(correlations.read, window, version, read)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"error": e.args[0]})
+    return Response(content=dumps(result), media_type="application/json")
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Get hit ratio and memory use of the indicator memo and the shared hot-ticker segment"""
+    return JSONResponse(content={"indicators": indicator_memo.stats(), "shared": hot_cache.stats()})
+
+@app.get("/api/stock/{ticker}/history")
+async def get_stock_history(ticker: str, start: str = None, end: str = None,
+                            limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, format: str = "rows"):
+    """Page through bars in any date range; pass next_cursor back as cursor for the next page"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    bars, next_cursor = await run_in_threadpool(get_price_page, ticker, start, end, limit, cursor)
+    if format == "columnar":
+        payload = {"format": "columnar", "dates": [str(b["date"]) for b in bars], "prices": price_columns(bars)}
+    else:
+        payload = {"prices": bars}
+    payload["next_cursor"] = next_cursor
+    return Response(content=dumps(payload), media_type="application/json")
+
+def get_intraday_bars(ticker, start, end, resolution, points):
+    """Read intraday bars through the raw DB-API connection used by the intraday store"""
+    conn = get_db_connection().raw_connection()
+    try:
+        return read_intraday_bars(conn, ticker, start, end, resolution, points)
+    finally:
+        conn.close()
+
+@app.get("/api/stock/{ticker}/intraday")
+async def get_stock_intraday(ticker: str, start: str = None, end: str = None,
+                             resolution: str = None, points: int = 2000):
+    """Get intraday bars, read from the coarsest rollup that fits `points` unless a resolution is given"""
+    if resolution is not None and resolution not in INTRADAY_RESOLUTIONS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"resolution must be one of {', '.join(INTRADAY_RESOLUTIONS)}"}
+        )
+    end_ts = datetime.fromisoformat(end) if end else datetime.utcnow()
+    start_ts = datetime.fromisoformat(start) if start else end_ts - timedelta(days=1)
+    bars = await run_in_threadpool(get_intraday_bars, ticker, start_ts, end_ts, resolution, points)
+    return Response(content=dumps(bars), media_type="application/json")
+
+def get_snapshot(ticker):
+    """Get a ticker's precomputed snapshot payload and the data version it was built from
+
+    Hot tickers are served from shared memory when it holds their current version.
+    """
+    version = data_versions.get(ticker, get_data_version)
+    payload = hot_cache.snapshot(ticker, version) if version else None
+    if payload is not None:
+        return ":".join(version), payload
+    engine = get_db_connection()
+    query = text("SELECT version, payload FROM ticker_snapshots WHERE ticker = :ticker")
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(query, {"ticker": ticker}).fetchone()
+    except SQLAlchemyError:
+        return None
+    return (row.version, bytes(row.payload)) if row else None
+
+@app.get("/api/stock/{ticker}/snapshot")
+async def get_stock_snapshot(ticker: str, request: Request):
+    """Get the last year of bars with default indicators, as written by the post-ingest precompute"""
+    ticker = ticker.upper()
+    hot_cache.record_hit(ticker)
+    snapshot = await run_in_threadpool(get_snapshot, ticker)
+    if snapshot is None:
+        return JSONResponse(status_code=404, content={"error": f"No snapshot for ticker {ticker}"})
+    version, payload = snapshot
+    etag = make_etag(ticker, tuple(version.split(":", 1)), "snapshot")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return encoded_response(payload, request, etag)
+
+@app.get("/api/stock/{ticker}/export")
+async def export_stock_history(ticker: str, start: str = None, end: str = None, format: str = "csv"):
+    """Stream every bar in a date range as CSV or newline-delimited JSON"""
+    ticker = ticker.upper()
+    if data_versions.get(ticker, get_data_version) is None:
+        return JSONResponse(status_code=404, content={"error": f"No data found for ticker {ticker}"})
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    extension = "csv" if format == "csv" else "ndjson"
+    filename = re.sub(r"[^A-Z0-9.-]", "_", ticker)
+    return StreamingResponse(
+        stream_price_rows(ticker, start, end, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
+
 @app.get("/api/stock/{ticker}")
-async def get_stock_info(ticker: str):
+async def get_stock_info(ticker: str, request: Request, format: str = "rows", since: str = None,
+                         client_version: str = Query(None, alias="version"),
+                         points: int = Query(None, ge=MIN_POINTS, le=MAX_POINTS),
+                         start: str = None, end: str = None, resolution: str = "day", indicators: str = None,
+                         adjust: str = "raw"):
+    if resolution not in BAR_RESOLUTIONS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"resolution must be one of {', '.join(BAR_RESOLUTIONS)}"}
+        )
+    if adjust not in ADJUSTMENTS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"adjust must be one of {', '.join(ADJUSTMENTS)}"}
+        )
+    hot_cache.record_hit(ticker)
+    
+    # ?indicators=ema50,macd,bollinger computes only those; without it the default set is returned.
+    # Indicators follow ?adjust= unless a spec ends in @raw or @adj.
+    try:
+        specs = parse_specs(indicators, "adj" if adjust == "adjusted" else "raw") if indicators is not None else None
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    
+    # Answer revalidations from the cached data version before touching the database.
+    # The window is relative to today, so the date is part of the variant; adjusted
+    # reads also depend on the corporate actions recorded for the ticker.
+    version = data_versions.get(ticker, get_data_version)
+    if version and wants_adjusted(adjust, specs):
+        read_version = get_adjusted_version(ticker, version)
+    else:
+        read_version = version
+    variant = f"{format}|{since}|{client_version}|{points}|{start}|{end}|{resolution}|{indicators}|{adjust}|{':'.join(read_version[2:]) if read_version else ''}|{datetime.now().date()}"
+    etag = make_etag(ticker, version, variant) if version else None
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    
+    # A client that sends back the current version already holds every bar and gets
+    # an empty delta without a price query. Any other version re-sends the bar on
+    # `since` too, since ingestion may have rewritten it in place.
+    if since and version and client_version == ":".join(version):
+        empty = {"moving_averages": {}, "rsi": [], "volume_ma": []} if specs is None else {}
+        return encoded_response(dumps(delta_payload([], empty, format, version, since)), request, etag)
+    
     # Initialize stock data
     if not init_stock_data(ticker):
         return JSONResponse(
@@ -129,8 +1024,27 @@ async def get_stock_info(ticker: str):
             content={"error": f"No data found for ticker {ticker}"}
         )
     
-    # Get stock data for the past 60 days
-    data = get_stock_data(ticker, days=60)
+    # Long ranges are reduced to about `points` bars; results are cached per data version
+    if points and version and not since and resolution == "day":
+        key = (ticker, read_version, datetime.now().date(), start, end, points, indicators, adjust)
+        payload = downsample_cache.get_or_build(key, lambda: build_downsampled(ticker, 60, points, start, end, specs, read_version, adjust))
+        if payload is None:
+            return JSONResponse(
+                status_code=404,
+                content={"error": f"No data found for ticker {ticker}"}
+            )
+        return encoded_response(dumps(payload), request, etag)
+    
+    # Get stock data for the requested range, or the past 60 days. Coarser
+    # resolutions cover the whole history unless a range is given.
+    if resolution == "day":
+        data, values = get_bars_with_indicators(ticker, days=60, start=start, end=end, specs=specs,
+                                                version=read_version, adjust=adjust)
+    elif version:
+        data, values = await run_in_threadpool(get_resampled_with_indicators, ticker, resolution, read_version,
+                                               start, end, specs, adjust)
+    else:
+        data = []
     
     if not data:
         return JSONResponse(
@@ -138,20 +1052,17 @@ async def get_stock_info(ticker: str):
             content={"error": f"No data found for ticker {ticker}"}
         )
     
-    # Calculate technical indicators
-    moving_averages = calculate_moving_averages(data)
-    rsi = calculate_rsi(data)
-    volume_ma = calculate_volume_ma(data)
+    # Delta sync: only the bars from the client's cursor on, with their indicator values
+    if since:
+        data, values = slice_since(data, values, since)
+        return encoded_response(dumps(delta_payload(data, values, format, version, since)), request, etag)
+    
+    # Columnar payloads skip the per-bar dicts and encode arrays directly
+    if format == "columnar":
+        return encoded_response(dumps(to_columnar(data, values)), request, etag)
     
     # Return data with indicators
-    return {
-        "prices": data,
-        "indicators": {
-            "moving_averages": moving_averages,
-            "rsi": rsi,
-            "volume_ma": volume_ma
-        }
-    }
+    return encoded_response(dumps({"prices": data, "indicators": values}), request, etag)
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/api/stock/{ticker}")
@@ -0,0 +1,126 @@
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Union
+
+import numpy as np
+
+# NYSE trading calendar, computed from the exchange's holiday rules so it
+# works offline. The rules hold from 1971, when the Monday holidays were
+# introduced; earlier years (with their Saturday sessions and other closures)
+# are not modelled. Early closes still produce a daily bar and are not tracked.
+
+# Regular session close in UTC during standard time; a daily bar is only
+# expected once the session is over
+SESSION_CLOSE_UTC = (21, 0)
+
+# Closures outside the regular holiday rules
+SPECIAL_CLOSURES = (
+    '1972-12-28',  # President Truman's funeral
+    '1973-01-25',  # President Johnson's funeral
+    '1977-07-14',  # New York City blackout
+    '1985-09-27',  # Hurricane Gloria
+    '1994-04-27',  # President Nixon's funeral
+    '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14',  # September 11
+    '2004-06-11',  # President Reagan's funeral
+    '2007-01-02',  # President Ford's funeral
+    '2012-10-29', '2012-10-30',  # Hurricane Sandy
+    '2018-12-05',  # President G.H.W. Bush's funeral
+    '2025-01-09',  # President Carter's funeral
+)
+
+DateLike = Union[str, date, np.datetime64]
+
+
+def _easter(year: int) -> date:
+    """Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th given weekday of a month (Monday is 0); n = -1 is the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> Optional[date]:
+    """Saturday holidays move to Friday and Sunday ones to Monday
+
+    A Saturday New Year's Day is not observed at all, since the Friday
+    would fall in the previous year.
+    """
+    if day.weekday() == 5:
+        return None if (day.month, day.day) == (1, 1) else day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def holidays(year: int) -> tuple:
+    """Full-day NYSE closures in a year (1971 or later), as sorted ISO date strings"""
+    days = [
+        _observed(date(year, 1, 1)),
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    ]
+    if year <= 1980 and year % 4 == 0:
+        days.append(_nth_weekday(year, 11, 0, 1) + timedelta(days=1))  # Presidential Election Day
+    if year >= 1998:
+        days.append(_nth_weekday(year, 1, 0, 3))  # Martin Luther King Jr. Day
+    if year >= 2022:
+        days.append(_observed(date(year, 6, 19)))  # Juneteenth
+    days = {d.isoformat() for d in days if d is not None}
+    days.update(d for d in SPECIAL_CLOSURES if d.startswith(str(year)))
+    return tuple(sorted(days))
+
+
+def _day(value: DateLike) -> np.datetime64:
+    return np.datetime64(str(value)[:10], 'D')
+
+
+def business_calendar(start: DateLike, end: DateLike) -> np.busdaycalendar:
+    """numpy business-day calendar with the holidays of every year in the range"""
+    first, last = _day(start).astype(object).year, _day(end).astype(object).year
+    closed = [d for year in range(first, last + 1) for d in holidays(year)]
+    return np.busdaycalendar(holidays=np.array(closed, dtype='datetime64[D]'))
+
+
+def trading_days(start: DateLike, end: DateLike) -> np.ndarray:
+    """Sorted datetime64[D] sessions from start to end, both inclusive"""
+    start, end = _day(start), _day(end)
+    if end < start:
+        return np.array([], dtype='datetime64[D]')
+    days = np.arange(start, end + 1, dtype='datetime64[D]')
+    return days[np.is_busday(days, busdaycal=business_calendar(start, end))]
+
+
+def is_trading_day(day: DateLike) -> bool:
+    day = _day(day)
+    return bool(np.is_busday(day, busdaycal=business_calendar(day, day)))
+
+
+def last_closed_session(now: Optional[datetime] = None) -> np.datetime64:
+    """The latest session whose daily bar should exist by now"""
+    now = now or datetime.now(timezone.utc)
+    today = np.datetime64(now.date(), 'D')
+    if (now.hour, now.minute) < SESSION_CLOSE_UTC or not is_trading_day(today):
+        today = today - 1
+    cal = business_calendar(today - 14, today)
+    return np.busday_offset(today, 0, roll='backward', busdaycal=cal)
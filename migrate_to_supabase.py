@@ -31,7 +31,13 @@ def migrate_data():
     
     # Migrate daily_prices table
     print("\nMigrating daily_prices table...")
-    daily_prices = pd.read_sql_query("SELECT * FROM daily_prices", sqlite_conn)
+    # Date order keeps each yearly partition physically ordered for its BRIN index
+    daily_prices = pd.read_sql_query("SELECT * FROM daily_prices ORDER BY date, ticker", sqlite_conn)
+    if not daily_prices.empty:
+        try:
+            supabase.rpc('ensure_daily_prices_partitions', {'from_date': str(daily_prices['date'].min())[:10]}).execute()
+        except Exception as e:
+            print(f"Could not create yearly partitions, rows will land in the default one: {e}")
     
     # Process in batches to avoid memory issues
     batch_size = 1000
@@ -0,0 +1,82 @@
+import hashlib
+from typing import List, Optional
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def basket_key(tickers: List[str], weights: np.ndarray, benchmark: Optional[str], days: int) -> str:
+    """Stable hash of a basket; the same holdings in any order hash the same"""
+    holdings = sorted(zip(tickers, np.round(weights, 8).tolist()))
+    raw = f"{holdings}|{benchmark}|{days}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def normalize_weights(tickers: List[str], weights: Optional[List[float]]) -> np.ndarray:
+    """Scale weights to sum to 1; no weights means an equal-weight basket"""
+    if not tickers:
+        raise ValueError('At least one ticker is required')
+    if weights is None:
+        return np.full(len(tickers), 1 / len(tickers))
+    if len(weights) != len(tickers):
+        raise ValueError(f'Got {len(weights)} weights for {len(tickers)} tickers')
+    w = np.asarray(weights, dtype=np.float64)
+    if not np.isfinite(w).all() or w.sum() == 0:
+        raise ValueError('Weights must be finite and must not sum to zero')
+    return w / w.sum()
+
+
+def analyze(dates: np.ndarray, closes: np.ndarray, weights: np.ndarray,
+            benchmark: Optional[np.ndarray] = None) -> dict:
+    """Portfolio statistics for a fixed-weight basket, rebalanced daily
+
+    Args:
+        dates: Trading dates (datetime64[D]) shared by every column
+        closes: (dates x holdings) closes with no gaps
+        weights: Holding weights summing to 1
+        benchmark: Benchmark closes on the same dates, or None
+
+    Returns:
+        Dict with the equity curve, risk figures and per-holding
+        contributions, computed from one aligned return matrix
+    """
+    returns = closes[1:] / closes[:-1] - 1
+    daily = returns @ weights
+    equity = np.cumprod(np.r_[1.0, 1 + daily])
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+
+    years = max(len(daily), 1) / TRADING_DAYS
+    volatility = daily.std(ddof=1) * np.sqrt(TRADING_DAYS) if len(daily) > 1 else 0.0
+
+    # Each holding's share of the portfolio's daily return and variance
+    cov = np.cov(returns, rowvar=False, ddof=1).reshape(len(weights), len(weights)) if len(daily) > 1 \
+        else np.zeros((len(weights), len(weights)))
+    variance = weights @ cov @ weights
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risk_contribution = weights * (cov @ weights) / variance if variance else np.zeros(len(weights))
+
+    beta = None
+    if benchmark is not None and len(daily) > 1:
+        bench = benchmark[1:] / benchmark[:-1] - 1
+        bench_var = bench.var(ddof=1)
+        if bench_var:
+            beta = float(np.cov(daily, bench, ddof=1)[0, 1] / bench_var)
+
+    return {
+        'dates': [str(d) for d in dates],
+        'equity': np.round(equity, 6),
+        'drawdown': np.round(drawdown, 6),
+        'total_return': float(equity[-1] - 1),
+        'annual_return': float(equity[-1] ** (1 / years) - 1) if len(daily) else 0.0,
+        'volatility': float(volatility),
+        'sharpe': float(daily.mean() * TRADING_DAYS / volatility) if volatility else None,
+        'max_drawdown': float(drawdown.max()),
+        'beta': beta,
+        'holdings': {
+            'weights': np.round(weights, 6),
+            'return': np.round(closes[-1] / closes[0] - 1, 6),
+            'contribution': np.round(returns.sum(axis=0) * weights, 6),
+            'risk_contribution': np.round(risk_contribution, 6)
+        }
+    }
@@ -0,0 +1,218 @@
+import argparse
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Optional
+
+import numpy as np
+
+from indicators import compute_indicators, parse_specs
+from screener import FIELDS as SCREENER_FIELDS, LOOKBACK, build_indicator_matrix
+from serialization import dumps, map_series, to_columnar
+from storage import apply_profile, optimize
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv('DB_PATH', 'stock_data.db')
+
+# Bars kept in each ticker's static snapshot (about one trading year)
+SNAPSHOT_BARS = 252
+
+# Indicators included in the snapshot payload
+SNAPSHOT_INDICATORS = 'sma20,sma50,rsi14,volume_ma20'
+
+# Entries kept per leaderboard
+LEADERBOARD_SIZE = 20
+
+# Below this many tickers the pool costs more to start than it saves
+MIN_POOL_TICKERS = 8
+
+# name -> (filter, ranking order)
+LEADERBOARD_QUERIES = {
+    'gainers': ('change_pct IS NOT NULL', 'change_pct DESC'),
+    'losers': ('change_pct IS NOT NULL', 'change_pct ASC'),
+    'high_volume': ('volume > volume_ma20', 'CAST(volume AS REAL) / volume_ma20 DESC')
+}
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """Open the database and make sure the serving tables exist"""
+    conn = sqlite3.connect(db_path)
+    apply_profile(conn)
+    schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
+    with open(schema_path, 'r') as f:
+        conn.executescript(f.read())
+    return conn
+
+
+def data_versions(conn: sqlite3.Connection, tickers: Optional[List[str]] = None) -> dict:
+    """Each ticker's version string, built like the API's (last_date, ingested_at:bars)"""
+    query = '''SELECT ticker, MAX(date), MAX(created_at), COUNT(*)
+               FROM daily_prices'''
+    params = ()
+    if tickers:
+        query += f' WHERE ticker IN ({",".join("?" * len(tickers))})'
+        params = tuple(tickers)
+    query += ' GROUP BY ticker'
+    return {
+        ticker: f'{last_date}:{ingested_at}:{bars}'
+        for ticker, last_date, ingested_at, bars in conn.execute(query, params)
+    }
+
+
+def build_snapshot(db_path: str, job: tuple) -> tuple:
+    """Compute one ticker's serving row; runs in a pool worker with its own connection
+
+    Args:
+        db_path: SQLite database path
+        job: (ticker, version) where version was read before the work was scheduled
+
+    Returns:
+        Values for a ticker_snapshots row
+    """
+    ticker, version = job
+    conn = sqlite3.connect(db_path)
+    apply_profile(conn)
+    try:
+        rows = conn.execute(
+            '''SELECT date, open, high, low, close, volume
+               FROM daily_prices
+               WHERE ticker = ?
+               ORDER BY date''',
+            (ticker,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+    bars = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 5)
+
+    # The same computation the screener runs over the whole universe
+    recent = bars[-LOOKBACK:]
+    positions = np.arange(len(recent), 0, -1)
+    matrix = build_indicator_matrix(np.full(len(recent), ticker), positions, dates[-LOOKBACK:], recent)
+    latest = dict(zip(SCREENER_FIELDS, matrix.values[0].tolist()))
+
+    columns = {name: bars[:, i] for i, name in enumerate(('open', 'high', 'low', 'close', 'volume'))}
+    indicators = compute_indicators(columns, parse_specs(SNAPSHOT_INDICATORS))
+    tail = slice(-SNAPSHOT_BARS, None)
+    prices = [
+        {'date': str(d), 'open': o, 'high': h, 'low': l, 'close': c, 'volume': int(v)}
+        for d, (o, h, l, c, v) in zip(dates[tail], bars[tail].tolist())
+    ]
+    payload = dumps(to_columnar(prices, map_series(indicators, lambda values: values[tail])))
+
+    def clean(value):
+        return None if value is None or np.isnan(value) else value
+
+    return (
+        ticker, version, str(dates[-1]),
+        *(clean(latest[field]) for field in SCREENER_FIELDS),
+        float(bars[tail, 1].max()), float(bars[tail, 2].min()),
+        payload
+    )
+
+
+def refresh_leaderboards(conn: sqlite3.Connection):
+    """Rank the latest trading day's snapshots into the leaderboards table"""
+    conn.execute('DELETE FROM leaderboards')
+    for name, (condition, order) in LEADERBOARD_QUERIES.items():
+        conn.execute(
+            f'''INSERT INTO leaderboards (name, rank, as_of, ticker, close, change_pct, volume, volume_ma20)
+                SELECT ?, position, last_date, ticker, close, change_pct, volume, volume_ma20
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (ORDER BY {order}, ticker) AS position
+                    FROM ticker_snapshots
+                    WHERE last_date = (SELECT MAX(last_date) FROM ticker_snapshots)
+                    AND {condition}
+                )
+                WHERE position <= ?''',
+            (name, LEADERBOARD_SIZE)
+        )
+
+
+def refresh_shared_cache(conn: sqlite3.Connection, changed: bool):
+    """Republish the hot tickers to shared memory for the API workers
+
+    Workers read anything not published from the database, so a failure
+    here (no shared memory on the host, say) is logged rather than raised.
+    """
+    from shared_cache import HOT_TICKERS, SUPPORTED, publish, published_generation
+
+    if HOT_TICKERS <= 0 or not SUPPORTED:
+        return
+    try:
+        if changed or not published_generation():
+            publish(conn)
+    except Exception as e:
+        logger.warning(f'Shared cache not refreshed: {e}')
+
+
+def run_precompute(db_path: str = DB_PATH, tickers: Optional[List[str]] = None,
+                   workers: Optional[int] = None, force: bool = False) -> List[str]:
+    """Refresh snapshots and leaderboards for tickers whose data changed
+
+    Safe to run any number of times: a ticker is recomputed only when its
+    data version differs from the one stored with its snapshot.
+
+    Args:
+        db_path: SQLite database path
+        tickers: Tickers touched by ingestion; None checks every ticker
+        workers: Worker processes (default: CPU count)
+        force: Recompute even when the version is unchanged
+
+    Returns:
+        Tickers that were recomputed
+    """
+    conn = connect(db_path)
+    try:
+        versions = data_versions(conn, tickers)
+        stored = dict(conn.execute('SELECT ticker, version FROM ticker_snapshots'))
+        jobs = [(t, v) for t, v in sorted(versions.items()) if force or stored.get(t) != v]
+        if not jobs:
+            logger.info('Precompute: nothing changed')
+            refresh_shared_cache(conn, changed=False)
+            return []
+
+        build = partial(build_snapshot, db_path)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) < MIN_POOL_TICKERS:
+            rows = [build(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = list(pool.map(build, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+        conn.executemany(
+            f'''INSERT OR REPLACE INTO ticker_snapshots
+                (ticker, version, last_date, {", ".join(SCREENER_FIELDS)}, year_high, year_low, payload, computed_at)
+                VALUES ({", ".join("?" * (len(SCREENER_FIELDS) + 6))}, CURRENT_TIMESTAMP)''',
+            rows
+        )
+        refresh_leaderboards(conn)
+        conn.commit()
+        # Ingestion just changed the table, so this is when statistics go stale
+        optimize(conn)
+        logger.info(f'Precomputed {len(rows)} tickers')
+        refresh_shared_cache(conn, changed=True)
+        return [job[0] for job in jobs]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute serving snapshots and leaderboards after ingestion')
+    parser.add_argument('tickers', nargs='*', help='Tickers to refresh (default: all that changed)')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite database path')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Recompute even if data is unchanged')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    updated = run_precompute(args.db, [t.upper() for t in args.tickers] or None, args.workers, args.force)
+    print(f"Precomputed {len(updated)} tickers")
+
+
+if __name__ == '__main__':
+    main()
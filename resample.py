@@ -0,0 +1,167 @@
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+# Resolutions built from stored daily bars
+RESOLUTIONS = ('day', 'week', 'month', 'quarter')
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def period_keys(dates: np.ndarray, resolution: str) -> np.ndarray:
+    """Map daily dates to the integer period each falls in
+
+    Args:
+        dates: numpy datetime64[D] array
+        resolution: 'day', 'week' (ISO, Monday start), 'month' or 'quarter'
+
+    Returns:
+        int64 array of period numbers, increasing with time
+    """
+    days = dates.astype('datetime64[D]').astype(np.int64)
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return (days + 3) // 7
+    months = dates.astype('datetime64[M]').astype(np.int64)
+    if resolution == 'month':
+        return months
+    if resolution == 'quarter':
+        return months // 3
+    raise ValueError(f'Unknown resolution: {resolution}')
+
+
+def aggregate_ohlcv(keys: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                    close: np.ndarray, volume: np.ndarray) -> dict:
+    """Aggregate time-sorted bars that share a period key
+
+    Returns:
+        Dict with the index of each period's first bar ('start') and first
+        open, max high, min low, last close, summed volume and bar count
+    """
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.append(starts[1:], len(keys)) - 1
+    return {
+        'start': starts,
+        'open': open_[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[ends],
+        'volume': np.add.reduceat(volume, starts),
+        'bar_count': ends - starts + 1
+    }
+
+
+def resample_daily(bars: dict, resolution: str) -> dict:
+    """Resample daily OHLCV columns to a coarser resolution
+
+    Args:
+        bars: Dict of numpy arrays: date (datetime64[D]), open, high, low, close, volume
+        resolution: 'week', 'month' or 'quarter'
+
+    Returns:
+        Dict of numpy arrays keyed like the input; date is each period's
+        first trading day
+    """
+    if not len(bars['date']):
+        return {**{field: bars[field][:0] for field in ('date',) + FIELDS}, 'bar_count': np.empty(0, dtype=np.int64)}
+
+    agg = aggregate_ohlcv(
+        period_keys(bars['date'], resolution),
+        bars['open'], bars['high'], bars['low'], bars['close'], bars['volume']
+    )
+    agg['date'] = bars['date'][agg.pop('start')]
+    return agg
+
+
+class Resampler:
+    """Cached weekly/monthly/quarterly bars, extended incrementally as daily bars arrive
+
+    Only the last period can still change when new days land, so an update
+    drops that period, reloads the daily bars from its first day and
+    re-aggregates just that tail. Anything other than an append (a rewrite
+    of older bars) triggers a full rebuild.
+    """
+
+    def __init__(self, load_bars: Callable[[str, Optional[str]], dict]):
+        """Initialize the resampler
+
+        Args:
+            load_bars: Called as load_bars(ticker, from_date) and returns daily
+                columns (see resample_daily) from that date on, or the whole
+                history when from_date is None
+        """
+        self.load_bars = load_bars
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, ticker: str, resolution: str, version: tuple) -> dict:
+        """Return resampled bars for a ticker at the given data version
+
+        Args:
+            ticker: Stock symbol
+            resolution: 'week', 'month' or 'quarter'
+            version: (last_date, ingest_version) from the data version cache
+        """
+        key = (ticker, resolution)
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry and entry['version'] == version:
+            return entry['bars']
+
+        bars = None
+        if entry and str(version[0]) > entry['last_date'] and self._is_append(entry, version):
+            bars = self._extend(ticker, resolution, entry)
+        if bars is None:
+            daily = self.load_bars(ticker, None)
+            bars = resample_daily(daily, resolution)
+            daily_count = len(daily['date'])
+        else:
+            daily_count = entry['daily_count'] + bars.pop('_appended')
+
+        with self._lock:
+            self._cache[key] = {
+                'version': version,
+                'bars': bars,
+                'last_date': str(version[0]),
+                'daily_count': daily_count
+            }
+        return bars
+
+    @staticmethod
+    def _is_append(entry: dict, version: tuple) -> bool:
+        """The ingest version ends in the daily bar count, which only grows on appends"""
+        try:
+            return int(str(version[1]).rsplit(':', 1)[1]) > entry['daily_count']
+        except (IndexError, ValueError):
+            return False
+
+    def _extend(self, ticker: str, resolution: str, entry: dict) -> Optional[dict]:
+        cached = entry['bars']
+        if not len(cached['date']):
+            return None
+
+        # Re-aggregate from the first day of the last cached period
+        tail_start = cached['date'][-1]
+        tail = self.load_bars(ticker, str(tail_start))
+        if not len(tail['date']) or tail['date'][0] != tail_start:
+            return None
+
+        fresh = resample_daily(tail, resolution)
+        bars = {
+            field: np.concatenate([cached[field][:-1], fresh[field]])
+            for field in ('date', 'bar_count') + FIELDS
+        }
+        bars['_appended'] = len(tail['date']) - int(cached['bar_count'][-1])
+        return bars
+
+    def invalidate(self, ticker: Optional[str] = None):
+        """Drop cached bars for one ticker, or all of them"""
+        with self._lock:
+            if ticker is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == ticker]:
+                    del self._cache[key]
@@ -18,3 +18,106 @@ CREATE TABLE IF NOT EXISTS daily_prices (
     UNIQUE(ticker, date),
     FOREIGN KEY (ticker) REFERENCES stocks(ticker)
 );
+
+-- Create intraday_bars table (minute bars, clustered by ticker and trading day)
+CREATE TABLE IF NOT EXISTS intraday_bars (
+    ticker TEXT NOT NULL,
+    day DATE NOT NULL,
+    ts TIMESTAMP NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    PRIMARY KEY (ticker, day, ts),
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker)
+) WITHOUT ROWID;
+
+-- Create intraday_rollups table (hourly and daily aggregates of intraday_bars)
+CREATE TABLE IF NOT EXISTS intraday_rollups (
+    ticker TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    ts TIMESTAMP NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    bar_count INTEGER,
+    PRIMARY KEY (ticker, resolution, ts),
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker)
+) WITHOUT ROWID;
+
+-- Create ticker_snapshots table (per-ticker values precomputed after ingestion)
+CREATE TABLE IF NOT EXISTS ticker_snapshots (
+    ticker TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    last_date DATE NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    ma20 REAL,
+    ma50 REAL,
+    rsi14 REAL,
+    volume_ma20 REAL,
+    change_pct REAL,
+    year_high REAL,
+    year_low REAL,
+    payload BLOB,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker)
+) WITHOUT ROWID;
+
+-- Create leaderboards table (ranked tickers for the latest trading day)
+CREATE TABLE IF NOT EXISTS leaderboards (
+    name TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    as_of DATE NOT NULL,
+    ticker TEXT NOT NULL,
+    close REAL,
+    change_pct REAL,
+    volume INTEGER,
+    volume_ma20 REAL,
+    PRIMARY KEY (name, rank)
+) WITHOUT ROWID;
+
+-- Create ingest_jobs table (persistent queue for import_stocks.py)
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+-- One live job per ticker; finished and dead jobs are kept as history
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ingest_jobs_live
+    ON ingest_jobs(ticker) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_due
+    ON ingest_jobs(status, priority DESC, run_after);
+
+-- Create corporate_actions table (splits and dividends applied to daily_prices at read time)
+CREATE TABLE IF NOT EXISTS corporate_actions (
+    ticker TEXT NOT NULL,
+    ex_date DATE NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('split', 'dividend')),
+    value REAL NOT NULL CHECK (value > 0),
+    source TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticker, ex_date, kind),
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker)
+) WITHOUT ROWID;
+
+-- Create ticker_hits table (API request counts used to pick the tickers kept in shared memory)
+CREATE TABLE IF NOT EXISTS ticker_hits (
+    ticker TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_hit TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
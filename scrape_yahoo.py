@@ -1,12 +1,11 @@
 from alpaca.data import StockHistoricalDataClient
 from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
+from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
 from datetime import datetime, timedelta
 import os
 import pandas as pd
 from datetime import datetime, timedelta
 import time
-import random
 import os
 import json
 import pickle
@@ -16,6 +15,19 @@ from typing import Optional, Dict, Any, Callable
 import logging
 import sqlite3
 from sqlite3 import Error
+from intraday import IntradayStore
+from resample import period_keys
+from precompute import run_precompute
+from fallback import Throttled, fetch_with_fallback
+from http_pool import AsyncHTTPPool
+from yahoo_parser import parse_history, parse_quote
+from validation import clean_daily_bars, log_report, to_rows
+from storage import apply_profile
+
+try:
+    import yfinance as yf
+except ImportError:  # yfinance is optional; the Yahoo page fallback still works
+    yf = None
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +36,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Browser user agents rotated across the Yahoo page sessions
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0'
+]
+
 def rate_limit(max_calls: int = 1, period: int = 900) -> Callable:
     """Rate limiting decorator with exponential backoff
     
@@ -169,6 +188,7 @@ class AlpacaScraper:
             # Create connection with foreign key support
             conn = sqlite3.connect(self.db_path)
             conn.execute('PRAGMA foreign_keys = ON')
+            apply_profile(conn)
             
             # Initialize schema
             schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
@@ -224,6 +244,13 @@ class AlpacaScraper:
             True if successful, False otherwise
         """
         try:
+            # Validate the whole frame before anything is written
+            clean, report = clean_daily_bars(data, symbol)
+            self.quality_reports[symbol] = report
+            log_report(report)
+            if clean.empty:
+                return False
+            
             # Insert stock if not exists
             self.conn.execute(
                 'INSERT OR IGNORE INTO stocks (ticker) VALUES (?)',
@@ -231,25 +258,55 @@ class AlpacaScraper:
             )
             
             # Insert daily prices
-            for _, row in data.iterrows():
-                self.conn.execute(
-                    '''
-                    INSERT OR REPLACE INTO daily_prices 
-                    (ticker, date, open, high, low, close, volume)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''',
-                    (symbol, row['timestamp'], row['open'], 
-                     row['high'], row['low'], row['close'], 
-                     row['volume'])
-                )
+            self.conn.executemany(
+                '''
+                INSERT OR REPLACE INTO daily_prices 
+                (ticker, date, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                to_rows(clean, symbol)
+            )
             
             self.conn.commit()
             return True
+        except ValueError as e:
+            logger.error(f'Invalid data for {symbol}: {e}')
+            return False
         except Error as e:
             logger.error(f'Error saving data to database: {e}')
             self.conn.rollback()
             return False
 
+    def backfill(self, ranges: list) -> dict:
+        """Fetch and store only the given date ranges
+        
+        Args:
+            ranges: (ticker, start, end, ...) tuples with ISO dates, as planned
+                by backfill.plan_backfill
+            
+        Returns:
+            Dictionary of (ticker, start, end) and their success status
+        """
+        results = {}
+        for ticker, start, end, *_ in ranges:
+            logger.info(f'Backfilling {ticker} from {start} to {end}')
+            # Daily bars are stamped after midnight UTC, so end on the following day
+            start_date = datetime.fromisoformat(start)
+            end_date = datetime.fromisoformat(end) + timedelta(days=1)
+            data = self.fetch_stock_data(ticker, start_date, end_date)
+            results[(ticker, start, end)] = data is not None and self.save_to_database(ticker, data)
+            if not results[(ticker, start, end)]:
+                logger.error(f'Failed to backfill {ticker} from {start} to {end}')
+        
+        updated = sorted({ticker for (ticker, _, _), success in results.items() if success})
+        if updated:
+            try:
+                run_precompute(self.db_path, updated)
+            except Exception as e:
+                logger.error(f'Error precomputing snapshots: {e}')
+        
+        return results
+
     def update_stock_data(self, symbols: list[str], days_back: int = 365) -> dict[str, bool]:
         """Update stock data for multiple symbols
         
@@ -279,14 +336,27 @@ class AlpacaScraper:
                 results[symbol] = False
                 logger.error(f'Failed to fetch data for {symbol}')
         
+        # Precompute snapshots and leaderboards for what changed, so the
+        # first dashboard request after ingestion is served warm
+        updated = [symbol for symbol, success in results.items() if success]
+        if updated:
+            try:
+                run_precompute(self.db_path, updated)
+            except Exception as e:
+                logger.error(f'Error precomputing snapshots: {e}')
+        
         return results
-    def __init__(self, data_dir='stock_data', cache_dir='cache', db_path='stock_data.db'):
+
+    def __init__(self, data_dir='stock_data', cache_dir='cache', db_path='stock_data.db', proxies=None):
         """Initialize Alpaca Market Data client
         
         Args:
             data_dir: Directory to store data files
             cache_dir: Directory to store cache
             db_path: SQLite database path
+            proxies: Proxy URL, or list of proxy URLs or scheme -> URL dicts, rotated
+                across the Yahoo page fetches; defaults to the comma-separated
+                YAHOO_PROXIES environment variable
         """
         self.data_dir = data_dir
         self.cache_dir = cache_dir
@@ -311,6 +381,15 @@ class AlpacaScraper:
             if not os.path.exists(d):
                 os.makedirs(d)
         
+        # Latest validation report per ticker
+        self.quality_reports = {}
+        
+        # Pooled HTTP client for the Yahoo page fallback
+        self.user_agents = USER_AGENTS
+        if proxies is None:
+            proxies = [p.strip() for p in os.getenv('YAHOO_PROXIES', '').split(',') if p.strip()] or None
+        self.proxies = proxies
+        self.http = AsyncHTTPPool(self.proxies, self.user_agents)
     
     def _create_connection(self):
         """Create a database connection"""
@@ -323,6 +402,7 @@ class AlpacaScraper:
             # Create connection with foreign key support
             conn = sqlite3.connect(self.db_path)
             conn.execute('PRAGMA foreign_keys = ON')
+            apply_profile(conn)
             
             # Initialize schema
             schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
@@ -356,37 +436,29 @@ class AlpacaScraper:
         except Error as e:
             logger.error(f'Error ensuring ticker exists: {e}')
 
-    def save_daily_data(self, ticker: str, data: pd.DataFrame):
-        """Save daily price data to database"""
+    def save_daily_data(self, ticker: str, data: pd.DataFrame) -> Optional[dict]:
+        """Validate and save daily price data to database
+        
+        Returns:
+            The quality report for the frame, or None if it could not be read
+        """
         if data is None or data.empty:
-            return
+            return None
+
+        try:
+            # Validate the whole frame in one pass instead of row by row
+            clean, report = clean_daily_bars(data, ticker)
+        except ValueError as e:
+            logger.warning(f'Invalid data for {ticker}: {e}')
+            return None
+        self.quality_reports[ticker] = report
+        log_report(report)
 
         try:
             # Ensure ticker exists
             self._ensure_ticker_exists(ticker)
 
-            # Prepare data for insertion
-            data_tuples = []
-            for _, row in data.iterrows():
-                try:
-                        # Convert timestamp to date string
-                    date_str = row['timestamp'].strftime('%Y-%m-%d')
-                    
-                    # Create data tuple
-                    data_tuple = (
-                        ticker,
-                        date_str,
-                        float(row['open']),
-                        float(row['high']),
-                        float(row['low']),
-                        float(row['close']),
-                        int(row['volume'])
-                    )
-                    data_tuples.append(data_tuple)
-                except (KeyError, ValueError) as e:
-                    logger.warning(f'Error processing row for {ticker}: {e}')
-                    continue
-
+            data_tuples = to_rows(clean, ticker)
             if data_tuples:
                 # Insert data
                 self.conn.executemany(
@@ -401,51 +473,8 @@ class AlpacaScraper:
                 logger.warning(f'No valid data to save for {ticker}')
         except Error as e:
             logger.error(f'Error saving daily data: {e}')
+        return report
 
-    def _create_session_pool(self, num_sessions=5):
-        """Create a pool of sessions with different configurations"""
-        sessions = []
-        for i in range(num_sessions):
-            session = requests.Session()
-            
-            # Set headers
-            session.headers.update({
-                'User-Agent': random.choice(self.user_agents),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache'
-            })
-            
-            # Set proxies if available
-            if self.proxies:
-                if isinstance(self.proxies, list):
-                    # If we have a list of proxies, rotate through them
-                    proxy = self.proxies[i % len(self.proxies)]
-                    if isinstance(proxy, str):
-                        session.proxies = {
-                            'http': proxy,
-                            'https': proxy
-                        }
-                    else:
-                        session.proxies = proxy
-                else:
-                    # If we have a single proxy config, use it for all sessions
-                    session.proxies = self.proxies
-            
-            sessions.append(session)
-        return sessions
-    
-    def _get_next_session(self):
-        """Get the next session from the pool"""
-        session = self.sessions[self.current_session_idx]
-        self.current_session_idx = (self.current_session_idx + 1) % len(self.sessions)
-        
-        # Rotate user agent
-        session.headers['User-Agent'] = random.choice(self.user_agents)
-        return session
-    
-    @rate_limit(max_calls=2, period=3600)  # Limit to 2 calls per hour
     @cache_result(cache_dir='cache', expire_after=300)  # Cache for 5 minutes
     @rate_limit(max_calls=200, period=60)  # Alpaca allows 200 requests per minute
     def get_market_data(self, symbol: str, start_date: datetime, end_date: datetime = None, 
@@ -489,6 +518,12 @@ class AlpacaScraper:
                         'volume': int(bar.volume)
                     })
                 
+                # Intraday bars share a date, so they go to their own table
+                # instead of overwriting each other in daily_prices
+                if timeframe.unit in (TimeFrameUnit.Minute, TimeFrameUnit.Hour):
+                    IntradayStore(self.conn).save_minute_bars(symbol, data)
+                    return data
+                
                 # Convert to DataFrame for saving
                 df = pd.DataFrame(data)
                 
@@ -502,205 +537,96 @@ class AlpacaScraper:
         except Exception as e:
             logger.error(f"Error getting data from Alpaca: {e}")
             return None
-        try:
-            # Try yfinance first
-            stock = yf.Ticker(ticker)
-            
-            # Add delay before request
-            time.sleep(2)  # 2 second delay between requests
-            
-            # Get daily data with more conservative period
-            daily_data = stock.history(period='5d')  # Reduced from 1mo to 5 days
-            if not daily_data.empty:
-                self.save_daily_data(ticker, daily_data)
-                time.sleep(1)  # Additional delay after successful request
-            info = stock.info
-            
-            if info:
-                stock_data = {
-                    'ticker': ticker,
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'price': info.get('regularMarketPrice', 'N/A'),
-                    'market_cap': info.get('marketCap', 'N/A'),
-                    'daily_change': info.get('regularMarketChangePercent', 'N/A'),
-                    'volume': info.get('regularMarketVolume', 'N/A')
-                }
-                logger.info(f'Successfully fetched current data for {ticker} using yfinance')
-                return stock_data
-            
-            # If yfinance fails, try web scraping with exponential backoff
-            logger.info(f"yfinance failed for {ticker}, trying web scraping...")
-            
-            url = f"https://finance.yahoo.com/quote/{ticker}"
-            
-            for attempt in range(3):  # Try 3 times
-                try:
-                    time.sleep((2 ** attempt) * 2)  # 2, 4, 8 seconds
-                    
-                    response = self._get_next_session().get(url)
-                    if response.status_code == 429:  # Too Many Requests
-                        logger.warning(f'Rate limited on attempt {attempt + 1}. Waiting before retry...')
-                        continue
-                    elif response.status_code != 200:
-                        logger.warning(f'HTTP {response.status_code} on attempt {attempt + 1}')
-                        continue
-                    
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    stock_data = {
-                        'ticker': ticker,
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    # Get current price
-                    price = soup.find('fin-streamer', {'data-symbol': ticker, 'data-field': 'regularMarketPrice'})
-                    if price and price.get('value'):
-                        try:
-                            stock_data['price'] = float(price['value'])
-                        except (ValueError, TypeError):
-                            continue
-                    
-                    # Get other metrics
-                    table = soup.find('table', {'class': 'W(100%)'})
-                    if table:
-                        rows = table.find_all('tr')
-                        for row in rows:
-                            cols = row.find_all('td')
-                            if len(cols) == 2:
-                                label = cols[0].text.strip().lower()
-                                value = cols[1].text.strip().replace(',', '')
-                                
-                                try:
-                                    if 'market cap' in label:
-                                        stock_data['market_cap'] = value
-                                    elif 'volume' in label:
-                                        stock_data['volume'] = int(value)
-                                except (ValueError, TypeError):
-                                    continue
-                    
-                    if len(stock_data) >= 3:  # At least ticker, timestamp, and one metric
-                        logger.info(f'Successfully fetched current data for {ticker} using web scraping')
-                        return stock_data
-                    
-                except Exception as e:
-                    logger.warning(f'Web scraping attempt {attempt + 1} failed for {ticker}: {e}')
-                    continue
-            
+
+    def _request_page(self, url: str):
+        """GET a Yahoo page through the HTTP pool, raising Throttled on 429"""
+        return self._check_response(url, self.http.fetch(url))
+
+    def _check_response(self, url: str, response):
+        if response.status_code == 429:  # Too Many Requests
+            retry_after = response.headers.get('Retry-After')
+            raise Throttled(f'HTTP 429 for {url}', float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if response.status_code != 200:
+            raise RuntimeError(f'HTTP {response.status_code} for {url}')
+        return response
+
+    def _current_from_yfinance(self, ticker: str) -> Optional[Dict[str, Any]]:
+        stock = yf.Ticker(ticker)
+        daily_data = stock.history(period='5d')
+        if not daily_data.empty:
+            self.save_daily_data(ticker, daily_data)
+        info = stock.info
+        if not info:
             return None
-            
+        return {
+            'ticker': ticker,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'price': info.get('regularMarketPrice', 'N/A'),
+            'market_cap': info.get('marketCap', 'N/A'),
+            'daily_change': info.get('regularMarketChangePercent', 'N/A'),
+            'volume': info.get('regularMarketVolume', 'N/A')
+        }
+
+    def _current_from_html(self, ticker: str) -> Optional[Dict[str, Any]]:
+        response = self._request_page(f"https://finance.yahoo.com/quote/{ticker}")
+        return parse_quote(response.text, ticker)
+
+    def get_current_data(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """Get current quote data from yfinance, falling back to the Yahoo quote page
+
+        Sources whose circuit breaker is open are skipped, and concurrency
+        per source adapts to throttling instead of sleeping between attempts.
+        """
+        try:
+            chain = []
+            if yf is not None:
+                chain.append(('yfinance', self._current_from_yfinance))
+            chain.append(('yahoo_html', self._current_from_html))
+            return fetch_with_fallback(chain, ticker, label=f'current data for {ticker}')
         except Exception as e:
             print(f"Error fetching current data for {ticker}: {str(e)}")
             return None
 
-    @rate_limit(max_calls=2, period=3600)  # Limit to 2 calls per hour
+    def _history_from_yf_download(self, ticker: str, start_date: datetime, end_date: datetime) -> Optional[pd.DataFrame]:
+        df = yf.download(ticker, start=start_date, end=end_date, progress=False)
+        return df if df is not None and not df.empty else None
+
+    def _history_from_yf_ticker(self, ticker: str, start_date: datetime, end_date: datetime) -> Optional[pd.DataFrame]:
+        df = yf.Ticker(ticker).history(start=start_date, end=end_date)
+        return df if not df.empty else None
+
+    def _history_from_html(self, ticker: str, start_date: datetime, end_date: datetime) -> Optional[pd.DataFrame]:
+        response = self._request_page(f"https://finance.yahoo.com/quote/{ticker}/history")
+        df = parse_history(response.text)
+        if df is None:
+            logger.warning(f'Historical data not found on page for {ticker}')
+        return df
+
     @cache_result(cache_dir='cache', expire_after=3600)  # Cache for 1 hour
     def get_historical_data(self, ticker: str, days: int = 365) -> Optional[pd.DataFrame]:
-        """Get historical stock data using multiple methods with rate limiting and caching"""
+        """Get historical stock data using multiple methods with rate limiting and caching
+
+        Tries yf.download, then yf.Ticker.history, then the Yahoo history
+        page, skipping any source whose circuit breaker is open. Pacing is
+        left to each source's limiter in fetch_with_fallback.
+        """
         try:
-            # Try yfinance first with exponential backoff
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
-            
-            for attempt in range(3):  # Try 3 times
-                try:
-                    base_wait = (2 ** attempt) * 60  # 60, 120, 240 seconds
-                    # Add random jitter between 0-30 seconds
-                    wait_time = base_wait + random.uniform(0, 30)
-                    if attempt > 0:
-                        logger.info(f'Waiting {wait_time} seconds before attempt {attempt + 1}...')
-                        time.sleep(wait_time)
-                    
-                    df = yf.download(
-                        ticker,
-                        start=start_date,
-                        end=end_date,
-                        progress=False
-                    )
-                    
-                    if df is not None and not df.empty:
-                        logger.info(f'Successfully fetched historical data for {ticker} using yfinance')
-                        return df
-                except Exception as e:
-                    logger.warning(f'Attempt {attempt + 1} failed for {ticker}: {e}')
-                    continue
-            
-            # If download fails, try Ticker object
-            time.sleep(1)
-            stock = yf.Ticker(ticker)
-            df = stock.history(start=start_date, end=end_date)
-            
-            if not df.empty:
-                return df
-            
-            # If both yfinance methods fail, try web scraping with exponential backoff
-            logger.info(f"yfinance methods failed for {ticker}, trying web scraping...")
-            
-            url = f"https://finance.yahoo.com/quote/{ticker}/history"
-            
-            for attempt in range(3):  # Try 3 times
-                try:
-                    time.sleep((2 ** attempt) * 2)  # 2, 4, 8 seconds
-                    
-                    response = self._get_next_session().get(url)
-                    if response.status_code == 429:  # Too Many Requests
-                        logger.warning(f'Rate limited on attempt {attempt + 1}. Waiting before retry...')
-                        continue
-                    elif response.status_code != 200:
-                        logger.warning(f'HTTP {response.status_code} on attempt {attempt + 1}')
-                        continue
-                    
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Find the historical data table
-                    table = soup.find('table', {'data-test': 'historical-prices'})
-                    if not table:
-                        logger.warning(f'Historical data table not found for {ticker}')
-                        continue
-                    
-                    # Parse table data
-                    data = []
-                    rows = table.find_all('tr')[1:]  # Skip header row
-                    
-                    for row in rows:
-                        cols = row.find_all('td')
-                        if len(cols) >= 6:  # Date, Open, High, Low, Close, Volume
-                            try:
-                                date = pd.to_datetime(cols[0].text)
-                                data.append({
-                                    'Date': date,
-                                    'Open': float(cols[1].text.replace(',', '')),
-                                    'High': float(cols[2].text.replace(',', '')),
-                                    'Low': float(cols[3].text.replace(',', '')),
-                                    'Close': float(cols[4].text.replace(',', '')),
-                                    'Volume': int(cols[5].text.replace(',', ''))
-                                })
-                            except (ValueError, TypeError) as e:
-                                logger.debug(f'Error parsing row: {e}')
-                                continue
-                    
-                    if data:
-                        df = pd.DataFrame(data)
-                        df.set_index('Date', inplace=True)
-                        df.sort_index(inplace=True)
-                        logger.info(f'Successfully fetched historical data for {ticker} using web scraping')
-                        return df
-                    
-                except Exception as e:
-                    logger.warning(f'Web scraping attempt {attempt + 1} failed for {ticker}: {e}')
-                    continue
-            
-            return None
-            
-        except Exception as e:
-            print(f"Error fetching historical data for {ticker}: {str(e)}")
-            return None
-
-
-            
-        except Exception as e:
-            print(f"Error fetching historical data for {ticker}: {str(e)}")
-            return None
-
+            chain = []
+            if yf is not None:
+                chain += [('yfinance', self._history_from_yf_download), ('yfinance_ticker', self._history_from_yf_ticker)]
+            chain.append(('yahoo_html', self._history_from_html))
+            df = fetch_with_fallback(chain, ticker, start_date, end_date, label=f'historical data for {ticker}')
+            if df is None:
+                return None
+            clean, report = clean_daily_bars(df, ticker)
+            self.quality_reports[ticker] = report
+            log_report(report)
+            if clean.empty:
+                return None
+            # Same shape as a yfinance frame: Date index, capitalized columns
+            return clean.set_index('date').rename_axis('Date').rename(columns=str.capitalize)
         except Exception as e:
             print(f"Error fetching historical data for {ticker}: {str(e)}")
             return None
@@ -740,7 +666,7 @@ class AlpacaScraper:
             json.dump(existing_data, f, indent=4)
     
     def close(self):
-        self.driver.quit()
+        self.http.close()
 
 def load_historical_data(data_dir, ticker):
     filename = os.path.join(data_dir, 'historical', f'{ticker}_historical.json')
@@ -790,7 +716,7 @@ def analyze_historical_data(data):
             'price_change_percent': ((df['price'].iloc[-1] - df['price'].iloc[0]) / df['price'].iloc[0]) * 100,
             'avg_daily_volume': df['volume'].mean(),
             'total_trading_days': len(df),
-            'monthly_volatility': df.groupby(df['date'].dt.strftime('%Y-%m'))['price'].std().mean()
+            'monthly_volatility': df['price'].groupby(period_keys(df['date'].values, 'month')).std().mean()
         }
     }
     
@@ -0,0 +1,221 @@
+import operator
+import re
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+# Bars per ticker loaded into the matrix; enough to warm up MA50 and RSI14
+LOOKBACK = 70
+
+RSI_PERIOD = 14
+
+FIELDS = (
+    'open', 'high', 'low', 'close', 'volume',
+    'ma20', 'ma50', 'rsi14', 'volume_ma20', 'change_pct'
+)
+
+OPERATORS = {
+    '<=': operator.le,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '>': operator.gt,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+# field op [number *] (field | number), e.g. "volume > 2*volume_ma20"
+PREDICATE_PATTERN = re.compile(
+    r'^\s*([a-z_0-9]+)\s*(<=|>=|==|!=|<|>)\s*(?:(-?\d+(?:\.\d+)?)\s*\*\s*)?([a-z_][a-z_0-9]*|-?\d+(?:\.\d+)?)\s*$'
+)
+
+
+class Predicate:
+    """A comparison between a field and a scaled field or constant"""
+
+    def __init__(self, expression: str):
+        match = PREDICATE_PATTERN.match(expression.lower())
+        if not match:
+            raise ValueError(f'Invalid screener filter: {expression!r}')
+
+        self.expression = expression
+        self.field, op, scale, self.rhs = match.groups()
+        self.op = OPERATORS[op]
+        self.scale = float(scale) if scale else 1.0
+
+        for name in (self.field, self.rhs):
+            if not _is_number(name) and name not in FIELDS:
+                raise ValueError(f'Unknown screener field {name!r}; expected one of {", ".join(FIELDS)}')
+
+    def evaluate(self, matrix: 'IndicatorMatrix') -> np.ndarray:
+        lhs = matrix.column(self.field)
+        rhs = float(self.rhs) if _is_number(self.rhs) else matrix.column(self.rhs)
+        # NaN (not enough history) compares False, so those tickers never match
+        return self.op(lhs, self.scale * rhs)
+
+
+def _is_number(token: str) -> bool:
+    return re.fullmatch(r'-?\d+(?:\.\d+)?', token) is not None
+
+
+class IndicatorMatrix:
+    """Latest indicator values for every ticker, one row per ticker and one column per field
+
+    as_of is the newest bar date in the universe; tickers whose own last bar
+    is older (delisted, halted, not yet ingested today) are not current.
+    """
+
+    def __init__(self, tickers: np.ndarray, values: np.ndarray, last_dates: np.ndarray):
+        self.tickers = tickers
+        self.values = values
+        self.last_dates = last_dates.astype('datetime64[D]')
+        latest = self.last_dates.max() if len(self.last_dates) else None
+        self.as_of = str(latest) if latest is not None else None
+        self.current = self.last_dates == latest if latest is not None else np.zeros(0, dtype=bool)
+        self._columns = {name: i for i, name in enumerate(FIELDS)}
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self._columns[name]]
+
+
+def _wilder_rsi(closes: np.ndarray, period: int = RSI_PERIOD, axis: int = -1) -> np.ndarray:
+    """Wilder RSI series along the bar axis of a close matrix, for every ticker at once
+
+    A simple average of the first period's moves seeds each ticker, then
+    Wilder smoothing takes over. Tickers may start with NaN padding when
+    they have less history; each one's smoothing starts at its first real
+    bar. A bar is NaN until period moves are seen and wherever its own move
+    is missing. The loop runs over bars only and is vectorized across tickers.
+    """
+    closes = np.moveaxis(closes, axis, -1)
+    deltas = np.diff(closes, axis=-1)
+    n = closes.shape[:-1]
+    seen = np.zeros(n, dtype=np.int64)
+    avg_gain = np.zeros(n)
+    avg_loss = np.zeros(n)
+    result = np.full(closes.shape, np.nan)
+
+    for j in range(deltas.shape[-1]):
+        d = deltas[..., j]
+        valid = ~np.isnan(d)
+        gain = np.where(valid & (d > 0), d, 0.0)
+        loss = np.where(valid & (d < 0), -d, 0.0)
+        seen += valid
+
+        seeding = valid & (seen <= period)
+        avg_gain[seeding] += gain[seeding] / period
+        avg_loss[seeding] += loss[seeding] / period
+
+        smoothing = valid & (seen > period)
+        avg_gain[smoothing] = (avg_gain[smoothing] * (period - 1) + gain[smoothing]) / period
+        avg_loss[smoothing] = (avg_loss[smoothing] * (period - 1) + loss[smoothing]) / period
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+        rsi[(seen < period) | ~valid] = np.nan
+        result[..., j + 1] = rsi
+    return np.moveaxis(result, -1, axis)
+
+
+def build_indicator_matrix(tickers: np.ndarray, positions: np.ndarray, dates: np.ndarray,
+                           bars: np.ndarray, lookback: int = LOOKBACK) -> IndicatorMatrix:
+    """Build the latest-value matrix from the last `lookback` bars of every ticker
+
+    Args:
+        tickers: Ticker of each bar row
+        positions: 1 for a ticker's latest bar, 2 for the one before, and so on
+        dates: Date of each bar row (datetime64[D])
+        bars: (rows x 5) float array of open, high, low, close, volume
+
+    Returns:
+        IndicatorMatrix with one row per distinct ticker
+    """
+    symbols, row_of = np.unique(tickers, return_inverse=True)
+    cube = np.full((len(symbols), lookback, 5), np.nan)
+    cube[row_of, lookback - positions] = bars
+
+    closes = cube[:, :, 3]
+    volumes = cube[:, :, 4]
+    latest = cube[:, -1, :]
+    previous_close = closes[:, -2]
+
+    # A window containing NaN padding yields NaN, so short histories never pass a filter
+    values = np.column_stack([
+        latest,
+        closes[:, -20:].mean(axis=1),
+        closes[:, -50:].mean(axis=1),
+        _wilder_rsi(closes)[:, -1],
+        volumes[:, -20:].mean(axis=1),
+        (latest[:, 3] - previous_close) / previous_close * 100
+    ])
+    last_dates = np.empty(len(symbols), dtype='datetime64[D]')
+    newest = positions == 1
+    last_dates[row_of[newest]] = dates[newest]
+    return IndicatorMatrix(symbols, values, last_dates)
+
+
+class Screener:
+    """Evaluates composable filters over the whole universe in one vectorized pass
+
+    The matrix is loaded once per market data version and reused for every
+    request until new bars are ingested.
+    """
+
+    def __init__(self, load_matrix: Callable[[], IndicatorMatrix]):
+        self.load_matrix = load_matrix
+        self._matrix = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def matrix(self, version) -> IndicatorMatrix:
+        with self._lock:
+            if self._matrix is not None and self._version == version:
+                return self._matrix
+        matrix = self.load_matrix()
+        with self._lock:
+            self._matrix, self._version = matrix, version
+        return matrix
+
+    def screen(self, version, filters: List[str], sort: Optional[str] = None,
+               descending: bool = True, limit: int = 100) -> dict:
+        """Return the tickers matching every filter
+
+        Args:
+            version: Market data version; a change reloads the matrix
+            filters: Expressions such as 'rsi14 < 30', 'close > ma50',
+                'volume > 2*volume_ma20'
+            sort: Field to order matches by
+            descending: Sort order
+            limit: Maximum matches returned
+
+        Only tickers with a bar on the as_of date are screened, so values
+        from different sessions are never ranked together.
+        """
+        predicates = [Predicate(f) for f in filters]
+        if sort is not None and sort not in FIELDS:
+            raise ValueError(f'Unknown sort field {sort!r}')
+        if limit < 0:
+            raise ValueError('limit must not be negative')
+
+        matrix = self.matrix(version)
+        mask = matrix.current.copy()
+        for predicate in predicates:
+            mask &= predicate.evaluate(matrix)
+
+        idx = np.flatnonzero(mask)
+        if sort is not None:
+            keys = matrix.column(sort)[idx]
+            order = np.argsort(-keys if descending else keys, kind='stable')
+            idx = idx[order]
+        idx = idx[:limit]
+
+        rows = matrix.values[idx]
+        return {
+            'as_of': matrix.as_of,
+            'universe': len(matrix.tickers),
+            'stale': int((~matrix.current).sum()),
+            'matched': int(mask.sum()),
+            'fields': list(FIELDS),
+            'tickers': matrix.tickers[idx].tolist(),
+            'values': np.round(rows, 4)
+        }
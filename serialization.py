@@ -0,0 +1,86 @@
+import numpy as np
+import orjson
+
+# Decimal places kept for derived float series (moving averages, RSI).
+# Prices are stored with two decimals, so four keeps full chart precision
+# while dropping the long float tails that dominate the JSON size.
+INDICATOR_DECIMALS = 4
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+
+def dumps(payload) -> bytes:
+    """Encode a payload to JSON bytes, serializing numpy arrays natively"""
+    return orjson.dumps(
+        payload,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def map_series(indicators: dict, fn) -> dict:
+    """Apply fn to every series of an indicator dict, keeping its nesting
+
+    Covers the default moving_averages/rsi/volume_ma layout as well as the
+    label -> series or label -> {line: series} layout of selected indicators.
+    """
+    return {
+        name: map_series(value, fn) if isinstance(value, dict) else fn(value)
+        for name, value in indicators.items()
+    }
+
+
+def _series(values) -> dict:
+    """Encode an indicator list as a leading-null offset plus its values
+
+    Indicator gaps only occur during the warm-up window, so the null mask is
+    carried as the index of the first valid value. Any interior gaps are kept
+    as NaN and serialized as null.
+    """
+    arr = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(arr))
+    offset = int(valid[0]) if valid.size else len(arr)
+    return {
+        'offset': offset,
+        'values': np.round(arr[offset:], INDICATOR_DECIMALS)
+    }
+
+
+def price_columns(prices: list) -> dict:
+    """Build one numpy array per OHLCV field from per-bar dicts"""
+    columns = {
+        field: np.fromiter((p[field] for p in prices), dtype=np.float64, count=len(prices))
+        for field in PRICE_FIELDS
+    }
+    columns['volume'] = np.fromiter((p['volume'] for p in prices), dtype=np.int64, count=len(prices))
+    return columns
+
+
+def to_columnar(prices: list, indicators: dict) -> dict:
+    """Convert row-oriented prices and indicator lists into a columnar payload
+
+    Args:
+        prices: List of per-bar dicts as returned by get_stock_data
+        indicators: Dict of indicator series, possibly nested one level
+
+    Returns:
+        Dict with a shared date index, one array per price field and one
+        offset/values pair per indicator series
+    """
+    return {
+        'format': 'columnar',
+        'dates': [str(p['date']) for p in prices],
+        'prices': price_columns(prices),
+        'indicators': map_series(indicators, _series)
+    }
+
+
+def slice_since(prices: list, indicators: dict, since: str):
+    """Keep only the bars on or after a date, along with their indicator values
+
+    The bar on the date itself is included because ingestion rewrites the
+    current day's bar in place; clients replace bars by date. Indicators are
+    computed on the full window before slicing, so the values match what the
+    client would have received in a full response.
+    """
+    start = next((i for i, p in enumerate(prices) if str(p['date']) >= since), len(prices))
+    return prices[start:], map_series(indicators, lambda values: values[start:])
@@ -0,0 +1,451 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from precompute import DB_PATH, connect, data_versions
+
+try:
+    import fcntl
+except ImportError:  # not a POSIX host; workers read everything from the database
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Shared memory holding the hottest tickers' daily bars and precomputed
+# snapshot payloads, written after ingestion and mapped read-only by every
+# API worker, so adding workers does not add copies.
+#
+# Each publish writes a complete, immutable segment named after its
+# generation, then stores the generation in a small control segment.
+# Readers switch segments when the generation changes, so they never see a
+# partly written one. The previous segment is unlinked right away; workers
+# still holding it keep a valid mapping until they move on.
+SEGMENT_NAME = os.getenv('SHARED_CACHE_NAME', 'stock_hot_cache')
+
+# Tickers published; 0 turns the writer off
+HOT_TICKERS = int(os.getenv('SHARED_CACHE_TICKERS', 50))
+
+# Seconds between attempts to attach when nothing has been published yet
+ATTACH_RETRY = 5.0
+
+# Where POSIX shared memory segments appear as files, so readers can map
+# them read-only with plain os.open and mmap
+SHM_DIR = '/dev/shm'
+
+# Publishing needs flock and readers need SHM_DIR; elsewhere every read
+# falls through to the database
+SUPPORTED = fcntl is not None and os.path.isdir(SHM_DIR)
+
+MAGIC = b'HOTBARS1'
+
+# magic, generation, index offset, index length
+HEADER = struct.Struct('<8sQQQ')
+
+ALIGN = 64
+
+COLUMNS = {
+    'date': 'datetime64[D]',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64'
+}
+
+
+def _untrack(segment: shared_memory.SharedMemory):
+    """Keep the resource tracker from unlinking a segment when this process exits
+
+    Segments outlive the writer and are shared by readers, so only publish
+    and clear remove them.
+    """
+    resource_tracker.unregister(segment._name, 'shared_memory')
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    segment = shared_memory.SharedMemory(name=name)
+    _untrack(segment)
+    return segment
+
+
+def _map_readonly(name: str) -> mmap.mmap:
+    """Map a segment read-only
+
+    Arrays built on the mapping with np.frombuffer keep it open, so it is
+    unmapped only once the last view is gone. SharedMemory.close() would
+    unmap it under any numpy views still pointing into it.
+    """
+    fd = os.open(os.path.join(SHM_DIR, name), os.O_RDONLY)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _segment_name(name: str, generation: int) -> str:
+    return f'{name}_{generation}'
+
+
+def _generation_view(control: shared_memory.SharedMemory) -> np.ndarray:
+    # An aligned 8-byte slot, so the store that publishes a generation is a single write
+    return np.ndarray((1,), dtype=np.uint64, buffer=control.buf, offset=len(MAGIC))
+
+
+@contextmanager
+def _writer_lock(name: str):
+    """Serialize publishers on this host; readers never take it"""
+    with open(os.path.join(tempfile.gettempdir(), f'{name}.lock'), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def published_generation(name: str = SEGMENT_NAME) -> int:
+    """Generation currently published, or 0 when there is none"""
+    try:
+        control = _map_readonly(name)
+    except (FileNotFoundError, ValueError):
+        return 0
+    with control:
+        return struct.unpack_from('<Q', control, len(MAGIC))[0]
+
+
+def hot_tickers(conn: sqlite3.Connection, size: int = HOT_TICKERS) -> List[str]:
+    """The most requested tickers, topped up with the most traded ones
+
+    Request counts come from ticker_hits, which the API workers update; the
+    top-up ranks the latest snapshots by dollar volume.
+    """
+    tickers = [row[0] for row in conn.execute(
+        'SELECT ticker FROM ticker_hits ORDER BY hits DESC, ticker LIMIT ?', (size,)
+    )]
+    if len(tickers) < size:
+        for (ticker,) in conn.execute(
+            'SELECT ticker FROM ticker_snapshots ORDER BY close * volume_ma20 DESC, ticker LIMIT ?', (size,)
+        ):
+            if len(tickers) >= size:
+                break
+            if ticker not in tickers:
+                tickers.append(ticker)
+    return tickers
+
+
+def load_hot_data(conn: sqlite3.Connection, tickers: List[str]) -> Tuple[dict, dict, dict, dict]:
+    """Read versions, bars and snapshot payloads for the tickers in one read transaction
+
+    Returns:
+        (versions, columns, ranges, snapshots): ticker -> version string,
+        columns of every ticker's bars ordered by ticker and date, ticker ->
+        (start, stop) rows in them, and ticker -> snapshot payload where it
+        matches the bars' version
+    """
+    placeholders = ','.join('?' * len(tickers))
+    conn.execute('BEGIN')
+    try:
+        versions = data_versions(conn, tickers)
+        rows = conn.execute(
+            f'''SELECT ticker, date, open, high, low, close, volume
+                FROM daily_prices
+                WHERE ticker IN ({placeholders})
+                ORDER BY ticker, date''',
+            tuple(tickers)
+        ).fetchall()
+        snapshots = {
+            ticker: bytes(payload)
+            for ticker, version, payload in conn.execute(
+                f'SELECT ticker, version, payload FROM ticker_snapshots WHERE ticker IN ({placeholders})',
+                tuple(tickers)
+            )
+            if payload is not None and version == versions.get(ticker)
+        }
+    finally:
+        conn.rollback()
+
+    symbols = np.array([row[0] for row in rows])
+    columns = {
+        'date': np.array([str(row[1])[:10] for row in rows], dtype='datetime64[D]'),
+        **{
+            field: np.array([row[i] for row in rows], dtype=COLUMNS[field])
+            for i, field in enumerate(('open', 'high', 'low', 'close', 'volume'), start=2)
+        }
+    }
+    boundaries = np.r_[0, np.flatnonzero(symbols[1:] != symbols[:-1]) + 1, len(rows)] if len(rows) else []
+    ranges = {
+        str(symbols[start]): (int(start), int(stop))
+        for start, stop in zip(boundaries[:-1], boundaries[1:])
+    }
+    return versions, columns, ranges, snapshots
+
+
+def publish(conn: sqlite3.Connection, tickers: Optional[List[str]] = None, size: int = HOT_TICKERS,
+            name: str = SEGMENT_NAME) -> int:
+    """Write a new generation of the shared segment and switch readers to it
+
+    Args:
+        conn: Database connection
+        tickers: Tickers to publish (default: hot_tickers)
+        size: Number of hot tickers when tickers is not given
+        name: Control segment name
+
+    Returns:
+        The published generation
+
+    Raises:
+        OSError: When the host has no POSIX shared memory
+    """
+    if not SUPPORTED:
+        raise OSError(f'POSIX shared memory is not available under {SHM_DIR}')
+    with _writer_lock(name):
+        tickers = tickers if tickers is not None else hot_tickers(conn, size)
+        versions, columns, ranges, snapshots = load_hot_data(conn, tickers) if tickers else ({}, {}, {}, {})
+        rows = len(columns['date']) if columns else 0
+
+        try:
+            control = _attach(name)
+        except FileNotFoundError:
+            control = shared_memory.SharedMemory(name=name, create=True, size=len(MAGIC) + 8)
+            _untrack(control)
+            control.buf[:len(MAGIC)] = MAGIC
+        generation_slot = _generation_view(control)
+        previous = int(generation_slot[0])
+        generation = previous + 1
+
+        # Columns first, then snapshot payloads, then the index describing them
+        offset = _aligned(HEADER.size)
+        index = {'generation': generation, 'published_at': time.time(), 'rows': rows,
+                 'columns': {}, 'tickers': {}}
+        for field, dtype in COLUMNS.items():
+            index['columns'][field] = [dtype, offset]
+            offset = _aligned(offset + rows * np.dtype(dtype).itemsize)
+        for ticker in tickers:
+            if ticker not in ranges:
+                continue
+            entry = {'version': versions[ticker], 'rows': list(ranges[ticker]), 'snapshot': None}
+            if ticker in snapshots:
+                entry['snapshot'] = [offset, len(snapshots[ticker])]
+                offset += len(snapshots[ticker])
+            index['tickers'][ticker] = entry
+        encoded = json.dumps(index).encode()
+
+        segment = shared_memory.SharedMemory(name=_segment_name(name, generation), create=True,
+                                             size=offset + len(encoded))
+        _untrack(segment)
+        try:
+            segment.buf[:HEADER.size] = HEADER.pack(MAGIC, generation, offset, len(encoded))
+            if rows:
+                for field, (dtype, start) in index['columns'].items():
+                    np.ndarray((rows,), dtype=dtype, buffer=segment.buf, offset=start)[:] = columns[field]
+            for ticker, entry in index['tickers'].items():
+                if entry['snapshot'] is not None:
+                    start, length = entry['snapshot']
+                    segment.buf[start:start + length] = snapshots[ticker]
+            segment.buf[offset:offset + len(encoded)] = encoded
+        finally:
+            segment.close()
+
+        # Readers pick the new generation up from here on
+        generation_slot[0] = generation
+        del generation_slot
+        control.close()
+
+        if previous:
+            try:
+                old = shared_memory.SharedMemory(name=_segment_name(name, previous))
+                old.close()
+                old.unlink()
+            except FileNotFoundError:
+                pass
+
+    # Halve request counts so the ranking follows recent demand
+    conn.execute('UPDATE ticker_hits SET hits = hits / 2')
+    conn.execute('DELETE FROM ticker_hits WHERE hits = 0')
+    conn.commit()
+    logger.info(f'Published {len(index["tickers"])} hot tickers, {rows} bars, generation {generation}')
+    return generation
+
+
+def clear(name: str = SEGMENT_NAME):
+    """Unlink the control segment and the published generation"""
+    if not SUPPORTED:
+        return
+    with _writer_lock(name):
+        generation = published_generation(name)
+        for segment_name in ([_segment_name(name, generation)] if generation else []) + [name]:
+            try:
+                segment = shared_memory.SharedMemory(name=segment_name)
+                segment.close()
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class HotTickerCache:
+    """Read-only access to the published hot-ticker segment
+
+    Columns are numpy views into a read-only mapping of the segment, so
+    every worker reads the same physical pages. An entry is only returned
+    for the data version it was built from; any other version falls through
+    to the database. Each lookup checks the control segment's generation,
+    which is one memory read, and maps the new segment when it has changed.
+    A replaced mapping stays valid for as long as a request holds a view
+    into it and is unmapped with the last one.
+    """
+
+    def __init__(self, name: str = SEGMENT_NAME):
+        self.name = name
+        self._lock = threading.Lock()
+        self._generation_slot = None
+        self._next_attach = 0.0
+        self._mapping = None
+        self._generation = 0
+        self._index = {'tickers': {}}
+        self._columns = {}
+        self._hits = Counter()
+        self._stats = {'hits': 0, 'misses': 0, 'swaps': 0}
+
+    def _refresh(self):
+        """Map the latest generation; called with the lock held"""
+        if self._generation_slot is None:
+            if not SUPPORTED or time.monotonic() < self._next_attach:
+                return
+            try:
+                self._generation_slot = np.frombuffer(_map_readonly(self.name), dtype=np.uint64,
+                                                      count=1, offset=len(MAGIC))
+            except (FileNotFoundError, ValueError):
+                # Not published yet, or the writer is still sizing the segment
+                self._next_attach = time.monotonic() + ATTACH_RETRY
+                return
+
+        generation = int(self._generation_slot[0])
+        if generation == self._generation or generation == 0:
+            return
+        try:
+            mapping = _map_readonly(_segment_name(self.name, generation))
+        except FileNotFoundError:
+            # Already replaced by a newer generation; the next lookup finds it
+            return
+
+        magic, stored, index_offset, index_length = HEADER.unpack_from(mapping)
+        if magic != MAGIC or stored != generation:
+            return
+        index = json.loads(mapping[index_offset:index_offset + index_length])
+        self._columns = {
+            field: np.frombuffer(mapping, dtype=dtype, count=index['rows'], offset=start)
+            for field, (dtype, start) in index['columns'].items()
+        }
+        self._mapping, self._generation, self._index = mapping, generation, index
+        self._stats['swaps'] += 1
+
+    def _entry(self, ticker: str, version) -> Tuple[Optional[dict], Optional[mmap.mmap], dict]:
+        """The ticker's index entry with the mapping and columns it points into"""
+        with self._lock:
+            self._refresh()
+            entry = self._index['tickers'].get(ticker)
+            if entry is None or not version or entry['version'] != ':'.join(version):
+                self._stats['misses'] += 1
+                return None, None, {}
+            self._stats['hits'] += 1
+            return entry, self._mapping, self._columns
+
+    def columns(self, ticker: str, version: Optional[tuple], from_date: Optional[str] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Daily OHLCV columns for a ticker at a data version, from a date on
+
+        Args:
+            ticker: Stock symbol
+            version: (last_date, ingest_version) from the data version cache
+            from_date: First date to include (default: the whole history)
+
+        Returns:
+            Read-only column views, or None when the ticker is not published
+            at that version
+        """
+        entry, _, columns = self._entry(ticker, version)
+        if entry is None:
+            return None
+        start, stop = entry['rows']
+        if from_date:
+            start += int(np.searchsorted(columns['date'][start:stop], np.datetime64(str(from_date)[:10], 'D')))
+        return {field: column[start:stop] for field, column in columns.items()}
+
+    def snapshot(self, ticker: str, version: Optional[tuple]) -> Optional[bytes]:
+        """The ticker's precomputed snapshot payload, when published at that version"""
+        entry, mapping, _ = self._entry(ticker, version)
+        if entry is None or entry['snapshot'] is None:
+            return None
+        start, length = entry['snapshot']
+        return mapping[start:start + length]
+
+    def record_hit(self, ticker: str):
+        """Count a request, so the writer can rank tickers by demand"""
+        with self._lock:
+            self._hits[ticker] += 1
+
+    def take_hits(self) -> Dict[str, int]:
+        """Request counts since the last call"""
+        with self._lock:
+            hits, self._hits = dict(self._hits), Counter()
+        return hits
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            stats = dict(self._stats)
+            stats['generation'] = self._generation
+            stats['tickers'] = len(self._index['tickers'])
+            stats['bytes'] = len(self._mapping) if self._mapping is not None else 0
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish the hot-ticker shared memory segment read by the API workers')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite database path')
+    parser.add_argument('--name', default=SEGMENT_NAME, help='Control segment name')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    publish_cmd = subparsers.add_parser('publish', help='Write a new generation')
+    publish_cmd.add_argument('tickers', nargs='*', help='Tickers to publish (default: the hottest)')
+    publish_cmd.add_argument('--size', type=int, default=HOT_TICKERS, help='Number of hot tickers')
+
+    subparsers.add_parser('info', help='Show the published generation')
+    subparsers.add_parser('clear', help='Remove the published segments')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == 'publish':
+        conn = connect(args.db)
+        try:
+            generation = publish(conn, [t.upper() for t in args.tickers] or None, args.size, args.name)
+        finally:
+            conn.close()
+        print(f'Published generation {generation}')
+    elif args.command == 'info':
+        stats = HotTickerCache(args.name).stats()
+        print(f"generation: {stats['generation']}")
+        print(f"tickers: {stats['tickers']}")
+        print(f"bytes: {stats['bytes']}")
+    else:
+        clear(args.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,75 @@ document.addEventListener('DOMContentLoaded', function() {
     const loadingIndicator = document.getElementById('loading');
     const errorMessage = document.getElementById('error');
 
+    // Columnar responses already loaded, per ticker, extended by delta syncs
+    const loaded = {};
+
+    // Expand an {offset, values} indicator series to one value per bar
+    function expandSeries(series, length) {
+        if (!series) {
+            return Array(length).fill(null);
+        }
+        return Array(series.offset).fill(null).concat(Array.from(series.values));
+    }
+
+    function mergeSeries(current, currentLength, delta, deltaLength) {
+        return {
+            offset: 0,
+            values: expandSeries(current, currentLength).concat(expandSeries(delta, deltaLength))
+        };
+    }
+
+    // Fetch the full window once, then only the bars after the last cursor
+    async function loadStockData(ticker) {
+        const cached = loaded[ticker];
+        // Never ask for more bars than the chart has pixels
+        const points = Math.max(100, document.getElementById('candlestick').clientWidth || 1000);
+        const url = cached
+            ? `/api/stock/${ticker}?format=columnar&since=${encodeURIComponent(cached.cursor)}`
+            : `/api/stock/${ticker}?format=columnar&points=${points}`;
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const delta = await response.json();
+        if (delta.downsampled) {
+            // Bucketed bars cannot be extended bar by bar, so they are not kept for delta sync
+            return delta;
+        }
+        if (!cached) {
+            delta.cursor = delta.dates[delta.dates.length - 1];
+            loaded[ticker] = delta;
+            return delta;
+        }
+
+        const currentLength = cached.dates.length;
+        const deltaLength = delta.dates.length;
+        if (deltaLength) {
+            cached.dates = cached.dates.concat(delta.dates);
+            Object.keys(cached.prices).forEach(field => {
+                cached.prices[field] = Array.from(cached.prices[field]).concat(Array.from(delta.prices[field]));
+            });
+            const names = new Set([
+                ...Object.keys(cached.indicators.moving_averages),
+                ...Object.keys(delta.indicators.moving_averages)
+            ]);
+            names.forEach(name => {
+                cached.indicators.moving_averages[name] = mergeSeries(
+                    cached.indicators.moving_averages[name], currentLength,
+                    delta.indicators.moving_averages[name], deltaLength
+                );
+            });
+            ['rsi', 'volume_ma'].forEach(name => {
+                cached.indicators[name] = mergeSeries(
+                    cached.indicators[name], currentLength, delta.indicators[name], deltaLength
+                );
+            });
+        }
+        cached.cursor = delta.cursor;
+        cached.version = delta.version;
+        return cached;
+    }
+
     async function fetchStockData(ticker) {
         try {
             loadingIndicator.style.display = 'block';
@@ -12,33 +81,30 @@ document.addEventListener('DOMContentLoaded', function() {
             document.getElementById('rsi').innerHTML = '';
             document.getElementById('volume').innerHTML = '';
 
-            const response = await fetch(`/api/stock/${ticker}`);
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            const responseData = await response.json();
-            const data = responseData.prices;
+            const responseData = await loadStockData(ticker);
+            const dates = responseData.dates;
+            const prices = responseData.prices;
             const indicators = responseData.indicators;
 
             // Create candlestick chart data with moving averages
             const traces = [
                 {
                     type: 'candlestick',
-                    x: data.map(d => d.date),
-                    open: data.map(d => d.open),
-                    high: data.map(d => d.high),
-                    low: data.map(d => d.low),
-                    close: data.map(d => d.close),
+                    x: dates,
+                    open: prices.open,
+                    high: prices.high,
+                    low: prices.low,
+                    close: prices.close,
                     name: ticker
                 }
             ];
 
             // Add moving averages
-            Object.entries(indicators.moving_averages).forEach(([key, values]) => {
+            Object.entries(indicators.moving_averages).forEach(([key, series]) => {
                 traces.push({
                     type: 'scatter',
-                    x: data.map(d => d.date),
-                    y: values,
+                    x: series.dates || dates.slice(series.offset),
+                    y: series.values,
                     name: key,
                     line: { width: 1 }
                 });
@@ -55,8 +121,8 @@ document.addEventListener('DOMContentLoaded', function() {
             // Create RSI chart
             const rsiTrace = {
                 type: 'scatter',
-                x: data.map(d => d.date),
-                y: indicators.rsi,
+                x: indicators.rsi.dates || dates.slice(indicators.rsi.offset),
+                y: indicators.rsi.values,
                 name: 'RSI'
             };
 
@@ -66,9 +132,9 @@ document.addEventListener('DOMContentLoaded', function() {
                 xaxis: { title: 'Date' },
                 template: 'plotly_dark',
                 shapes: [
-                    { type: 'line', y0: 70, y1: 70, x0: data[0].date, x1: data[data.length-1].date,
+                    { type: 'line', y0: 70, y1: 70, x0: dates[0], x1: dates[dates.length-1],
                       line: { color: 'red', width: 1, dash: 'dash' } },
-                    { type: 'line', y0: 30, y1: 30, x0: data[0].date, x1: data[data.length-1].date,
+                    { type: 'line', y0: 30, y1: 30, x0: dates[0], x1: dates[dates.length-1],
                       line: { color: 'green', width: 1, dash: 'dash' } }
                 ]
             };
@@ -77,14 +143,14 @@ document.addEventListener('DOMContentLoaded', function() {
             const volumeTraces = [
                 {
                     type: 'bar',
-                    x: data.map(d => d.date),
-                    y: data.map(d => d.volume),
+                    x: dates,
+                    y: prices.volume,
                     name: 'Volume'
                 },
                 {
                     type: 'scatter',
-                    x: data.map(d => d.date),
-                    y: indicators.volume_ma,
+                    x: indicators.volume_ma.dates || dates.slice(indicators.volume_ma.offset),
+                    y: indicators.volume_ma.values,
                     name: 'Volume MA (20)',
                     line: { color: 'orange', width: 1 }
                 }
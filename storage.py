@@ -0,0 +1,324 @@
+import argparse
+import logging
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Connection settings per storage profile. 'default' leaves SQLite's own
+# defaults alone; 'performance' trades a little durability on power loss
+# (synchronous=NORMAL under WAL keeps the database consistent but may lose
+# the last commits) for concurrent readers and far fewer fsyncs.
+PROFILES = {
+    'default': {},
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # KiB when negative, so 64 MiB
+        'temp_store': 'MEMORY'
+    }
+}
+
+STORAGE_PROFILE = os.getenv('SQLITE_PROFILE', 'default')
+
+# daily_prices clustered on its natural key: a ticker's bars sit together
+# in date order, so a range read is one b-tree seek and a sequential scan
+CLUSTERED_DAILY_PRICES = '''
+CREATE TABLE daily_prices (
+    ticker TEXT NOT NULL,
+    date DATE NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticker, date),
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker)
+) WITHOUT ROWID
+'''
+
+# Covering index for MAX(date) and date-range reads across all tickers
+# (summaries, leaderboards, correlations), which otherwise scan the table
+COVERING_INDEXES = {
+    'idx_daily_prices_date': 'daily_prices(date, ticker, close)'
+}
+
+# The analysis.sql views window over (ticker, date) and read close and
+# volume. A clustered table already returns rows in that order, so this
+# only pays for itself on the rowid layout.
+ROWID_INDEXES = {
+    'idx_daily_prices_views': 'daily_prices(ticker, date, close, volume)'
+}
+
+# Rows PRAGMA optimize may sample per index; keeps the periodic run cheap
+ANALYSIS_LIMIT = 1000
+
+VIEW_STATEMENT = re.compile(r'^CREATE VIEW .*?;', re.S | re.M)
+
+
+def apply_profile(conn: sqlite3.Connection, profile: Optional[str] = None):
+    """Apply a storage profile's pragmas to a freshly opened connection"""
+    profile = profile or STORAGE_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown storage profile {profile!r}; expected one of {", ".join(PROFILES)}')
+    for pragma, value in PROFILES[profile].items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+
+
+def layout(conn: sqlite3.Connection) -> Optional[str]:
+    """'clustered' or 'rowid' for the daily_prices table, None when it does not exist"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'daily_prices'").fetchone()
+    if row is None:
+        return None
+    return 'clustered' if 'WITHOUT ROWID' in row[0].upper() else 'rowid'
+
+
+def create_indexes(conn: sqlite3.Connection):
+    """Create the covering indexes that suit the current layout"""
+    indexes = dict(COVERING_INDEXES, **(ROWID_INDEXES if layout(conn) == 'rowid' else {}))
+    for name, target in indexes.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+    if layout(conn) == 'clustered':
+        for name in ROWID_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def optimize(conn: sqlite3.Connection, full: bool = False):
+    """Refresh the planner's statistics
+
+    PRAGMA optimize only re-analyzes tables whose contents changed enough to
+    matter, so it is cheap enough to run after every ingest; full runs a
+    complete ANALYZE, which is what a freshly migrated file wants.
+    """
+    if full:
+        conn.execute('ANALYZE')
+    else:
+        conn.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+        conn.execute('PRAGMA optimize')
+
+
+def migrate(db_path: str, profile: str = 'performance', vacuum: bool = True) -> dict:
+    """Move an existing database to the clustered layout and covering indexes
+
+    daily_prices is rebuilt WITHOUT ROWID in one transaction; the surrogate
+    id column is dropped, since nothing reads it and the primary key is
+    (ticker, date). Views are recreated from analysis.sql afterwards. Safe to
+    run again: a clustered table is left as it is and only indexes and
+    statistics are refreshed.
+
+    Returns:
+        Summary with the layout before and after and the rows copied
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        before = layout(conn)
+        copied = skipped = None
+        if before == 'rowid':
+            views = conn.execute("SELECT name FROM sqlite_master WHERE type = 'view'").fetchall()
+            conn.execute('PRAGMA foreign_keys = OFF')
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for (name,) in views:
+                    conn.execute(f'DROP VIEW "{name}"')
+                conn.execute('ALTER TABLE daily_prices RENAME TO daily_prices_rowid')
+                conn.execute(CLUSTERED_DAILY_PRICES)
+                # Inserting in key order fills the new b-tree's pages sequentially
+                conn.execute('''
+                    INSERT INTO daily_prices (ticker, date, open, high, low, close, volume, created_at)
+                    SELECT ticker, date, open, high, low, close, volume, created_at
+                    FROM daily_prices_rowid
+                    WHERE ticker IS NOT NULL AND date IS NOT NULL
+                    ORDER BY ticker, date
+                ''')
+                copied = conn.execute('SELECT COUNT(*) FROM daily_prices').fetchone()[0]
+                skipped = conn.execute('SELECT COUNT(*) FROM daily_prices_rowid').fetchone()[0] - copied
+                conn.execute('DROP TABLE daily_prices_rowid')
+                if views:
+                    recreate_views(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            if skipped:
+                logger.warning(f'Skipped {skipped} daily_prices rows without a ticker or date')
+
+        if before is not None:
+            create_indexes(conn)
+        if vacuum and before == 'rowid':
+            conn.execute('VACUUM')
+        optimize(conn, full=True)
+        apply_profile(conn, profile)
+        return {'before': before, 'after': layout(conn), 'rows': copied, 'skipped': skipped,
+                'journal_mode': conn.execute('PRAGMA journal_mode').fetchone()[0]}
+    finally:
+        conn.close()
+
+
+def recreate_views(conn: sqlite3.Connection):
+    """Run the CREATE VIEW statements from analysis.sql"""
+    path = os.path.join(os.path.dirname(__file__), 'analysis.sql')
+    with open(path, 'r') as f:
+        for statement in VIEW_STATEMENT.findall(f.read()):
+            conn.execute(statement)
+
+
+def _bench_database(path: str, clustered: bool, indexed: bool, profile: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    apply_profile(conn, profile)
+    schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
+    if clustered:
+        conn.execute(CLUSTERED_DAILY_PRICES)
+    with open(schema_path, 'r') as f:
+        conn.executescript(f.read())
+    if indexed:
+        create_indexes(conn)
+    return conn
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def benchmark(tickers: int = 500, days: int = 1260, reads: int = 500, seed: int = 0) -> list:
+    """Time bulk writes and reads for each layout and profile on synthetic bars
+
+    The older part of the history is loaded the way save_to_database does
+    a backfill (one executemany and commit per ticker); the last two years
+    arrive the way daily ingestion writes them, one day for every ticker
+    per commit, which interleaves tickers in a rowid table. Reads are
+    one-year range reads of random tickers over those recent bars (the
+    API's price query), the latest-day query behind the market summary,
+    and one full pass of the volume_analysis window.
+
+    Returns:
+        One dict of timings in seconds per configuration
+    """
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    symbols = [f'T{i:04d}' for i in range(tickers)]
+    recent = min(days // 2, 504)
+    bars = [[(s, d, 100.0, 101.0, 99.0, 100.5, rng.randint(1, 10 ** 7)) for d in dates] for s in symbols]
+    insert = '''INSERT OR REPLACE INTO daily_prices (ticker, date, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?)'''
+    window = min(252, recent)
+    picks = [(rng.choice(symbols), rng.randrange(days - recent, days - window + 1)) for _ in range(reads)]
+
+    results = []
+    configs = [
+        ('rowid', 'default', False), ('rowid', 'performance', False), ('rowid', 'performance', True),
+        ('clustered', 'performance', False), ('clustered', 'performance', True)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, profile, indexed in configs:
+            path = os.path.join(tmp, f'{name}-{profile}-{indexed}.db')
+            conn = _bench_database(path, name == 'clustered', indexed, profile)
+
+            def load():
+                for rows in bars:
+                    conn.executemany(insert, rows[:days - recent])
+                    conn.commit()
+
+            def append():
+                for i in range(days - recent, days):
+                    conn.executemany(insert, [rows[i] for rows in bars])
+                    conn.commit()
+
+            def range_reads():
+                for symbol, offset in picks:
+                    conn.execute(
+                        'SELECT date, open, high, low, close, volume FROM daily_prices '
+                        'WHERE ticker = ? AND date >= ? AND date <= ? ORDER BY date',
+                        (symbol, dates[offset], dates[offset + window - 1])
+                    ).fetchall()
+
+            def latest_day():
+                conn.execute('SELECT ticker, close FROM daily_prices '
+                             'WHERE date = (SELECT MAX(date) FROM daily_prices)').fetchall()
+
+            def view_scan():
+                conn.execute('''SELECT COUNT(*), SUM(avg_20day_volume) FROM (
+                    SELECT AVG(volume) OVER (PARTITION BY ticker ORDER BY date
+                                             ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) AS avg_20day_volume
+                    FROM daily_prices)''').fetchall()
+
+            result = {'layout': name, 'profile': profile, 'covering_indexes': indexed}
+            result['bulk_load'] = _timed(load)
+            result['append_day'] = _timed(append) / recent
+            optimize(conn, full=True)
+            result['range_reads'] = _timed(range_reads) / reads
+            result['latest_day'] = _timed(latest_day)
+            result['view_scan'] = _timed(view_scan)
+            conn.close()
+            result['file_mb'] = os.path.getsize(path) / 2 ** 20
+            results.append(result)
+    return results
+
+
+def main():
+    from precompute import DB_PATH
+
+    parser = argparse.ArgumentParser(description='Tune and migrate the SQLite storage layout')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_cmd = subparsers.add_parser('migrate', help='Rebuild daily_prices clustered on (ticker, date)')
+    migrate_cmd.add_argument('--profile', default='performance', choices=PROFILES)
+    migrate_cmd.add_argument('--no-vacuum', action='store_true', help='Skip compacting the file afterwards')
+
+    optimize_cmd = subparsers.add_parser('optimize', help='Refresh planner statistics')
+    optimize_cmd.add_argument('--full', action='store_true', help='Run a full ANALYZE')
+
+    subparsers.add_parser('info', help='Show layout, indexes and pragmas')
+
+    bench = subparsers.add_parser('bench', help='Benchmark layouts and profiles on synthetic data')
+    bench.add_argument('--tickers', type=int, default=500)
+    bench.add_argument('--days', type=int, default=1260)
+    bench.add_argument('--reads', type=int, default=500)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == 'migrate':
+        result = migrate(args.db, args.profile, vacuum=not args.no_vacuum)
+        print(f"daily_prices: {result['before']} -> {result['after']}"
+              + (f", {result['rows']} rows copied" if result['rows'] is not None else '')
+              + f", journal_mode {result['journal_mode']}")
+    elif args.command == 'optimize':
+        conn = sqlite3.connect(args.db)
+        try:
+            optimize(conn, args.full)
+        finally:
+            conn.close()
+    elif args.command == 'info':
+        conn = sqlite3.connect(args.db)
+        try:
+            print(f'layout: {layout(conn)}')
+            for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                        "AND tbl_name = 'daily_prices' ORDER BY name"):
+                print(f'index: {name}')
+            for pragma in ('journal_mode', 'page_size', 'page_count', 'freelist_count'):
+                print(f'{pragma}: {conn.execute(f"PRAGMA {pragma}").fetchone()[0]}')
+        finally:
+            conn.close()
+    else:
+        print(f"{'layout':<10} {'profile':<12} {'covering':<9} {'bulk load':>10} {'day':>8} "
+              f"{'range':>8} {'latest':>8} {'view':>8} {'MB':>7}")
+        for r in benchmark(args.tickers, args.days, args.reads):
+            print(f"{r['layout']:<10} {r['profile']:<12} {str(r['covering_indexes']):<9} "
+                  f"{r['bulk_load']:>9.2f}s {r['append_day'] * 1000:>6.1f}ms {r['range_reads'] * 1000:>6.2f}ms "
+                  f"{r['latest_day'] * 1000:>6.1f}ms {r['view_scan']:>7.2f}s {r['file_mb']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
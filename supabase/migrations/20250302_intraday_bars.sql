@@ -0,0 +1,77 @@
+-- Create intraday_bars table (minute bars, range-partitioned by trading day)
+CREATE TABLE IF NOT EXISTS intraday_bars (
+    ticker TEXT NOT NULL REFERENCES stocks(ticker),
+    ts TIMESTAMP WITH TIME ZONE NOT NULL,
+    open DECIMAL(10,2),
+    high DECIMAL(10,2),
+    low DECIMAL(10,2),
+    close DECIMAL(10,2),
+    volume BIGINT,
+    PRIMARY KEY (ticker, ts)
+) PARTITION BY RANGE (ts);
+
+-- Catch-all for bars that arrive before their day's partition exists
+CREATE TABLE IF NOT EXISTS intraday_bars_default PARTITION OF intraday_bars DEFAULT;
+
+-- Create intraday_rollups table (hourly and daily aggregates of intraday_bars)
+CREATE TABLE IF NOT EXISTS intraday_rollups (
+    ticker TEXT NOT NULL REFERENCES stocks(ticker),
+    resolution TEXT NOT NULL CHECK (resolution IN ('hour', 'day')),
+    ts TIMESTAMP WITH TIME ZONE NOT NULL,
+    open DECIMAL(10,2),
+    high DECIMAL(10,2),
+    low DECIMAL(10,2),
+    close DECIMAL(10,2),
+    volume BIGINT,
+    bar_count INTEGER,
+    PRIMARY KEY (ticker, resolution, ts)
+);
+
+-- Create the partition holding one trading day of minute bars
+CREATE OR REPLACE FUNCTION create_intraday_partition(day DATE)
+RETURNS VOID AS $$
+DECLARE
+    partition_name TEXT := 'intraday_bars_' || to_char(day, 'YYYYMMDD');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF intraday_bars FOR VALUES FROM (%L) TO (%L)',
+        partition_name, day::timestamptz, (day + 1)::timestamptz
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuild the hour and day rollups of one ticker's trading days from the minute bars
+CREATE OR REPLACE FUNCTION refresh_intraday_rollups(p_ticker TEXT, first_day DATE, last_day DATE)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO intraday_rollups (ticker, resolution, ts, open, high, low, close, volume, bar_count)
+    SELECT
+        p_ticker,
+        r.resolution,
+        date_trunc(r.resolution, b.ts) AS bucket,
+        (array_agg(b.open ORDER BY b.ts))[1],
+        MAX(b.high),
+        MIN(b.low),
+        (array_agg(b.close ORDER BY b.ts DESC))[1],
+        SUM(b.volume),
+        COUNT(*)
+    FROM intraday_bars b
+    CROSS JOIN (VALUES ('hour'), ('day')) AS r(resolution)
+    WHERE b.ticker = p_ticker
+        AND b.ts >= first_day::timestamptz
+        AND b.ts < (last_day + 1)::timestamptz
+    GROUP BY r.resolution, bucket
+    ON CONFLICT (ticker, resolution, ts) DO UPDATE SET
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        volume = EXCLUDED.volume,
+        bar_count = EXCLUDED.bar_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pre-create partitions for the current and next week of trading days
+SELECT create_intraday_partition(d::date)
+FROM generate_series(CURRENT_DATE, CURRENT_DATE + 7, INTERVAL '1 day') AS d
+WHERE EXTRACT(ISODOW FROM d) < 6;
@@ -0,0 +1,143 @@
+-- Range-partition daily_prices by year with a BRIN index on date.
+--
+-- The old heap carried B-trees on ticker, date and (ticker, date), all
+-- updated on every write, and no date scan could skip old history. The
+-- partitioned table keeps only the (ticker, date) primary key, which
+-- serves per-ticker range reads and upserts. Each partition gets a BRIN
+-- index on date, a few pages per year that stays in date order because
+-- bars arrive day by day. Date filters prune whole years before any
+-- index is read.
+
+-- Views hold the old table by OID, so they are rebuilt against the new one
+DROP VIEW IF EXISTS volume_analysis;
+DROP VIEW IF EXISTS moving_averages;
+DROP VIEW IF EXISTS daily_returns;
+
+ALTER TABLE daily_prices RENAME TO daily_prices_heap;
+ALTER INDEX IF EXISTS daily_prices_pkey RENAME TO daily_prices_heap_pkey;
+
+-- The surrogate id is dropped: a partitioned table's keys must include the
+-- partition column, and (ticker, date) already identifies a bar
+CREATE TABLE daily_prices (
+    ticker TEXT NOT NULL REFERENCES stocks(ticker),
+    date DATE NOT NULL,
+    open DECIMAL(10,2),
+    high DECIMAL(10,2),
+    low DECIMAL(10,2),
+    close DECIMAL(10,2),
+    volume BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticker, date)
+) PARTITION BY RANGE (date);
+
+-- Catch-all for bars that arrive before their year's partition exists
+CREATE TABLE IF NOT EXISTS daily_prices_default PARTITION OF daily_prices DEFAULT;
+
+-- Created on every partition, present and future
+CREATE INDEX IF NOT EXISTS idx_daily_prices_date_brin ON daily_prices
+    USING BRIN (date) WITH (pages_per_range = 32, autosummarize = on);
+
+-- Create the yearly partitions from from_date's year through years_ahead
+-- years past the current one. Bars already sitting in the default partition
+-- for a new year are moved into it. Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION ensure_daily_prices_partitions(from_date DATE DEFAULT CURRENT_DATE,
+                                                          years_ahead INTEGER DEFAULT 1)
+RETURNS INTEGER AS $$
+DECLARE
+    y INTEGER;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS daily_prices_moving (LIKE daily_prices) ON COMMIT DELETE ROWS;
+    FOR y IN EXTRACT(YEAR FROM from_date)::INTEGER .. EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + years_ahead LOOP
+        partition_name := 'daily_prices_' || y;
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+
+        -- A new partition may not overlap rows still held by the default one
+        WITH moved AS (
+            DELETE FROM daily_prices_default
+            WHERE date >= make_date(y, 1, 1) AND date < make_date(y + 1, 1, 1)
+            RETURNING *
+        )
+        INSERT INTO daily_prices_moving SELECT * FROM moved;
+
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF daily_prices FOR VALUES FROM (%L) TO (%L)',
+            partition_name, make_date(y, 1, 1), make_date(y + 1, 1, 1)
+        );
+        INSERT INTO daily_prices SELECT * FROM daily_prices_moving ORDER BY date, ticker;
+        TRUNCATE daily_prices_moving;
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions for all stored history, this year and next
+SELECT ensure_daily_prices_partitions(COALESCE((SELECT MIN(date) FROM daily_prices_heap), CURRENT_DATE));
+
+-- Copy in date order so each partition is physically ordered for its BRIN index
+INSERT INTO daily_prices (ticker, date, open, high, low, close, volume, created_at)
+SELECT ticker, date, open, high, low, close, volume, created_at
+FROM daily_prices_heap
+WHERE ticker IS NOT NULL AND date IS NOT NULL
+ORDER BY date, ticker;
+
+-- Keep row level security if the old table had it (supabase_schema.sql enables it)
+DO $$
+BEGIN
+    IF (SELECT relrowsecurity FROM pg_class WHERE oid = 'daily_prices_heap'::regclass) THEN
+        ALTER TABLE daily_prices ENABLE ROW LEVEL SECURITY;
+        CREATE POLICY daily_prices_select_policy ON daily_prices
+            FOR SELECT
+            TO public
+            USING (true);
+        CREATE POLICY daily_prices_insert_policy ON daily_prices
+            FOR INSERT
+            TO authenticated
+            WITH CHECK (true);
+    END IF;
+END $$;
+
+DROP TABLE daily_prices_heap;
+
+-- Recreate views
+CREATE OR REPLACE VIEW daily_returns AS
+SELECT
+    ticker,
+    date,
+    close,
+    ROUND(((close - LAG(close) OVER (PARTITION BY ticker ORDER BY date)) /
+           LAG(close) OVER (PARTITION BY ticker ORDER BY date)) * 100, 2) as daily_return_percent
+FROM daily_prices;
+
+CREATE OR REPLACE VIEW moving_averages AS
+SELECT
+    ticker,
+    date,
+    close,
+    AVG(close) OVER (PARTITION BY ticker ORDER BY date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) as MA20,
+    AVG(close) OVER (PARTITION BY ticker ORDER BY date ROWS BETWEEN 49 PRECEDING AND CURRENT ROW) as MA50
+FROM daily_prices;
+
+CREATE OR REPLACE VIEW volume_analysis AS
+SELECT
+    ticker,
+    date,
+    volume,
+    AVG(volume) OVER (PARTITION BY ticker ORDER BY date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) as avg_20day_volume
+FROM daily_prices;
+
+ANALYZE daily_prices;
+
+-- Create next year's partition ahead of time every month where pg_cron is
+-- available. Only setup_supabase.py and migrate_to_supabase.py call
+-- ensure_daily_prices_partitions() themselves, before a bulk load; without
+-- pg_cron it has to be run by hand each year, or that year's bars stay in
+-- daily_prices_default
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('daily-prices-partitions', '0 3 1 * *', 'SELECT ensure_daily_prices_partitions()');
+    END IF;
+END $$;
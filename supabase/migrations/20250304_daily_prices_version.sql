@@ -0,0 +1,15 @@
+-- Data version read by app.py before answering conditional requests: the
+-- last bar date, the latest write and the bar count, like the FastAPI app's
+-- MAX(date), MAX(created_at), COUNT(*). A correction to any older bar moves
+-- MAX(created_at), so the ETag changes with it.
+--
+-- The market-wide version (p_ticker NULL) only covers the last 45 days.
+-- The gainers and volume views it validates look back 20 sessions, and the
+-- date filter prunes everything older instead of counting the whole table.
+CREATE OR REPLACE FUNCTION daily_prices_version(p_ticker TEXT DEFAULT NULL)
+RETURNS TABLE (last_date DATE, ingested_at TIMESTAMP WITH TIME ZONE, bars BIGINT) AS $$
+    SELECT MAX(date), MAX(created_at), COUNT(*)
+    FROM daily_prices
+    WHERE (p_ticker IS NOT NULL AND ticker = p_ticker)
+       OR (p_ticker IS NULL AND date >= CURRENT_DATE - 45);
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,78 @@
+-- Keep daily intraday_bars partitions ahead of the data.
+--
+-- 20250302 only created partitions for the week it ran in, so every later
+-- bar landed in intraday_bars_default, and create_intraday_partition then
+-- failed for any day the default partition already held rows for. This
+-- follows ensure_daily_prices_partitions: rows for a new day are moved out
+-- of the default partition before that day's partition is attached.
+
+-- Create the partition holding one trading day of minute bars, moving any of
+-- that day's bars out of the default partition first. Returns whether it was created.
+DROP FUNCTION IF EXISTS create_intraday_partition(DATE);
+CREATE FUNCTION create_intraday_partition(day DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    partition_name TEXT := 'intraday_bars_' || to_char(day, 'YYYYMMDD');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    CREATE TEMP TABLE IF NOT EXISTS intraday_bars_moving (LIKE intraday_bars) ON COMMIT DELETE ROWS;
+
+    -- A new partition may not overlap rows still held by the default one
+    WITH moved AS (
+        DELETE FROM intraday_bars_default
+        WHERE ts >= day::timestamptz AND ts < (day + 1)::timestamptz
+        RETURNING *
+    )
+    INSERT INTO intraday_bars_moving SELECT * FROM moved;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF intraday_bars FOR VALUES FROM (%L) TO (%L)',
+        partition_name, day::timestamptz, (day + 1)::timestamptz
+    );
+    INSERT INTO intraday_bars SELECT * FROM intraday_bars_moving ORDER BY ts, ticker;
+    TRUNCATE intraday_bars_moving;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create the weekday partitions from from_day through days_ahead days past
+-- today, plus one for every day the default partition holds bars for.
+-- Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION ensure_intraday_partitions(from_day DATE DEFAULT CURRENT_DATE,
+                                                      days_ahead INTEGER DEFAULT 7)
+RETURNS INTEGER AS $$
+DECLARE
+    d DATE;
+    created INTEGER := 0;
+BEGIN
+    FOR d IN
+        SELECT g::date
+        FROM generate_series(from_day, CURRENT_DATE + days_ahead, INTERVAL '1 day') AS g
+        WHERE EXTRACT(ISODOW FROM g) < 6
+        UNION
+        SELECT DISTINCT ts::date FROM intraday_bars_default
+        ORDER BY 1
+    LOOP
+        IF create_intraday_partition(d) THEN
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Gives the bars that piled up in the default partition since 20250302 their own days
+SELECT ensure_intraday_partitions();
+
+-- Keep a week of partitions ahead every night where pg_cron is available;
+-- bars for a day without a partition land in the default one until the next
+-- run moves them
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('intraday-partitions', '0 2 * * *', 'SELECT ensure_intraday_partitions()');
+    END IF;
+END $$;
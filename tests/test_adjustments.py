@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from adjustments import actions_from_adjusted_close, cumulative_factors
+
+
+def dates(*values):
+    return np.array(values, dtype='datetime64[D]')
+
+
+def test_no_actions_leaves_prices_alone():
+    factors = cumulative_factors([])
+
+    price, volume = factors.at(dates('2024-01-02', '2024-06-03'))
+
+    assert factors.empty
+    assert price.tolist() == [1.0, 1.0]
+    assert volume.tolist() == [1.0, 1.0]
+
+
+def test_split_scales_earlier_bars_only():
+    factors = cumulative_factors([('2024-06-10', 'split', 4.0, None)])
+
+    price, volume = factors.at(dates('2024-06-07', '2024-06-10', '2024-06-11'))
+
+    assert price.tolist() == [0.25, 1.0, 1.0]
+    assert volume.tolist() == [4.0, 1.0, 1.0]
+
+
+def test_factors_compound_across_actions_in_any_order():
+    factors = cumulative_factors([
+        ('2024-08-01', 'dividend', 1.0, 50.0),
+        ('2024-03-01', 'split', 2.0, None),
+    ])
+
+    price, volume = factors.at(dates('2024-01-02', '2024-05-01', '2024-09-02'))
+
+    assert price == pytest.approx([0.5 * 0.98, 0.98, 1.0])
+    assert volume.tolist() == [2.0, 1.0, 1.0]
+
+
+def test_dividend_without_previous_close_is_ignored():
+    factors = cumulative_factors([('2024-08-01', 'dividend', 1.0, None)])
+
+    price, _ = factors.at(dates('2024-07-31'))
+
+    assert price.tolist() == [1.0]
+
+
+def test_dividends_recovered_from_adjusted_close():
+    closes = np.array([100.0, 101.0, 99.0, 100.0])
+    # A 2.0 dividend going ex on the third day: earlier bars carry 1 - 2 / 101
+    factor = 1 - 2.0 / 101.0
+    adj_closes = closes * np.array([factor, factor, 1.0, 1.0])
+    days = dates('2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05')
+
+    # Input order does not matter
+    order = [3, 0, 2, 1]
+    actions = actions_from_adjusted_close(days[order], closes[order], adj_closes[order])
+
+    assert actions == [('2024-01-04', 'dividend', 2.0)]
+
+
+def test_adjusted_close_rounding_is_not_a_dividend():
+    closes = np.array([100.0, 101.0, 102.0])
+    adj_closes = closes * np.array([0.99999, 0.999995, 1.0])
+
+    assert actions_from_adjusted_close(dates('2024-01-02', '2024-01-03', '2024-01-04'), closes, adj_closes) == []
@@ -0,0 +1,28 @@
+import numpy as np
+
+from backfill import merge_ranges
+from market_calendar import trading_days
+
+
+def test_no_missing_sessions():
+    assert merge_ranges(np.array([], dtype='datetime64[D]'), trading_days('2024-01-01', '2024-01-31')) == []
+
+
+def test_weekends_and_holidays_do_not_split_a_range():
+    sessions = trading_days('2024-01-01', '2024-01-31')
+    # Friday, then Tuesday after the weekend and Martin Luther King Jr. Day
+    missing = np.array(['2024-01-12', '2024-01-16'], dtype='datetime64[D]')
+
+    assert merge_ranges(missing, sessions) == [('2024-01-12', '2024-01-16', 2)]
+
+
+def test_stored_sessions_split_ranges_unless_bridged():
+    sessions = trading_days('2024-01-01', '2024-01-31')
+    missing = np.array(['2024-01-02', '2024-01-03', '2024-01-05', '2024-01-11'], dtype='datetime64[D]')
+
+    assert merge_ranges(missing, sessions, bridge=0) == [
+        ('2024-01-02', '2024-01-03', 2), ('2024-01-05', '2024-01-05', 1), ('2024-01-11', '2024-01-11', 1)
+    ]
+    assert merge_ranges(missing, sessions, bridge=1) == [
+        ('2024-01-02', '2024-01-05', 3), ('2024-01-11', '2024-01-11', 1)
+    ]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from backtest import IndicatorCache
+from screener import _wilder_rsi
+
+
+def _panel():
+    rng = np.random.default_rng(0)
+    close = np.cumsum(rng.normal(0, 1, (60, 3)), axis=0) + 100
+    close[:20, 1] = np.nan
+    return {'close': close, 'volume': np.ones_like(close)}
+
+
+def test_rsi_matches_the_screener_on_either_axis():
+    panel = _panel()
+    rsi = IndicatorCache(panel).get('rsi', 14)
+
+    np.testing.assert_array_equal(rsi, _wilder_rsi(panel['close'].T).T)
+    assert np.isnan(rsi[:14]).all()
+    assert np.isnan(rsi[:34, 1]).all() and not np.isnan(rsi[34:, 1]).any()
+
+
+def test_moving_average_waits_for_a_full_window():
+    panel = _panel()
+    ma = IndicatorCache(panel).get('ma', 5)
+
+    assert np.isnan(ma[:4]).all()
+    np.testing.assert_allclose(ma[4:, 0], [panel['close'][i - 4:i + 1, 0].mean() for i in range(4, 60)])
+    assert np.isnan(ma[:24, 1]).all() and not np.isnan(ma[24:, 1]).any()
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from downsample import MAX_POINTS, MIN_POINTS, downsample, lttb_indices
+
+
+def prices(n):
+    days = np.datetime64('2020-01-01') + np.arange(n)
+    return [
+        {'date': str(day), 'open': 10.0 + i, 'high': 11.0 + i, 'low': 9.0 + i, 'close': 10.5 + i, 'volume': 100}
+        for i, day in enumerate(days)
+    ]
+
+
+@pytest.mark.parametrize('points', [MIN_POINTS - 1, 0, -5, MAX_POINTS + 1])
+def test_rejects_points_out_of_range(points):
+    with pytest.raises(ValueError):
+        downsample(prices(10), {}, points)
+
+
+@pytest.mark.parametrize('points', [MIN_POINTS, 50, MAX_POINTS])
+def test_accepts_points_in_range(points):
+    payload = downsample(prices(200), {}, points)
+
+    assert len(payload['dates']) == min(points, 200)
+    assert payload['source_bars'] == 200
+
+
+def test_buckets_keep_candle_extremes():
+    data = prices(100)
+    data[37]['high'] = 1000.0
+    data[62]['low'] = 0.5
+
+    payload = downsample(data, {}, 10)
+
+    assert payload['prices']['high'].max() == 1000.0
+    assert payload['prices']['low'].min() == 0.5
+    assert payload['prices']['volume'].sum() == 100 * 100
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    y = np.zeros(1000)
+    y[500] = 10.0
+
+    picked = lttb_indices(y, 20)
+
+    assert len(picked) == 20
+    assert picked[0] == 0 and picked[-1] == 999
+    assert 500 in picked
+    assert (np.diff(picked) > 0).all()
+
+
+def test_indicator_warm_up_is_skipped():
+    data = prices(100)
+    indicators = {'MA20': [None] * 19 + [float(i) for i in range(81)]}
+
+    payload = downsample(data, indicators, 10)
+
+    assert payload['indicators']['MA20']['dates'][0] == data[19]['date']
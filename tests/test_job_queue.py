@@ -0,0 +1,29 @@
+import time
+
+from job_queue import LEASE_TIMEOUT, JobQueue
+
+
+def _leave_running(queue, ticker, age):
+    queue.conn.execute("UPDATE ingest_jobs SET status = 'running', updated_at = ? WHERE ticker = ?",
+                       (time.time() - age, ticker))
+
+
+def test_recover_takes_back_only_expired_leases(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    queue.enqueue(['DEAD', 'LIVE'])
+    _leave_running(queue, 'DEAD', LEASE_TIMEOUT + 60)
+    _leave_running(queue, 'LIVE', LEASE_TIMEOUT + 60)
+    live = queue.conn.execute("SELECT id FROM ingest_jobs WHERE ticker = 'LIVE'").fetchone()[0]
+
+    queue.heartbeat([live])
+
+    assert queue.recover() == 1
+    assert queue.counts() == {'queued': 1, 'running': 1}
+
+
+def test_next_due_counts_running_leases(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    queue.enqueue(['DEAD'])
+    _leave_running(queue, 'DEAD', 10)
+
+    assert abs(queue.next_due() - (time.time() - 10 + LEASE_TIMEOUT)) < 1
@@ -0,0 +1,38 @@
+from market_calendar import holidays, is_trading_day, trading_days
+
+
+def test_holidays_2024():
+    assert holidays(2024) == (
+        '2024-01-01', '2024-01-15', '2024-02-19', '2024-03-29', '2024-05-27',
+        '2024-06-19', '2024-07-04', '2024-09-02', '2024-11-28', '2024-12-25'
+    )
+
+
+def test_weekend_holidays_are_observed():
+    # Christmas 2021 was a Saturday and Juneteenth 2022 a Sunday
+    assert '2021-12-24' in holidays(2021)
+    assert '2022-06-20' in holidays(2022)
+
+
+def test_saturday_new_year_is_not_observed():
+    assert not any(day.startswith('2021-12-31') for day in holidays(2021))
+    assert not any(day.startswith('2022-01') and day < '2022-01-17' for day in holidays(2022))
+
+
+def test_rules_that_start_later_are_not_applied_earlier():
+    assert '1997-01-20' not in holidays(1997)
+    assert '1980-11-04' in holidays(1980) and '1984-11-06' not in holidays(1984)
+    assert not any(day.startswith('2021-06') for day in holidays(2021))
+
+
+def test_special_closures():
+    assert '1985-09-27' in holidays(1985)
+    assert '1994-04-27' in holidays(1994)
+    assert '2012-10-29' in holidays(2012)
+    assert not is_trading_day('2001-09-11')
+
+
+def test_trading_days_skip_weekends_and_holidays():
+    assert [str(d) for d in trading_days('2024-03-27', '2024-04-02')] == [
+        '2024-03-27', '2024-03-28', '2024-04-01', '2024-04-02'
+    ]
@@ -0,0 +1,18 @@
+from serialization import slice_since
+
+
+def test_slice_since_resends_the_bar_on_the_cursor():
+    prices = [{'date': d, 'close': c} for d, c in (('2024-01-02', 1.0), ('2024-01-03', 2.0), ('2024-01-04', 3.0))]
+    indicators = {'moving_averages': {'MA20': [None, 1.5, 2.5]}, 'rsi': [None, None, 60.0]}
+
+    data, values = slice_since(prices, indicators, '2024-01-03')
+
+    assert [p['date'] for p in data] == ['2024-01-03', '2024-01-04']
+    assert values == {'moving_averages': {'MA20': [1.5, 2.5]}, 'rsi': [None, 60.0]}
+
+
+def test_slice_since_past_the_last_bar_is_empty():
+    data, values = slice_since([{'date': '2024-01-02'}], {'rsi': [50.0]}, '2024-01-03')
+
+    assert data == []
+    assert values == {'rsi': []}
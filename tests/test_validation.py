@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from validation import clean_daily_bars
+
+
+def bars(rows, dates=None):
+    if dates is None:
+        dates = pd.date_range('2024-01-02', periods=len(rows), freq='B')
+    return pd.DataFrame(rows, columns=['Open', 'High', 'Low', 'Close', 'Volume'], index=pd.Index(dates, name='Date'))
+
+
+def test_flattens_yfinance_multiindex_columns():
+    df = bars([(10, 11, 9, 10.5, 100), (10.5, 12, 10, 11, 200)])
+    df.columns = pd.MultiIndex.from_product([df.columns, ['AAPL']], names=['Price', 'Ticker'])
+
+    clean, report = clean_daily_bars(df, 'AAPL')
+
+    assert list(clean.columns) == ['date', 'open', 'high', 'low', 'close', 'volume']
+    assert clean['close'].tolist() == [10.5, 11.0]
+    assert report['rows_out'] == 2
+
+
+def test_duplicate_dates_keep_the_last_bar():
+    dates = pd.to_datetime(['2024-01-03', '2024-01-02', '2024-01-03'])
+    df = bars([(10, 11, 9, 10, 100), (9, 10, 8, 9, 100), (10, 12, 9, 11, 300)], dates)
+
+    clean, report = clean_daily_bars(df, 'AAPL')
+
+    assert clean['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-02', '2024-01-03']
+    assert clean['close'].tolist() == [9.0, 11.0]
+    assert report['dropped']['duplicate_date'] == 1
+
+
+def test_rejects_impossible_ohlc_and_counts_each_bar_once():
+    df = bars([
+        (10, 11, 9, 10, 100),       # good
+        (10, 9, 11, 10, 100),       # high below low
+        (10, 11, 9, 12, 100),       # close above high
+        (-1, 11, 9, 10, 100),       # non-positive, also outside the range
+        (10, 11, np.nan, 10, 100),  # missing
+        (10, 11, 9, 10, 0),         # zero volume is flagged, not dropped
+    ])
+
+    clean, report = clean_daily_bars(df, 'AAPL')
+
+    assert len(clean) == 2
+    assert report['dropped'] == {'missing': 1, 'non_positive': 1, 'ohlc_inconsistent': 2, 'duplicate_date': 0}
+    assert report['flagged']['zero_volume'] == 1
+
+
+def test_drop_zero_volume():
+    df = bars([(10, 11, 9, 10, 100), (10, 11, 9, 10, 0)])
+
+    clean, _ = clean_daily_bars(df, 'AAPL', drop_zero_volume=True)
+
+    assert clean['volume'].tolist() == [100]
+
+
+def test_empty_input():
+    clean, report = clean_daily_bars(None, 'AAPL')
+
+    assert clean.empty
+    assert report['rows_in'] == 0
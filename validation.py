@@ -0,0 +1,156 @@
+import logging
+from itertools import repeat
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+COLUMNS = ('date',) + PRICE_COLUMNS + ('volume',)
+
+# Source column names (lowercased) -> ours
+ALIASES = {'timestamp': 'date', 'datetime': 'date', 'time': 'date', 'vol': 'volume'}
+
+# Relative slack for OHLC checks, so float noise in adjusted data is not rejected
+TOLERANCE = 1e-6
+
+# Reasons a bar is dropped, checked in this order so each bar is counted once
+DROP_REASONS = ('missing', 'non_positive', 'ohlc_inconsistent')
+
+
+def normalize_columns(data: pd.DataFrame, ticker: Optional[str] = None) -> pd.DataFrame:
+    """Bring any source's frame to date, open, high, low, close, volume columns
+
+    Handles yfinance's (field, ticker) MultiIndex columns, capitalized
+    names, a date held in the index (DatetimeIndex or Alpaca's
+    (symbol, timestamp) MultiIndex) and numbers stored as strings.
+    """
+    df = data
+    if isinstance(df.columns, pd.MultiIndex):
+        # yfinance >= 0.2.48 returns (Price, Ticker) columns even for one ticker
+        for level in range(df.columns.nlevels):
+            values = df.columns.get_level_values(level)
+            if ticker is not None and ticker in values:
+                df = df.xs(ticker, axis=1, level=level)
+                break
+        else:
+            fields = {c.lower() for c in COLUMNS}
+            keep = next(level for level in range(df.columns.nlevels)
+                        if fields & {str(v).lower() for v in df.columns.get_level_values(level)})
+            df = df.copy()
+            df.columns = df.columns.get_level_values(keep)
+
+    df = df.rename(columns=lambda c: ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+    if 'date' not in df.columns:
+        df = df.reset_index()
+        df = df.rename(columns=lambda c: ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+        if 'date' not in df.columns and 'index' in df.columns:
+            df = df.rename(columns={'index': 'date'})
+
+    missing = [c for c in COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(missing)}')
+
+    dates = df['date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+    if getattr(dates.dt, 'tz', None) is not None:
+        # Keep the exchange-local calendar day the source stamped the bar with
+        dates = dates.dt.tz_localize(None)
+
+    out = pd.DataFrame({'date': dates.dt.normalize().to_numpy()})
+    for column in COLUMNS[1:]:
+        values = df[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values.astype(str).str.replace(',', '', regex=False), errors='coerce')
+        out[column] = values.to_numpy(dtype=np.float64)
+    return out
+
+
+def clean_daily_bars(data: Optional[pd.DataFrame], ticker: str,
+                     drop_zero_volume: bool = False) -> Tuple[pd.DataFrame, dict]:
+    """Validate and clean daily bars before they are written
+
+    Drops bars with missing values, non-positive prices or negative
+    volume, and OHLC that cannot be right (high below low, open or close
+    outside the high-low range). Zero-volume bars are flagged and kept
+    unless drop_zero_volume is set. Duplicate dates keep the last bar,
+    matching what INSERT OR REPLACE would have stored.
+
+    Returns:
+        (cleaned frame sorted by date, quality report)
+    """
+    report = {
+        'ticker': ticker,
+        'rows_in': 0,
+        'rows_out': 0,
+        'dropped': dict.fromkeys(DROP_REASONS + ('duplicate_date',), 0),
+        'flagged': {'zero_volume': 0},
+        'first_date': None,
+        'last_date': None
+    }
+    if data is None or data.empty:
+        return pd.DataFrame(columns=COLUMNS), report
+
+    df = normalize_columns(data, ticker)
+    report['rows_in'] = len(df)
+
+    o, h, l, c, v = (df[column].to_numpy() for column in COLUMNS[1:])
+    prices = np.column_stack((o, h, l, c))
+    slack = TOLERANCE * np.abs(h)
+    checks = {
+        'missing': df['date'].isna().to_numpy() | np.isnan(prices).any(axis=1) | np.isnan(v),
+        'non_positive': (prices <= 0).any(axis=1) | (v < 0),
+        'ohlc_inconsistent': (h < l - slack) | (h < np.fmax(o, c) - slack) | (l > np.fmin(o, c) + slack)
+    }
+    drop = np.zeros(len(df), dtype=bool)
+    for reason in DROP_REASONS:
+        report['dropped'][reason] = int((checks[reason] & ~drop).sum())
+        drop |= checks[reason]
+
+    zero_volume = (v == 0) & ~drop
+    report['flagged']['zero_volume'] = int(zero_volume.sum())
+    if drop_zero_volume:
+        drop |= zero_volume
+
+    # Work out the surviving rows as one index so the frame is copied once
+    keep = np.flatnonzero(~drop)
+    dates = df['date'].to_numpy()[keep]
+    if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+        # Stable, so the last bar for a date is the one the source sent last
+        order = np.argsort(dates, kind='stable')
+        keep, dates = keep[order], dates[order]
+    last = np.r_[dates[1:] != dates[:-1], True] if len(dates) else np.zeros(0, dtype=bool)
+    report['dropped']['duplicate_date'] = int((~last).sum())
+    df = df.iloc[keep[last]].reset_index(drop=True)
+    df['volume'] = df['volume'].astype(np.int64)
+
+    report['rows_out'] = len(df)
+    if len(df):
+        report['first_date'] = str(df['date'].iloc[0].date())
+        report['last_date'] = str(df['date'].iloc[-1].date())
+    return df, report
+
+
+def to_rows(df: pd.DataFrame, ticker: str) -> list:
+    """(ticker, date, open, high, low, close, volume) tuples for executemany"""
+    dates = df['date'].to_numpy().astype('datetime64[D]').astype(str).tolist()
+    return list(zip(
+        repeat(ticker), dates,
+        *(df[column].tolist() for column in PRICE_COLUMNS),
+        df['volume'].tolist()
+    ))
+
+
+def log_report(report: dict):
+    """Log a quality report, at warning level when bars were dropped"""
+    dropped = {reason: n for reason, n in report['dropped'].items() if n}
+    flagged = {reason: n for reason, n in report['flagged'].items() if n}
+    message = (f"{report['ticker']}: kept {report['rows_out']} of {report['rows_in']} bars"
+               + (f', dropped {dropped}' if dropped else '') + (f', flagged {flagged}' if flagged else ''))
+    if dropped:
+        logger.warning(message)
+    else:
+        logger.info(message)
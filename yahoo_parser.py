@@ -0,0 +1,249 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:  # only the 'soup' mode needs it
+    BeautifulSoup = None
+
+# 'fast' slices out the target table or data blob and parses just that;
+# 'soup' builds the whole BeautifulSoup tree and is kept as a reference
+PARSER_MODE = os.getenv('YAHOO_PARSER', 'fast')
+
+# Below this many pages the pool costs more to start than it saves
+MIN_POOL_PAGES = 8
+
+HISTORY_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# Yahoo's history table: Date, Open, High, Low, Close*, Adj Close**, Volume
+HISTORY_POSITIONS = {'Date': 0, 'Open': 1, 'High': 2, 'Low': 3, 'Close': 4, 'Volume': 6}
+
+BLOB_MARKER = '"HistoricalPriceStore":{"prices":'
+HISTORY_TABLE_MARKER = 'data-test="historical-prices"'
+QUOTE_TABLE = re.compile(r'<table\b[^>]*\bclass="(?:[^"]*\s)?W\(100%\)(?:\s[^"]*)?"')
+
+ROW = re.compile(r'<tr\b[^>]*>(.*?)</tr>', re.S)
+# First text node of a cell, skipping wrapper tags such as <span>
+CELL = re.compile(r'<t([dh])\b[^>]*>\s*(?:<[^>]+>\s*)*([^<]*)', re.S)
+ATTRIBUTE = re.compile(r'([\w-]+)="([^"]*)"')
+
+_decoder = json.JSONDecoder()
+
+
+def _history_frame(dates: pd.Series, columns: Dict[str, pd.Series]) -> Optional[pd.DataFrame]:
+    """Assemble the Date-indexed frame both parsers return, dropping unparseable rows"""
+    df = pd.DataFrame({name: columns[name].to_numpy() for name in HISTORY_COLUMNS})
+    df.index = pd.DatetimeIndex(dates, name='Date').astype('datetime64[ns]')
+    df = df[df.index.notna()].dropna()
+    if df.empty:
+        return None
+    df['Volume'] = df['Volume'].astype(np.int64)
+    return df.sort_index()
+
+
+def _positions(header: List[str]) -> Dict[str, int]:
+    """Map output columns to cell positions by header text, falling back to Yahoo's layout"""
+    labels = [h.strip().rstrip('*').strip().lower() for h in header]
+    positions = {}
+    for name, default in HISTORY_POSITIONS.items():
+        positions[name] = labels.index(name.lower()) if name.lower() in labels else default
+    return positions
+
+
+def _history_from_blob(html: str, start: int) -> Optional[pd.DataFrame]:
+    prices, _ = _decoder.raw_decode(html, start + len(BLOB_MARKER))
+    records = pd.DataFrame.from_records(prices)
+    if records.empty or 'open' not in records:
+        return None
+    # Dividend and split events share the list and carry a 'type'
+    if 'type' in records:
+        records = records[records['type'].isna()]
+    dates = pd.to_datetime(records['date'], unit='s').dt.normalize()
+    return _history_frame(dates, {name: records[name.lower()].astype(np.float64) for name in HISTORY_COLUMNS})
+
+
+def _history_from_table(html: str, start: int) -> Optional[pd.DataFrame]:
+    end = html.find('</table>', start)
+    section = html[start:end if end != -1 else len(html)]
+
+    header, rows = [], []
+    for row in ROW.findall(section):
+        cells = CELL.findall(row)
+        if cells and cells[0][0] == 'h':
+            header = [text for _, text in cells]
+        elif cells:
+            rows.append([text for _, text in cells])
+    if not rows:
+        return None
+
+    positions = _positions(header)
+    width = max(positions.values()) + 1
+    # Dividend and split rows span the table in a single cell
+    rows = [row for row in rows if len(row) >= width]
+    if not rows:
+        return None
+
+    # Strip thousands separators from every numeric cell in one pass, then convert in bulk
+    numeric = [positions[name] for name in HISTORY_COLUMNS]
+    cells = '\x1f'.join('\x1f'.join(row[i] for i in numeric) for row in rows).replace(',', '').split('\x1f')
+    values = pd.to_numeric(pd.Series(cells), errors='coerce').to_numpy(dtype=np.float64).reshape(len(rows), -1)
+    columns = {name: pd.Series(values[:, i]) for i, name in enumerate(HISTORY_COLUMNS)}
+    dates = pd.to_datetime(pd.Series([row[positions['Date']].strip() for row in rows]), format='%b %d, %Y', errors='coerce')
+    return _history_frame(dates, columns)
+
+
+def parse_history_fast(html: str) -> Optional[pd.DataFrame]:
+    """Parse a history page from its embedded price blob, or else its price table"""
+    start = html.find(BLOB_MARKER)
+    if start != -1:
+        try:
+            df = _history_from_blob(html, start)
+            if df is not None:
+                return df
+        except ValueError:
+            pass
+    start = html.find(HISTORY_TABLE_MARKER)
+    if start == -1:
+        return None
+    return _history_from_table(html, start)
+
+
+def parse_history_soup(html: str) -> Optional[pd.DataFrame]:
+    """Parse a history page's price table through a full BeautifulSoup tree"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Find the historical data table
+    table = soup.find('table', {'data-test': 'historical-prices'})
+    if not table:
+        return None
+
+    positions = _positions([th.text for th in table.find_all('th')])
+
+    # Parse table data
+    data = []
+    for row in table.find_all('tr'):
+        cols = row.find_all('td')
+        if len(cols) > max(positions.values()):
+            try:
+                date = pd.to_datetime(cols[positions['Date']].text.strip(), format='%b %d, %Y')
+                record = {'Date': date}
+                for name in HISTORY_COLUMNS:
+                    record[name] = float(cols[positions[name]].text.replace(',', ''))
+                data.append(record)
+            except (ValueError, TypeError):
+                continue
+
+    if not data:
+        return None
+    df = pd.DataFrame(data)
+    df['Volume'] = df['Volume'].astype(np.int64)
+    df['Date'] = df['Date'].astype('datetime64[ns]')
+    df.set_index('Date', inplace=True)
+    df.sort_index(inplace=True)
+    return df
+
+
+def _quote_result(ticker: str, price: Optional[str], metrics: List[Tuple[str, str]]) -> Optional[Dict[str, Any]]:
+    stock_data = {
+        'ticker': ticker,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if price:
+        try:
+            stock_data['price'] = float(price)
+        except ValueError:
+            pass
+    for label, value in metrics:
+        label = label.strip().lower()
+        value = value.strip().replace(',', '')
+        if 'market cap' in label:
+            stock_data['market_cap'] = value
+        elif label == 'volume':  # not 'avg. volume'
+            try:
+                stock_data['volume'] = int(value)
+            except ValueError:
+                continue
+    # At least ticker, timestamp, and one metric
+    return stock_data if len(stock_data) >= 3 else None
+
+
+def parse_quote_fast(html: str, ticker: str) -> Optional[Dict[str, Any]]:
+    """Parse a quote page from the price tag and the summary table alone"""
+    price = None
+    idx = html.find('data-field="regularMarketPrice"')
+    while idx != -1:
+        tag = html[html.rfind('<', 0, idx):html.find('>', idx) + 1]
+        attributes = dict(ATTRIBUTE.findall(tag))
+        if tag.startswith('<fin-streamer') and attributes.get('data-symbol') == ticker:
+            price = attributes.get('value')
+            break
+        idx = html.find('data-field="regularMarketPrice"', idx + 1)
+
+    metrics = []
+    match = QUOTE_TABLE.search(html)
+    if match:
+        end = html.find('</table>', match.start())
+        for row in ROW.findall(html[match.start():end if end != -1 else len(html)]):
+            cells = [text for kind, text in CELL.findall(row) if kind == 'd']
+            if len(cells) == 2:
+                metrics.append((cells[0], cells[1]))
+    return _quote_result(ticker, price, metrics)
+
+
+def parse_quote_soup(html: str, ticker: str) -> Optional[Dict[str, Any]]:
+    """Parse a quote page through a full BeautifulSoup tree"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    price = soup.find('fin-streamer', {'data-symbol': ticker, 'data-field': 'regularMarketPrice'})
+    metrics = []
+    table = soup.find('table', {'class': 'W(100%)'})
+    if table:
+        for row in table.find_all('tr'):
+            cols = row.find_all('td')
+            if len(cols) == 2:
+                metrics.append((cols[0].text, cols[1].text))
+    return _quote_result(ticker, price.get('value') if price else None, metrics)
+
+
+def parse_history(html: str, mode: str = PARSER_MODE) -> Optional[pd.DataFrame]:
+    """Parse a Yahoo history page into a Date-indexed OHLCV frame"""
+    return parse_history_soup(html) if mode == 'soup' else parse_history_fast(html)
+
+
+def parse_quote(html: str, ticker: str, mode: str = PARSER_MODE) -> Optional[Dict[str, Any]]:
+    """Parse a Yahoo quote page into the current-data dict"""
+    return parse_quote_soup(html, ticker) if mode == 'soup' else parse_quote_fast(html, ticker)
+
+
+def _parse_page(kind: str, mode: str, page: Tuple[str, str]):
+    ticker, html = page
+    return parse_quote(html, ticker, mode) if kind == 'quote' else parse_history(html, mode)
+
+
+def parse_pages(pages: List[Tuple[str, str]], kind: str = 'history', mode: str = PARSER_MODE,
+                workers: Optional[int] = None) -> list:
+    """Parse many fetched pages, in a process pool when there are enough of them
+
+    Args:
+        pages: (ticker, html) pairs
+        kind: 'history' or 'quote'
+        mode: 'fast' or 'soup'
+        workers: Worker processes (default: CPU count)
+
+    Returns:
+        One result per page, in order; None where a page had no data
+    """
+    parse = partial(_parse_page, kind, mode)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pages) < MIN_POOL_PAGES:
+        return [parse(page) for page in pages]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse, pages, chunksize=max(1, len(pages) // (workers * 4))))